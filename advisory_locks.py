@@ -0,0 +1,55 @@
+import threading
+import weakref
+from contextlib import contextmanager
+from extensions import db
+
+# First key of the two-key advisory lock, so these locks can't collide with
+# other advisory locks on the same database
+MATCH_NIGHT_LOCK_NAMESPACE = 7061
+
+# Fallback for databases without advisory locks (SQLite): only serializes
+# requests within this process, which is all SQLite supports anyway
+_local_locks = weakref.WeakValueDictionary()
+_local_locks_guard = threading.Lock()
+
+def _local_lock(match_night_id: int) -> threading.Lock:
+    with _local_locks_guard:
+        lock = _local_locks.get(match_night_id)
+        if lock is None:
+            lock = threading.Lock()
+            _local_locks[match_night_id] = lock
+        return lock
+
+@contextmanager
+def match_night_lock(match_night_id: int):
+    """
+    Try to take the lock of a match night without waiting. Yields True if
+    this request holds it for the duration of the block, False if another
+    request does.
+
+    On PostgreSQL this is a session-level advisory lock on a separate
+    connection, so commits inside the block don't release it.
+    """
+    if db.engine.dialect.name != 'postgresql':
+        lock = _local_lock(match_night_id)
+        acquired = lock.acquire(blocking=False)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                lock.release()
+        return
+
+    params = {'namespace': MATCH_NIGHT_LOCK_NAMESPACE, 'key': match_night_id}
+    with db.engine.connect() as connection:
+        acquired = connection.execute(
+            db.text("SELECT pg_try_advisory_lock(:namespace, :key)"), params
+        ).scalar()
+        # Don't keep a transaction open on the lock connection
+        connection.commit()
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                connection.execute(db.text("SELECT pg_advisory_unlock(:namespace, :key)"), params)
+                connection.commit()
@@ -7,6 +7,7 @@ import os
 from dotenv import load_dotenv
 
 from extensions import db
+from schema_capabilities import schema_capabilities
 
 # Load environment variables
 load_dotenv()
@@ -82,6 +83,7 @@ if __name__ == '__main__':
             print("Creating database tables...")
             db.create_all()
             print("Database tables created successfully!")
+            schema_capabilities.refresh()
     else:
         print("Skipping table creation - not using PostgreSQL")
     
@@ -1,3 +1,15 @@
 from flask_sqlalchemy import SQLAlchemy
 
-db = SQLAlchemy() 
\ No newline at end of file
+db = SQLAlchemy()
+
+def dialect_insert(model):
+    """
+    INSERT construct for the database in use, so ON CONFLICT clauses
+    (on_conflict_do_update / on_conflict_do_nothing) work on both
+    PostgreSQL and SQLite.
+    """
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model)
@@ -0,0 +1,99 @@
+import math
+from collections import deque
+from typing import Iterable, List, Optional, Sequence, Tuple
+from extensions import db
+from models import KingOfTheCourtQueue, Participation
+from schema_capabilities import schema_capabilities
+
+Pair = Tuple[int, int]
+
+def king_of_the_court_rounds(num_players: int, num_courts: int = 1) -> int:
+    """
+    Number of rounds of a king of the court game: as many matches as an
+    everyone vs everyone game needs for every pair to play together once
+    (3 for 4 players, 5 for 5, 8 for 6, 11 for 7, 14 for 8, ...), spread
+    over the courts.
+    """
+    return math.ceil(num_players * (num_players - 1) / (4 * max(1, num_courts)))
+
+def king_of_the_court_courts(num_players: int, num_courts: int = 1) -> int:
+    """Courts used at the same time: every court needs 4 players"""
+    return max(1, min(num_courts or 1, num_players // 4))
+
+def has_queue_table() -> bool:
+    return schema_capabilities.has_table(KingOfTheCourtQueue.__tablename__)
+
+def create_queue(game_schema_id: int, waiting_ids: Iterable[int]) -> Optional[KingOfTheCourtQueue]:
+    """Store the players waiting after the first match, in order. Does not commit."""
+    if not has_queue_table():
+        return None
+    queue = KingOfTheCourtQueue(game_schema_id=game_schema_id)
+    queue.set_waiting_ids(waiting_ids)
+    db.session.add(queue)
+    return queue
+
+def load_queue(match_night_id: int, game_schema_id: int,
+               on_court: Sequence[int]) -> Tuple[Optional[KingOfTheCourtQueue], deque]:
+    """
+    The queue of a game with one primary key lookup. Games started before
+    the queue table existed get their queue built once from the participants
+    (everyone who isn't on court); without the table it is built every time.
+
+    Returns:
+        (queue row or None without the table, deque of waiting user IDs)
+    """
+    queue = db.session.get(KingOfTheCourtQueue, game_schema_id) if has_queue_table() else None
+    if queue is not None:
+        return queue, deque(queue.get_waiting_ids())
+
+    on_court = set(on_court)
+    waiting = deque(user_id for (user_id,) in db.session.query(Participation.user_id).filter_by(
+        match_night_id=match_night_id
+    ).order_by(Participation.id).all() if user_id not in on_court)
+    return create_queue(game_schema_id, waiting), waiting
+
+def advance_queue(waiting: deque, losers: Sequence[int]) -> Optional[Tuple[int, int]]:
+    """
+    Losers join the back of the queue and the two players at the front come
+    on court to challenge the winners. With 4 players the losers come
+    straight back.
+
+    Returns:
+        The two challengers, or None if there aren't enough players
+    """
+    waiting.extend(losers)
+    if len(waiting) < 2:
+        return None
+    return waiting.popleft(), waiting.popleft()
+
+def ladder_round(outcomes: Sequence[Tuple[Sequence[int], Sequence[int]]], waiting: deque,
+                 num_courts: int = 1) -> List[Tuple[Pair, Pair]]:
+    """
+    Next round of the king of the court ladder ("up and down the river").
+    Court 1 is the top court: its winners stay, all other winners move up a
+    court and losers move down a court. The losers of the bottom court join
+    the back of the queue and the front of the queue comes on at the bottom
+    court. With one court this is plain king of the court.
+
+    Args:
+        outcomes: (winners, losers) per court of the finished round, top court first
+        waiting: Deque of waiting players, advanced in place
+        num_courts: Courts available; a court is added at the bottom while
+            at least 4 players are waiting
+
+    Returns:
+        (upper pair, lower pair) per court, top court first; the pairs are
+        split so each team has one player of both
+    """
+    next_round = []
+    for court, (winners, losers) in enumerate(outcomes):
+        upper = winners if court == 0 else outcomes[court - 1][1]
+        if court + 1 < len(outcomes):
+            lower = outcomes[court + 1][0]
+        else:
+            lower = advance_queue(waiting, losers)
+        next_round.append((tuple(upper), tuple(lower)))
+
+    while len(next_round) < num_courts and len(waiting) >= 4:
+        next_round.append(((waiting.popleft(), waiting.popleft()), (waiting.popleft(), waiting.popleft())))
+    return next_round
@@ -0,0 +1,104 @@
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from extensions import db, dialect_insert
+from models import Match
+from schema_capabilities import schema_capabilities
+
+# Unique per game schema (see Match.__table_args__)
+MATCH_SLOT_COLUMNS = ('game_schema_id', 'round', 'court')
+
+def bulk_insert_matches(match_night_id: int, schedule: List[Dict],
+                        game_schema_id: Optional[int] = None) -> List[Match]:
+    """
+    Insert a whole generated schedule in one round trip.
+    Uses a multi-row INSERT ... RETURNING where the database supports it and
+    a plain executemany otherwise. Does not commit.
+
+    Args:
+        match_night_id: ID of the match night
+        schedule: List of dicts with player1_id..player4_id, round and court
+        game_schema_id: ID of the game schema the matches belong to
+
+    Returns:
+        Match objects built from the in-memory schedule (with their new ids),
+        not attached to the session
+    """
+    if not schedule:
+        return []
+
+    created_at = datetime.utcnow()
+    rows = [
+        {
+            'match_night_id': match_night_id,
+            'game_schema_id': game_schema_id,
+            'player1_id': match_data['player1_id'],
+            'player2_id': match_data['player2_id'],
+            'player3_id': match_data['player3_id'],
+            'player4_id': match_data['player4_id'],
+            'round': match_data['round'],
+            'court': match_data['court'],
+            'created_at': created_at
+        }
+        for match_data in schedule
+    ]
+
+    insert = db.insert(Match)
+    dialect = db.engine.dialect
+    if dialect.name != 'sqlite' and dialect.insert_executemany_returning:
+        match_ids = db.session.execute(
+            insert.returning(Match.id, sort_by_parameter_order=True), rows
+        ).scalars().all()
+    else:
+        # SQLite: executemany, then read the ids back in insertion order. SQLite
+        # allows a single writer, so the newest ids are the ones just inserted.
+        db.session.execute(insert, rows)
+        match_ids = [
+            match_id for (match_id,) in db.session.query(Match.id)
+            .filter_by(match_night_id=match_night_id, game_schema_id=game_schema_id)
+            .order_by(Match.id.desc())
+            .limit(len(rows))
+            .all()
+        ][::-1]
+
+    return [Match(id=match_id, **row) for match_id, row in zip(match_ids, rows)]
+
+def insert_matches_or_get_existing(match_night_id: int, game_schema_id: int, schedule: List[Dict]) -> Tuple[List[Match], bool]:
+    """
+    Insert the matches of a round unless another request already created
+    them: INSERT ... ON CONFLICT (game_schema_id, round, court) DO NOTHING,
+    then read the round back. Concurrent result submissions that both
+    generate the next round end up with the same matches. Does not commit.
+
+    Without the unique constraint (fix-schema not run yet) the matches are
+    simply inserted.
+
+    Returns:
+        (the matches of the scheduled rounds and courts, attached to the
+        session; whether this call inserted any of them)
+    """
+    if not schedule:
+        return [], False
+
+    if not schema_capabilities.has_unique_constraint(Match.__tablename__, MATCH_SLOT_COLUMNS):
+        matches = [Match(match_night_id=match_night_id, game_schema_id=game_schema_id, **match_data)
+                   for match_data in schedule]
+        db.session.add_all(matches)
+        db.session.flush()
+        return matches, True
+
+    created_at = datetime.utcnow()
+    rows = [
+        dict(match_data, match_night_id=match_night_id, game_schema_id=game_schema_id, created_at=created_at)
+        for match_data in schedule
+    ]
+    result = db.session.execute(
+        dialect_insert(Match).values(rows).on_conflict_do_nothing(index_elements=list(MATCH_SLOT_COLUMNS))
+    )
+    inserted = result.rowcount > 0
+
+    slots = {(match_data['round'], match_data['court']) for match_data in schedule}
+    matches = Match.query.filter(
+        Match.game_schema_id == game_schema_id,
+        Match.round.in_({round_num for round_num, _ in slots})
+    ).order_by(Match.round, Match.court).all()
+    return [match for match in matches if (match.round, match.court) in slots], inserted
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Migration script to make the match night foreign keys ON DELETE CASCADE
+"""
+
+from sqlalchemy import inspect
+from extensions import db
+from app import app
+from teardown import CASCADING_FOREIGN_KEYS
+
+def migrate_cascade_deletes():
+    """Recreate the match night related foreign keys with ON DELETE CASCADE"""
+    with app.app_context():
+        print("Starting migration to add ON DELETE CASCADE foreign keys...")
+
+        if db.engine.dialect.name != 'postgresql':
+            print("❌ This migration only supports PostgreSQL")
+            return False
+
+        inspector = inspect(db.engine)
+
+        try:
+            with db.engine.begin() as connection:
+                for table_name, column_name in CASCADING_FOREIGN_KEYS:
+                    foreign_key = next(
+                        (fk for fk in inspector.get_foreign_keys(table_name)
+                         if fk['constrained_columns'] == [column_name]),
+                        None
+                    )
+
+                    if foreign_key and (foreign_key.get('options') or {}).get('ondelete', '').upper() == 'CASCADE':
+                        print(f"✅ {table_name}.{column_name} already cascades")
+                        continue
+
+                    referred_table = foreign_key['referred_table'] if foreign_key else None
+                    if referred_table is None:
+                        # Missing foreign key, derive the referred table from the models
+                        referred_table = {'match_night_id': 'match_nights',
+                                          'game_schema_id': 'game_schemas',
+                                          'match_id': 'matches'}[column_name]
+
+                    constraint_name = (foreign_key or {}).get('name') or f"{table_name}_{column_name}_fkey"
+
+                    if foreign_key:
+                        connection.execute(db.text(f'ALTER TABLE {table_name} DROP CONSTRAINT "{constraint_name}"'))
+                    connection.execute(db.text(
+                        f'ALTER TABLE {table_name} ADD CONSTRAINT "{constraint_name}" '
+                        f'FOREIGN KEY ({column_name}) REFERENCES {referred_table}(id) ON DELETE CASCADE'
+                    ))
+                    print(f"Updated {table_name}.{column_name} -> {referred_table}.id (ON DELETE CASCADE)")
+
+            print("✅ Successfully migrated all foreign keys!")
+            return True
+
+        except Exception as e:
+            print(f"❌ Migration failed: {e}")
+            return False
+
+if __name__ == "__main__":
+    print("🏓 Cascading Deletes Migration")
+    print("=" * 40)
+
+    success = migrate_cascade_deletes()
+
+    if success:
+        print("\n🎉 Migration completed successfully!")
+        print("Restart the API so it picks up the new foreign keys.")
+    else:
+        print("\n❌ Migration failed!")
@@ -1,11 +1,15 @@
+from flask import g, has_request_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
+from sqlalchemy import func
+from sqlalchemy.orm import contains_eager, deferred, joinedload
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 import json
 
 # Import db from app
 from extensions import db
+from schema_capabilities import schema_capabilities
 
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
@@ -37,6 +41,67 @@ class User(UserMixin, db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+def load_user_names(user_ids):
+    """
+    Resolve user ids to names with a single IN query.
+    Names are kept in a request-scoped identity map, so serializers that run
+    later in the same request don't hit the database again for known users.
+    """
+    cache = g.setdefault('user_names', {}) if has_request_context() else {}
+    user_ids = [user_id for user_id in user_ids if user_id is not None]
+    
+    missing_ids = {user_id for user_id in user_ids if user_id not in cache}
+    if missing_ids:
+        rows = db.session.query(User.id, User.name).filter(User.id.in_(missing_ids)).all()
+        cache.update({row.id: row.name for row in rows})
+        # Remember unknown ids as well so they are not queried again
+        for user_id in missing_ids:
+            cache.setdefault(user_id, None)
+    
+    return {user_id: cache[user_id] for user_id in user_ids}
+
+def find_naai_partij_ids(matches):
+    """
+    Find the naai-partijen among the matches of an everyone vs everyone game:
+    matches in which a pair plays together again after an earlier round.
+    
+    Returns:
+        Set of match ids
+    """
+    naai_partij_ids = set()
+    previous_pairs = set()
+    round_pairs = set()
+    current_round = None
+    for match in sorted(matches, key=lambda match: (match.round, match.court)):
+        if match.round != current_round:
+            # Matches in the same round don't count as played before each other
+            previous_pairs |= round_pairs
+            round_pairs = set()
+            current_round = match.round
+        pairs = (frozenset((match.player1_id, match.player2_id)),
+                 frozenset((match.player3_id, match.player4_id)))
+        if any(pair in previous_pairs for pair in pairs):
+            naai_partij_ids.add(match.id)
+        round_pairs.update(pairs)
+    return naai_partij_ids
+
+def serialize_matches(matches, user_names=None, naai_partij_ids=()):
+    """
+    Serialize a list of matches with one batched user lookup for all players.
+    
+    Args:
+        matches: Match objects to serialize
+        user_names: Optional dict of user_id -> name that is already known
+        naai_partij_ids: Ids of the matches that are naai-partijen (see find_naai_partij_ids)
+    """
+    user_names = dict(user_names or {})
+    missing_ids = [player_id for match in matches for player_id in match.player_ids
+                   if player_id not in user_names]
+    if missing_ids:
+        user_names.update(load_user_names(missing_ids))
+    
+    return [match.to_dict(user_names, match.id in naai_partij_ids) for match in matches]
+
 class MatchNight(db.Model):
     __tablename__ = 'match_nights'
     
@@ -47,14 +112,47 @@ class MatchNight(db.Model):
     creator_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     game_status = db.Column(db.String(20), default='not_started')  # 'not_started', 'active', 'completed'
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Optional court booking, for the 'booking' schedule type. Deferred so
+    # databases without these columns (see fix-schema) can still load match
+    # nights; the server default keeps them out of INSERTs when not set (and
+    # without eager defaults they aren't fetched back with RETURNING either)
+    booking_minutes = deferred(db.Column(db.Integer, nullable=True, server_default=db.text('NULL')), group='booking')
+    avg_match_minutes = deferred(db.Column(db.Integer, nullable=True, server_default=db.text('NULL')), group='booking')
+    # Schedule type of the matches created by generate-schedule ('swiss', 'simple', ...)
+    schedule_type = deferred(db.Column(db.String(20), nullable=True, server_default=db.text('NULL')), group='schedule')
+    __mapper_args__ = {'eager_defaults': False}
     
     # Relationships
     creator = db.relationship('User', backref='created_match_nights', lazy=True)
-    participations = db.relationship('Participation', backref='match_night', lazy=True)
-    matches = db.relationship('Match', backref='match_night', lazy=True)
+    participations = db.relationship('Participation', backref='match_night', lazy=True, passive_deletes=True)
+    matches = db.relationship('Match', backref='match_night', lazy=True, passive_deletes=True)
     
-    def to_dict(self):
-        return {
+    # Indexes for the "my match nights" listing (newest first, keyset pagination)
+    __table_args__ = (
+        db.Index('idx_match_nights_date_id', 'date', 'id'),
+        db.Index('idx_match_nights_creator_id', 'creator_id'),
+    )
+    
+    @staticmethod
+    def has_booking_columns() -> bool:
+        return schema_capabilities.has_column('match_nights', 'avg_match_minutes')
+    
+    @staticmethod
+    def has_schedule_type_column() -> bool:
+        return schema_capabilities.has_column('match_nights', 'schedule_type')
+    
+    def to_dict(self, participants_count=None, player_stats=None):
+        """
+        Serialize the match night. The list view passes precomputed
+        participants_count and player_stats (see serialize_match_nights);
+        otherwise all participations and player stats are loaded.
+        """
+        if participants_count is None:
+            participants_count = len(self.participations)
+        if player_stats is None:
+            player_stats = [stat.to_dict() for stat in self.player_stats] if self.player_stats else []
+        
+        data = {
             'id': self.id,
             'date': self.date.isoformat() if self.date else None,
             'location': self.location,
@@ -63,16 +161,76 @@ class MatchNight(db.Model):
             'creator': self.creator.to_dict() if self.creator else None,
             'game_status': self.game_status,
             'created_at': self.created_at.isoformat() if self.created_at else None,
-            'participants_count': len(self.participations),
-            'player_stats': [stat.to_dict() for stat in self.player_stats] if self.player_stats else []
+            'participants_count': participants_count,
+            'player_stats': player_stats
         }
+        if self.has_booking_columns():
+            data['booking_minutes'] = self.booking_minutes
+            data['avg_match_minutes'] = self.avg_match_minutes
+        if self.has_schedule_type_column():
+            data['schedule_type'] = self.schedule_type
+        return data
+
+def serialize_match_nights(match_nights, top_stats=3):
+    """
+    List-view serialization for a page of match nights.
+    Participant counts and the top standings of every night are computed with
+    two grouped queries for the whole page instead of loading all
+    participations and player stats per night.
+    
+    Args:
+        match_nights: MatchNight objects to serialize
+        top_stats: Number of best players to include per night
+    """
+    match_night_ids = [match_night.id for match_night in match_nights]
+    if not match_night_ids:
+        return []
+    
+    participants_counts = dict(
+        db.session.query(Participation.match_night_id, func.count(Participation.id))
+        .filter(Participation.match_night_id.in_(match_night_ids))
+        .group_by(Participation.match_night_id)
+        .all()
+    )
+    
+    # Rank the players of each night and keep only the top of every ranking
+    rank = func.row_number().over(
+        partition_by=PlayerStats.match_night_id,
+        order_by=(PlayerStats.total_points.desc(), PlayerStats.user_id)
+    ).label('rank')
+    ranked = (
+        db.session.query(PlayerStats.id.label('id'), rank)
+        .filter(PlayerStats.match_night_id.in_(match_night_ids))
+        .subquery()
+    )
+    top_player_stats = (
+        PlayerStats.query
+        .join(ranked, ranked.c.id == PlayerStats.id)
+        .join(PlayerStats.user)
+        .options(contains_eager(PlayerStats.user))
+        .filter(ranked.c.rank <= top_stats)
+        .order_by(PlayerStats.match_night_id, ranked.c.rank)
+        .all()
+    )
+    
+    player_stats_by_night = {}
+    for stat in top_player_stats:
+        player_stats_by_night.setdefault(stat.match_night_id, []).append(stat.to_dict())
+    
+    return [
+        match_night.to_dict(
+            participants_count=participants_counts.get(match_night.id, 0),
+            player_stats=player_stats_by_night.get(match_night.id, [])
+        )
+        for match_night in match_nights
+    ]
 
 class Participation(db.Model):
     __tablename__ = 'participations'
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    match_night_id = db.Column(db.Integer, db.ForeignKey('match_nights.id'), nullable=False)
+    match_night_id = db.Column(db.Integer, db.ForeignKey('match_nights.id', ondelete='CASCADE'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Ensure unique participation per user per match night
@@ -91,8 +249,8 @@ class Match(db.Model):
     __tablename__ = 'matches'
     
     id = db.Column(db.Integer, primary_key=True)
-    match_night_id = db.Column(db.Integer, db.ForeignKey('match_nights.id'), nullable=False)
-    game_schema_id = db.Column(db.Integer, db.ForeignKey('game_schemas.id'), nullable=True)
+    match_night_id = db.Column(db.Integer, db.ForeignKey('match_nights.id', ondelete='CASCADE'), nullable=False)
+    game_schema_id = db.Column(db.Integer, db.ForeignKey('game_schemas.id', ondelete='CASCADE'), nullable=True)
     player1_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     player2_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     player3_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -102,38 +260,37 @@ class Match(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationships
-    result = db.relationship('MatchResult', backref='match', uselist=False, lazy=True)
+    result = db.relationship('MatchResult', backref='match', uselist=False, lazy=True, passive_deletes=True)
     
     # Indexes for performance
     __table_args__ = (
         db.Index('idx_matches_match_night_id', 'match_night_id'),
         db.Index('idx_matches_round', 'round'),
         db.Index('idx_matches_players', 'player1_id', 'player2_id', 'player3_id', 'player4_id'),
+        # One match per court per round of a game; concurrent result submissions can't duplicate a round
+        db.UniqueConstraint('game_schema_id', 'round', 'court', name='unique_game_schema_round_court'),
     )
     
-    def to_dict(self):
-        # Haal de user objecten op voor de namen
-        player1 = User.query.get(self.player1_id)
-        player2 = User.query.get(self.player2_id)
-        player3 = User.query.get(self.player3_id)
-        player4 = User.query.get(self.player4_id)
-        
-        # Check if this is a naai-partij (last match for 6 or 7 players)
-        is_naai_partij = False
-        if self.round >= 8:  # Naai-partijen zijn altijd de laatste wedstrijden
-            is_naai_partij = True
+    @property
+    def player_ids(self):
+        return [self.player1_id, self.player2_id, self.player3_id, self.player4_id]
+    
+    def to_dict(self, user_names=None, is_naai_partij=False):
+        # Haal de namen op in één query (of uit de meegegeven user_names)
+        if user_names is None:
+            user_names = load_user_names(self.player_ids)
         
         return {
             'id': self.id,
             'match_night_id': self.match_night_id,
             'player1_id': self.player1_id,
-            'player1_name': player1.name if player1 else None,
+            'player1_name': user_names.get(self.player1_id),
             'player2_id': self.player2_id,
-            'player2_name': player2.name if player2 else None,
+            'player2_name': user_names.get(self.player2_id),
             'player3_id': self.player3_id,
-            'player3_name': player3.name if player3 else None,
+            'player3_name': user_names.get(self.player3_id),
             'player4_id': self.player4_id,
-            'player4_name': player4.name if player4 else None,
+            'player4_name': user_names.get(self.player4_id),
             'round': self.round,
             'court': self.court,
             'is_naai_partij': is_naai_partij,
@@ -145,11 +302,16 @@ class MatchResult(db.Model):
     __tablename__ = 'match_results'
     
     id = db.Column(db.Integer, primary_key=True)
-    match_id = db.Column(db.Integer, db.ForeignKey('matches.id'), nullable=False)
+    match_id = db.Column(db.Integer, db.ForeignKey('matches.id', ondelete='CASCADE'), nullable=False)
     score = db.Column(db.String(50), nullable=True)  # e.g., "6-3, 6-4"
     winner_ids = db.Column(db.Text, nullable=True)  # JSON array of winner user IDs
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        # One result per match; concurrent submissions for a match can't both insert one
+        db.UniqueConstraint('match_id', name='unique_match_result_match'),
+    )
+    
     def set_winner_ids(self, winner_ids):
         """Set winner IDs as JSON string"""
         if winner_ids is None:
@@ -182,41 +344,90 @@ class MatchResult(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+class MatchPointContribution(db.Model):
+    """
+    Points a match result contributed to a player's PlayerStats. Editing a
+    result only applies the difference with these points.
+    """
+    __tablename__ = 'match_point_contributions'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    match_id = db.Column(db.Integer, db.ForeignKey('matches.id', ondelete='CASCADE'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    points = db.Column(db.Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        db.UniqueConstraint('match_id', 'user_id', name='unique_match_point_contribution'),
+    )
+
 class GameSchema(db.Model):
     __tablename__ = 'game_schemas'
     
     id = db.Column(db.Integer, primary_key=True)
-    match_night_id = db.Column(db.Integer, db.ForeignKey('match_nights.id'), nullable=False)
+    match_night_id = db.Column(db.Integer, db.ForeignKey('match_nights.id', ondelete='CASCADE'), nullable=False)
     game_mode = db.Column(db.String(50), nullable=False)  # 'everyone_vs_everyone' or 'king_of_the_court'
     status = db.Column(db.String(20), default='pending')  # 'pending', 'active', 'completed'
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationships
-    match_night = db.relationship('MatchNight', backref='game_schemas', lazy=True)
-    matches = db.relationship('Match', backref='game_schema', lazy=True)
+    match_night = db.relationship('MatchNight', backref=db.backref('game_schemas', passive_deletes=True), lazy=True)
+    matches = db.relationship('Match', backref='game_schema', lazy=True, passive_deletes=True)
     
-    def to_dict(self):
+    def to_dict(self, matches=None):
+        """
+        Serialize the game schema. Pass matches when they are already known
+        (e.g. just generated); otherwise they are loaded with their results.
+        """
+        if matches is None:
+            matches = Match.query.options(joinedload(Match.result)).filter_by(
+                game_schema_id=self.id
+            ).order_by(Match.round, Match.court).all()
+        
+        naai_partij_ids = set()
+        if self.game_mode == 'everyone_vs_everyone':
+            naai_partij_ids = find_naai_partij_ids(matches)
+        
         return {
             'id': self.id,
             'match_night_id': self.match_night_id,
             'game_mode': self.game_mode,
             'status': self.status,
             'created_at': self.created_at.isoformat() if self.created_at else None,
-            'matches': [match.to_dict() for match in self.matches] if self.matches else []
+            'matches': serialize_matches(matches, naai_partij_ids=naai_partij_ids)
         }
 
+class KingOfTheCourtQueue(db.Model):
+    """
+    Players waiting to play in a king of the court game, front of the queue
+    first. Winners stay on court, losers join the back of the queue.
+    """
+    __tablename__ = 'king_of_the_court_queues'
+    
+    game_schema_id = db.Column(db.Integer, db.ForeignKey('game_schemas.id', ondelete='CASCADE'), primary_key=True)
+    waiting_ids = db.Column(db.Text, nullable=False, default='[]')  # JSON array of user IDs
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def set_waiting_ids(self, waiting_ids):
+        self.waiting_ids = json.dumps(list(waiting_ids))
+    
+    def get_waiting_ids(self):
+        try:
+            return json.loads(self.waiting_ids or '[]')
+        except (json.JSONDecodeError, TypeError, ValueError):
+            return []
+
 class PlayerStats(db.Model):
     __tablename__ = 'player_stats'
     
     id = db.Column(db.Integer, primary_key=True)
-    match_night_id = db.Column(db.Integer, db.ForeignKey('match_nights.id'), nullable=False)
+    match_night_id = db.Column(db.Integer, db.ForeignKey('match_nights.id', ondelete='CASCADE'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     total_points = db.Column(db.Integer, default=0)  # Total points scored across all matches
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
-    match_night = db.relationship('MatchNight', backref='player_stats', lazy=True)
+    match_night = db.relationship('MatchNight', backref=db.backref('player_stats', passive_deletes=True), lazy=True)
     user = db.relationship('User', backref='player_stats', lazy=True)
     
     # Ensure unique stats per player per match night
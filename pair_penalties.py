@@ -0,0 +1,125 @@
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+from sqlalchemy import func, literal_column, select, union_all
+from extensions import db
+from models import Match, MatchNight, Participation
+from schedule_cache import ScheduleTemplateCache
+from schedule_quality import schedule_arrays
+
+# History of a roster: its last VARIETY_NIGHTS match nights with at least
+# MIN_ROSTER_PLAYERS of its players
+VARIETY_NIGHTS = 5
+MIN_ROSTER_PLAYERS = 4
+# Penalty per earlier partnership / opponent meeting, in schedule_quality.schedule_cost units
+HISTORY_PARTNER_WEIGHT = 10
+HISTORY_OPPONENT_WEIGHT = 2
+# Candidate player assignments compared for the fixed formats (see best_assignment)
+VARIETY_DRAWS = 16
+
+# Partner and opponent slots of a match row (player1..player4), one direction
+_PARTNER_SLOTS = ((0, 1), (2, 3))
+_OPPONENT_SLOTS = ((0, 2), (0, 3), (1, 2), (1, 3))
+
+class PairPenalties:
+    """
+    How often the players of a roster partnered and faced each other in
+    their recent match nights, as symmetric count matrices indexed like
+    player_ids. Schedules with the same pairs again get a higher penalty,
+    so the schedulers vary partners and opponents across nights.
+    """
+
+    def __init__(self, player_ids: Sequence[int], partners: np.ndarray, opponents: np.ndarray,
+                 nights: int = 0):
+        self.player_ids = list(player_ids)
+        self.partners = partners
+        self.opponents = opponents
+        self.nights = nights
+        self.fingerprint = hash((tuple(self.player_ids), partners.tobytes(), opponents.tobytes()))
+
+    @classmethod
+    def empty(cls, player_ids: Sequence[int]) -> 'PairPenalties':
+        size = len(player_ids)
+        return cls(player_ids, np.zeros((size, size), dtype=np.int64), np.zeros((size, size), dtype=np.int64))
+
+    def __bool__(self) -> bool:
+        return bool(self.partners.any() or self.opponents.any())
+
+    def penalty(self, schedule) -> int:
+        """History penalty of a schedule of this roster (any schedule_quality format)"""
+        _, players, _ = schedule_arrays(schedule, self.player_ids)
+        if not len(players):
+            return 0
+        total = sum(int(self.partners[players[:, i], players[:, j]].sum()) for i, j in _PARTNER_SLOTS)
+        total_opponents = sum(int(self.opponents[players[:, i], players[:, j]].sum()) for i, j in _OPPONENT_SLOTS)
+        return HISTORY_PARTNER_WEIGHT * total + HISTORY_OPPONENT_WEIGHT * total_opponents
+
+    def weighted_matrices(self, player_ids: Sequence[int]) -> Tuple[List[List[int]], List[List[int]]]:
+        """Partner and opponent penalties as nested lists, indexed like player_ids"""
+        index = {player_id: position for position, player_id in enumerate(self.player_ids)}
+        order = [index[player_id] for player_id in player_ids]
+        partners = HISTORY_PARTNER_WEIGHT * self.partners[np.ix_(order, order)]
+        opponents = HISTORY_OPPONENT_WEIGHT * self.opponents[np.ix_(order, order)]
+        return partners.tolist(), opponents.tolist()
+
+def best_assignment(candidates, penalties: Optional[PairPenalties]):
+    """The candidate schedule with the lowest history penalty; the first one on ties or without history"""
+    if not penalties:
+        return candidates[0]
+    return min(candidates, key=penalties.penalty)
+
+def _load(match_night: MatchNight, player_ids: List[int], nights: int) -> PairPenalties:
+    # The roster's last nights before this one, by date
+    recent_nights = (
+        select(Participation.match_night_id)
+        .join(MatchNight, MatchNight.id == Participation.match_night_id)
+        .where(
+            Participation.user_id.in_(player_ids),
+            MatchNight.id != match_night.id,
+            MatchNight.date < match_night.date
+        )
+        .group_by(Participation.match_night_id, MatchNight.date)
+        .having(func.count() >= MIN_ROSTER_PLAYERS)
+        .order_by(MatchNight.date.desc(), Participation.match_night_id.desc())
+        .limit(nights)
+        .cte('recent_nights')
+    )
+    slots = (Match.player1_id, Match.player2_id, Match.player3_id, Match.player4_id)
+    pairs = union_all(*(
+        select(literal_column(f"'{kind}'").label('kind'), slots[i].label('a'), slots[j].label('b'))
+        .where(Match.match_night_id.in_(select(recent_nights.c.match_night_id)))
+        for kind, slot_pairs in (('partner', _PARTNER_SLOTS), ('opponent', _OPPONENT_SLOTS))
+        for i, j in slot_pairs
+    )).subquery()
+
+    # One grouped query over the matches of those nights only (idx_matches_match_night_id)
+    rows = db.session.execute(
+        select(pairs.c.kind, pairs.c.a, pairs.c.b, func.count())
+        .where(pairs.c.a.in_(player_ids), pairs.c.b.in_(player_ids))
+        .group_by(pairs.c.kind, pairs.c.a, pairs.c.b)
+    ).all()
+
+    size = len(player_ids)
+    matrices = {'partner': np.zeros((size, size), dtype=np.int64),
+                'opponent': np.zeros((size, size), dtype=np.int64)}
+    index = {player_id: position for position, player_id in enumerate(player_ids)}
+    for kind, a, b, count in rows:
+        matrices[kind][index[a], index[b]] += count
+        matrices[kind][index[b], index[a]] += count
+    return PairPenalties(player_ids, matrices['partner'], matrices['opponent'], nights=nights)
+
+# Per (roster, match night); results entered since are picked up after the TTL
+pair_penalty_cache = ScheduleTemplateCache(maxsize=128, ttl=600)
+
+def load_pair_penalties(match_night: MatchNight, player_ids: Sequence[int],
+                        nights: int = VARIETY_NIGHTS) -> PairPenalties:
+    """
+    Partner/opponent history of the players over their last nights before
+    match_night, with one aggregate query. Cached per roster. Without
+    history all penalties are 0.
+    """
+    player_ids = sorted(set(player_ids))
+    if nights <= 0 or match_night.date is None:
+        return PairPenalties.empty(player_ids)
+
+    key = (tuple(player_ids), match_night.id, nights)
+    return pair_penalty_cache.get_or_build(key, lambda: _load(match_night, player_ids, nights))
@@ -1,13 +1,27 @@
 from flask import Blueprint, request, jsonify, current_app
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash
-from models import User, MatchNight, Participation, Match, MatchResult, GameSchema, PlayerStats
-from schedule_generator import create_matches_for_night
+from models import User, MatchNight, Participation, Match, MatchResult, GameSchema, PlayerStats, load_user_names, serialize_matches, serialize_match_nights, find_naai_partij_ids
+from schedule_generator import ScheduleGenerator, everyone_vs_everyone_template
+from schedule_cache import relabel, schedule_previews, started_games
+from schedule_engine import reschedule_everyone_vs_everyone
+from schedule_quality import evaluate_schedule, validate_schedule
+from pair_penalties import VARIETY_DRAWS, best_assignment, load_pair_penalties
+from swiss import next_swiss_round
+from king_of_the_court import king_of_the_court_rounds, king_of_the_court_courts, create_queue, load_queue, ladder_round
+from match_persistence import bulk_insert_matches, insert_matches_or_get_existing
+from scoring import update_player_stats_for_match, recalculate_player_stats, parse_score
+from schema_capabilities import schema_capabilities
+from teardown import delete_match_night as teardown_match_night, clear_game_data
+from advisory_locks import match_night_lock
 from extensions import db
-from datetime import datetime
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import joinedload, selectinload, undefer_group
+from datetime import datetime, timedelta
+from types import SimpleNamespace
 import json
 import random
-from itertools import combinations
+from collections import deque
 from functools import lru_cache
 
 # Blueprints
@@ -16,6 +30,50 @@ match_nights_bp = Blueprint('match_nights', __name__)
 matches_bp = Blueprint('matches', __name__)
 game_schemas_bp = Blueprint('game_schemas', __name__)
 
+# Pagination for the match nights listing
+MATCH_NIGHTS_PAGE_SIZE = 20
+MATCH_NIGHTS_MAX_PAGE_SIZE = 100
+
+def parse_seed(data):
+    """
+    Seed for schedule generation from the request data, or a new random one.
+    The seed is returned in the response so a schedule can be reproduced.
+    Raises ValueError if it isn't an integer.
+    """
+    seed = (data or {}).get('seed')
+    if seed is None:
+        return random.randrange(2 ** 31)
+    if isinstance(seed, bool) or not isinstance(seed, (int, str)):
+        raise ValueError('Seed must be an integer')
+    return int(seed)
+
+BOOKING_FIELDS = ('booking_minutes', 'avg_match_minutes')
+
+def parse_booking(data):
+    """
+    Optional court booking fields from the request data (only the ones
+    present). Empty values clear a field. Raises ValueError if a value
+    isn't a positive number of minutes.
+    """
+    booking = {}
+    for field in BOOKING_FIELDS:
+        if field not in data:
+            continue
+        value = data[field]
+        if value is None or value == '':
+            booking[field] = None
+            continue
+        try:
+            if isinstance(value, bool):
+                raise ValueError
+            minutes = int(value)
+        except (TypeError, ValueError):
+            raise ValueError(f'{field} must be a number of minutes')
+        if minutes <= 0:
+            raise ValueError(f'{field} must be positive')
+        booking[field] = minutes
+    return booking
+
 # Authentication routes
 @auth_bp.route('/register', methods=['POST'])
 def register():
@@ -145,44 +203,80 @@ def get_current_user():
 @match_nights_bp.route('/', methods=['GET'])
 @login_required
 def get_match_nights():
-    """Get match nights for current user (created by user or user is participating)"""
+    """
+    Get match nights for current user (created by user or user is participating),
+    newest first and paginated with a keyset cursor.
+    
+    Query parameters:
+        before: Cursor '<date>,<id>' as returned in next_before of the previous page
+        limit: Page size (default 20, max 100)
+        from: Only nights on or after this date (YYYY-MM-DD)
+        to: Only nights on or before this date (YYYY-MM-DD)
+    """
+    try:
+        limit = min(max(int(request.args.get('limit', MATCH_NIGHTS_PAGE_SIZE)), 1), MATCH_NIGHTS_MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({'error': 'Invalid limit'}), 400
+    
+    try:
+        before = request.args.get('before')
+        if before:
+            before_date_str, before_id_str = before.rsplit(',', 1)
+            before_date = datetime.fromisoformat(before_date_str)
+            before_id = int(before_id_str)
+        date_from = request.args.get('from')
+        if date_from:
+            date_from = datetime.strptime(date_from, '%Y-%m-%d')
+        date_to = request.args.get('to')
+        if date_to:
+            date_to = datetime.strptime(date_to, '%Y-%m-%d') + timedelta(days=1)
+    except ValueError:
+        return jsonify({'error': 'Invalid before/from/to parameter. Use before=<date>,<id> and YYYY-MM-DD dates'}), 400
+    
     try:
-        print(f"Current user ID: {current_user.id}")
-        print(f"Current user: {current_user.name}")
-        
         # Check if creator_id column exists before querying
-        with db.engine.connect() as connection:
-            columns = connection.execute(db.text("""
-                SELECT column_name 
-                FROM information_schema.columns 
-                WHERE table_name = 'match_nights' AND table_schema = 'public'
-            """)).fetchall()
-            
-            column_names = [col[0] for col in columns]
-            print(f"Match_nights columns: {column_names}")
-            
-            if 'creator_id' not in column_names:
-                print("creator_id column missing, returning empty list")
-                return jsonify({'match_nights': []}), 200
-        
-        # Get match nights created by the user
-        created_match_nights = MatchNight.query.filter_by(creator_id=current_user.id).all()
-        print(f"Created match nights: {len(created_match_nights)}")
-        
-        # Get match nights where user is participating
-        participations = Participation.query.filter_by(user_id=current_user.id).all()
-        participating_match_nights = [p.match_night for p in participations]
-        print(f"Participating match nights: {len(participating_match_nights)}")
-        
-        # Combine and remove duplicates
-        all_match_nights = list(set(created_match_nights + participating_match_nights))
-        all_match_nights.sort(key=lambda x: x.date, reverse=True)
-        print(f"Total match nights: {len(all_match_nights)}")
+        if not schema_capabilities.has_column('match_nights', 'creator_id'):
+            print("creator_id column missing, returning empty list")
+            return jsonify({'match_nights': [], 'next_before': None}), 200
+        
+        # One query for nights created by the user or where the user is participating
+        is_participating = db.session.query(Participation.id).filter(
+            Participation.match_night_id == MatchNight.id,
+            Participation.user_id == current_user.id
+        ).exists()
+        options = [joinedload(MatchNight.creator)]
+        if MatchNight.has_booking_columns():
+            options.append(undefer_group('booking'))
+        if MatchNight.has_schedule_type_column():
+            options.append(undefer_group('schedule'))
+        query = MatchNight.query.options(*options).filter(
+            or_(MatchNight.creator_id == current_user.id, is_participating)
+        )
         
-        result = [mn.to_dict() for mn in all_match_nights]
-        print(f"Result: {result}")
+        if date_from:
+            query = query.filter(MatchNight.date >= date_from)
+        if date_to:
+            query = query.filter(MatchNight.date < date_to)
+        if before:
+            query = query.filter(or_(
+                MatchNight.date < before_date,
+                and_(MatchNight.date == before_date, MatchNight.id < before_id)
+            ))
+        
+        # Fetch one extra row to know whether there is a next page
+        match_nights = query.order_by(MatchNight.date.desc(), MatchNight.id.desc()).limit(limit + 1).all()
+        has_more = len(match_nights) > limit
+        match_nights = match_nights[:limit]
+        
+        next_before = None
+        if has_more:
+            last = match_nights[-1]
+            next_before = f"{last.date.isoformat()},{last.id}"
         
-        return jsonify({'match_nights': result}), 200
+        return jsonify({
+            'match_nights': serialize_match_nights(match_nights),
+            'next_before': next_before
+        }), 200
     except Exception as e:
         import traceback
         print(f"Error in get_match_nights: {str(e)}")
@@ -216,25 +310,23 @@ def create_match_night():
         return jsonify({'error': 'Invalid date/time format. Use YYYY-MM-DD and HH:MM'}), 400
     
     # Check if creator_id column exists
-    with db.engine.connect() as connection:
-        columns = connection.execute(db.text("""
-            SELECT column_name 
-            FROM information_schema.columns 
-            WHERE table_name = 'match_nights' AND table_schema = 'public'
-        """)).fetchall()
-        
-        column_names = [col[0] for col in columns]
-        print(f"Match_nights columns: {column_names}")
-        
-        if 'creator_id' not in column_names:
-            print("creator_id column missing, cannot create match night")
-            return jsonify({'error': 'Database structure error: creator_id column missing'}), 500
+    if not schema_capabilities.has_column('match_nights', 'creator_id'):
+        print("creator_id column missing, cannot create match night")
+        return jsonify({'error': 'Database structure error: creator_id column missing'}), 500
+    
+    try:
+        booking = parse_booking(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if booking and not MatchNight.has_booking_columns():
+        return jsonify({'error': 'Database structure error: booking columns missing, run fix-schema'}), 500
     
     match_night = MatchNight(
         date=date,
         location=data['location'],
         num_courts=data.get('num_courts', 1),
-        creator_id=current_user.id
+        creator_id=current_user.id,
+        **booking
     )
     
     print(f"Created match_night object: {match_night}")
@@ -265,6 +357,13 @@ def update_match_night(match_night_id):
     if match_night.creator_id != current_user.id:
         return jsonify({'error': 'Only the creator can update this match night'}), 403
     
+    try:
+        booking = parse_booking(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if booking and not MatchNight.has_booking_columns():
+        return jsonify({'error': 'Database structure error: booking columns missing, run fix-schema'}), 500
+    
     try:
         if 'date' in data:
             # Parse date and time together
@@ -284,6 +383,9 @@ def update_match_night(match_night_id):
         if 'num_courts' in data:
             match_night.num_courts = data['num_courts']
         
+        for field, minutes in booking.items():
+            setattr(match_night, field, minutes)
+        
         db.session.commit()
         return jsonify({
             'message': 'Match night updated successfully',
@@ -307,13 +409,11 @@ def delete_match_night(match_night_id):
         return jsonify({'error': 'Only the creator can delete this match night'}), 403
     
     try:
-        # Delete all related data
-        Participation.query.filter_by(match_night_id=match_night_id).delete()
-        Match.query.filter_by(match_night_id=match_night_id).delete()
-        db.session.delete(match_night)
+        # Delete the match night with all related data
+        deleted = teardown_match_night(match_night_id)
         db.session.commit()
         
-        return jsonify({'message': 'Match night deleted successfully'}), 200
+        return jsonify({'message': 'Match night deleted successfully', 'deleted': deleted}), 200
         
     except Exception as e:
         db.session.rollback()
@@ -329,111 +429,70 @@ def delete_match_night_for_all(match_night_id):
     if match_night.creator_id != current_user.id:
         return jsonify({'error': 'Only the creator can delete this match night'}), 403
     
+    message = f'Match night at {match_night.location} on {match_night.date.strftime("%d-%m-%Y")} deleted successfully'
+    
     try:
-        # Get all matches for this match night
-        matches = Match.query.filter_by(match_night_id=match_night_id).all()
-        match_ids = [match.id for match in matches]
-        
-        # Delete all related data in the correct order
-        # 1. Delete match results first (foreign key constraint)
-        if match_ids:
-            MatchResult.query.filter(MatchResult.match_id.in_(match_ids)).delete()
-        
-        # 2. Delete player stats
-        PlayerStats.query.filter_by(match_night_id=match_night_id).delete()
-        
-        # 3. Delete matches
-        Match.query.filter_by(match_night_id=match_night_id).delete()
-        
-        # 4. Delete game schemas
-        GameSchema.query.filter_by(match_night_id=match_night_id).delete()
-        
-        # 5. Delete participations
-        Participation.query.filter_by(match_night_id=match_night_id).delete()
-        
-        # 6. Finally delete the match night itself
-        db.session.delete(match_night)
-        
+        # Delete the match night; related data goes with it
+        deleted = teardown_match_night(match_night_id)
         db.session.commit()
         
         return jsonify({
-            'message': f'Match night at {match_night.location} on {match_night.date.strftime("%d-%m-%Y")} deleted successfully',
-            'deleted_match_night_id': match_night_id
+            'message': message,
+            'deleted_match_night_id': match_night_id,
+            'deleted': deleted
         }), 200
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': f'Failed to delete match night: {str(e)}'}), 500
 
-    try:
-        # Get all matches for this match night
-        matches = Match.query.filter_by(match_night_id=match_night_id).all()
-        match_ids = [match.id for match in matches]
-        
-        # Delete all related data in the correct order
-        # 1. Delete match results first (foreign key constraint)
-        if match_ids:
-            MatchResult.query.filter(MatchResult.match_id.in_(match_ids)).delete()
-        
-        # 2. Delete player stats
-        PlayerStats.query.filter_by(match_night_id=match_night_id).delete()
-        
-        # 3. Delete matches
-        Match.query.filter_by(match_night_id=match_night_id).delete()
-        
-        # 4. Delete game schemas
-        GameSchema.query.filter_by(match_night_id=match_night_id).delete()
-        
-        # 5. Delete participations
-        Participation.query.filter_by(match_night_id=match_night_id).delete()
-        
-        # 6. Finally delete the match night itself
-        db.session.delete(match_night)
-        
-        db.session.commit()
-        
-        return jsonify({
-            'message': f'Completed match night at {match_night.location} on {match_night.date.strftime("%d-%m-%Y")} deleted successfully',
-            'deleted_match_night_id': match_night_id
-        }), 200
-        
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'error': f'Failed to delete completed match night: {str(e)}'}), 500
-
 @match_nights_bp.route('/<int:match_night_id>', methods=['GET'])
 @login_required
 def get_match_night(match_night_id):
     """Get specific match night with participants and matches"""
-    match_night = MatchNight.query.get_or_404(match_night_id)
+    # Fixed query plan: the night with its creator, participations -> users,
+    # player_stats -> users and game schemas, then all matches with their
+    # results. The number of queries does not depend on the number of players or matches.
+    options = [
+        joinedload(MatchNight.creator),
+        selectinload(MatchNight.participations).joinedload(Participation.user),
+        selectinload(MatchNight.player_stats).joinedload(PlayerStats.user),
+        selectinload(MatchNight.game_schemas)
+    ]
+    # Deferred columns that to_dict reads, in the same query
+    if MatchNight.has_booking_columns():
+        options.append(undefer_group('booking'))
+    if MatchNight.has_schedule_type_column():
+        options.append(undefer_group('schedule'))
+    match_night = MatchNight.query.options(*options).filter_by(id=match_night_id).first_or_404()
     
     # Check if user is the creator or a participant
     is_creator = match_night.creator_id == current_user.id
-    is_participant = Participation.query.filter_by(
-        user_id=current_user.id,
-        match_night_id=match_night_id
-    ).first() is not None
+    is_participant = any(p.user_id == current_user.id for p in match_night.participations)
     
     if not is_creator and not is_participant:
         return jsonify({'error': 'Access denied. You are not a participant or creator of this match night'}), 403
     
     # Get participants
-    participations = Participation.query.filter_by(match_night_id=match_night_id).all()
-    participants = [p.user.to_dict() for p in participations]
+    participants = [p.user.to_dict() for p in match_night.participations]
     
-    # Get matches with all relationships loaded
-    matches = Match.query.filter_by(match_night_id=match_night_id).order_by(Match.round, Match.court).all()
-    
-    # Load all player relationships for matches
-    for match in matches:
-        match.player1 = User.query.get(match.player1_id)
-        match.player2 = User.query.get(match.player2_id)
-        match.player3 = User.query.get(match.player3_id)
-        match.player4 = User.query.get(match.player4_id)
+    # Get matches with their results; player names come from the participants
+    matches = Match.query.options(joinedload(Match.result)).filter_by(
+        match_night_id=match_night_id
+    ).order_by(Match.round, Match.court).all()
+    user_names = {participant['id']: participant['name'] for participant in participants}
+    
+    # Naai-partijen only exist in everyone vs everyone games
+    naai_partij_ids = set()
+    for game_schema in match_night.game_schemas:
+        if game_schema.game_mode == 'everyone_vs_everyone':
+            naai_partij_ids |= find_naai_partij_ids(
+                [match for match in matches if match.game_schema_id == game_schema.id]
+            )
     
     result = match_night.to_dict()
     result['participants'] = participants
-    result['matches'] = [m.to_dict() for m in matches]
+    result['matches'] = serialize_matches(matches, user_names, naai_partij_ids)
     
     return jsonify(result), 200
 
@@ -459,8 +518,12 @@ def join_match_night(match_night_id):
     
     try:
         db.session.add(participation)
+        rescheduled = reschedule_active_game(match_night)
         db.session.commit()
-        return jsonify({'message': 'Successfully joined match night'}), 200
+        return jsonify({
+            'message': 'Successfully joined match night',
+            'rescheduled_matches': rescheduled
+        }), 200
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': 'Failed to join match night'}), 500
@@ -511,14 +574,19 @@ def leave_match_night(match_night_id):
     
     try:
         db.session.delete(participation)
+        rescheduled = reschedule_active_game(match_night)
         db.session.commit()
         
         if is_creator:
             return jsonify({
-                'message': f'Successfully left match night and transferred creator rights to {new_creator.name}'
+                'message': f'Successfully left match night and transferred creator rights to {new_creator.name}',
+                'rescheduled_matches': rescheduled
             }), 200
         else:
-            return jsonify({'message': 'Successfully left match night'}), 200
+            return jsonify({
+                'message': 'Successfully left match night',
+                'rescheduled_matches': rescheduled
+            }), 200
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': 'Failed to leave match night'}), 500
@@ -534,116 +602,221 @@ def generate_schedule(match_night_id):
         return jsonify({'error': 'Only the creator can generate the schedule'}), 403
     
     # Get all participants
-    participations = Participation.query.filter_by(match_night_id=match_night_id).all()
-    players = [p.user for p in participations]
+    participations = Participation.query.options(joinedload(Participation.user)).filter_by(
+        match_night_id=match_night_id
+    ).all()
+    # Sorted, so the same seed gives the same schedule
+    players = sorted((p.user for p in participations), key=lambda player: player.id)
+    user_names = {player.id: player.name for player in players}
     
     if len(players) < 4:
         return jsonify({'error': 'Need at least 4 players to generate schedule'}), 400
     
-    if len(players) % 4 != 0:
-        return jsonify({'error': 'Number of players must be divisible by 4'}), 400
+    data = request.get_json(silent=True) or {}
+    try:
+        seed = parse_seed(data)
+    except ValueError:
+        return jsonify({'error': 'Seed must be an integer'}), 400
+    
+    # One generation per match night at a time (double clicks, retried requests)
+    with match_night_lock(match_night_id) as acquired:
+        if acquired:
+            return generate_schedule_locked(match_night, players, user_names, data, seed)
+    # Another request is generating it: don't wait (that would block the worker)
+    return existing_schedule_response(match_night_id, user_names)
+
+def existing_schedule_response(match_night_id, user_names):
+    """
+    The saved schedule of a match night, for a request that didn't generate
+    it itself; 202 while another request is still generating it.
+    """
+    matches = Match.query.options(joinedload(Match.result)).filter_by(
+        match_night_id=match_night_id
+    ).order_by(Match.round, Match.court).all()
+    if not matches:
+        return jsonify({'message': 'The schedule is being generated, reload it shortly'}), 202
+    return jsonify({
+        'message': 'Schedule already generated',
+        'matches': serialize_matches(matches, user_names)
+    }), 200
+
+def generate_schedule_locked(match_night, players, user_names, data, seed):
+    """Generate and save the schedule of a match night; the caller holds the match night lock"""
+    match_night_id = match_night.id
     
-    # Check if schedule already exists
+    # Generated by an earlier request (retry): return it instead of an error
     existing_matches = Match.query.filter_by(match_night_id=match_night_id).first()
     if existing_matches:
-        return jsonify({'error': 'Schedule already exists for this match night'}), 400
+        return existing_schedule_response(match_night_id, user_names)
+    
+    booking = {}
+    if MatchNight.has_booking_columns():
+        booking = {field: getattr(match_night, field) for field in BOOKING_FIELDS}
+    if data.get('schedule_type') == 'booking' and not all(booking.values()):
+        return jsonify({'error': 'Set the booking duration and average match duration first'}), 400
     
     try:
         # Generate matches
-        matches = create_matches_for_night(
-            match_night_id=match_night_id,
-            players=players,
-            num_courts=match_night.num_courts,
-            schedule_type=request.json.get('schedule_type') if request.json else None
-        )
+        penalties = load_pair_penalties(match_night, [player.id for player in players])
+        generator = ScheduleGenerator(players, match_night.num_courts, seed=seed, penalties=penalties, **booking)
+        # Randomized formats: best of a fixed set of candidates for the seed,
+        # cached per (players, courts, type, seed)
+        schedule = generator.generate_best_schedule(data.get('schedule_type'))
+        print(f"Generated schedule for match night {match_night_id} with seed {seed}")
+        
+        # Never persist a schedule that breaks the basic invariants
+        problems = validate_schedule(schedule, [player.id for player in players])
+        if problems:
+            db.session.rollback()
+            return jsonify({'error': f'Generated schedule is invalid: {"; ".join(problems)}'}), 500
         
-        # Save matches to database
-        for match in matches:
-            db.session.add(match)
+        if MatchNight.has_schedule_type_column():
+            # Next Swiss rounds are only paired for Swiss schedules
+            match_night.schedule_type = generator.last_schedule_type
+        
+        # Save all matches to database in one round trip
+        matches = bulk_insert_matches(match_night_id, schedule)
         db.session.commit()
         
-        return jsonify({
+        response = {
             'message': 'Schedule generated successfully',
-            'matches': [match.to_dict() for match in matches]
-        }), 201
+            'matches': serialize_matches(matches, user_names),
+            'seed': seed
+        }
+        if generator.idle_minutes is not None:
+            # Booking schedules: expected minutes each player isn't playing
+            response['idle_minutes'] = {
+                user_id: {'name': user_names.get(user_id), 'minutes': minutes}
+                for user_id, minutes in generator.idle_minutes.items()
+            }
+        return jsonify(response), 201
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': f'Failed to generate schedule: {str(e)}'}), 500
 
+@match_nights_bp.route('/<int:match_night_id>/next-round', methods=['POST'])
+@login_required
+def generate_next_round(match_night_id):
+    """Pair the next Swiss round from the current standings"""
+    match_night = MatchNight.query.get_or_404(match_night_id)
+    
+    # Check if user is the creator
+    if match_night.creator_id != current_user.id:
+        return jsonify({'error': 'Only the creator can generate the next round'}), 403
+    
+    participant_ids = [user_id for (user_id,) in db.session.query(Participation.user_id).filter_by(
+        match_night_id=match_night_id
+    ).all()]
+    if len(participant_ids) < 4:
+        return jsonify({'error': 'Need at least 4 players to generate a round'}), 400
+    
+    if not MatchNight.has_schedule_type_column():
+        return jsonify({'error': 'Database structure error: schedule_type column missing, run fix-schema'}), 500
+    if match_night.schedule_type != 'swiss':
+        return jsonify({'error': 'Next rounds can only be generated for a Swiss schedule'}), 400
+    
+    # One round at a time per match night (double clicks, retried requests)
+    with match_night_lock(match_night_id) as acquired:
+        if acquired:
+            return generate_next_round_locked(match_night, participant_ids)
+    return jsonify({'error': 'The next round is already being generated'}), 409
+
+def generate_next_round_locked(match_night, participant_ids):
+    """Pair and save the next Swiss round; the caller holds the match night lock"""
+    match_night_id = match_night.id
+    
+    # Swiss pairs on results, so the current round has to be finished first.
+    # Checked under the lock, so a second request sees the round the first one created
+    unfinished = db.session.query(Match.id).outerjoin(MatchResult, MatchResult.match_id == Match.id).filter(
+        Match.match_night_id == match_night_id,
+        Match.game_schema_id.is_(None),
+        MatchResult.id.is_(None)
+    ).first()
+    if unfinished:
+        return jsonify({'error': 'Finish the current round before generating the next one'}), 400
+    
+    try:
+        schedule = next_swiss_round(match_night_id, participant_ids, match_night.num_courts)
+        matches = bulk_insert_matches(match_night_id, schedule)
+        db.session.commit()
+        
+        return jsonify({
+            'message': f'Round {schedule[0]["round"]} generated successfully',
+            'matches': serialize_matches(matches)
+        }), 201
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Failed to generate next round: {str(e)}'}), 500
+
 # Match routes
 @matches_bp.route('/<int:match_id>/result', methods=['POST'])
 @login_required
 def submit_match_result(match_id):
-    """Submit result for a match"""
-    match = Match.query.get_or_404(match_id)
+    """
+    Submit result for a match.
+    Writing the result, updating the player stats and (for King of the Court)
+    creating the next match happen in one transaction with one commit.
+    """
+    # Lock the match row so concurrent submissions for this match are applied one after the other
+    match = Match.query.options(
+        joinedload(Match.game_schema)
+    ).filter_by(id=match_id).with_for_update(of=Match).first_or_404()
     data = request.get_json()
     
     if not data:
         return jsonify({'error': 'No data provided'}), 400
     
-    # Check if result already exists
-    existing_result = MatchResult.query.filter_by(match_id=match_id).first()
-    if existing_result:
-        print(f"Updating existing result for match_id: {match_id}")
-        print(f"Existing winner_ids: {existing_result.winner_ids}")
-        
-        # Update existing result
-        existing_result.score = data.get('score')
-        
-        # Clear existing winner_ids first
-        existing_result.winner_ids = None
-        db.session.flush()  # Flush to clear the old value
-        
-        # Set new winner_ids
-        existing_result.set_winner_ids(data.get('winner_ids', []))
-        
-        try:
-            db.session.commit()
-            
-            # Update player stats after updating result
-            update_player_stats_for_match(match_id)
-            
-            return jsonify({'message': 'Result updated successfully', 'result': existing_result.to_dict()}), 200
-        except Exception as e:
-            db.session.rollback()
-            return jsonify({'error': f'Failed to update result: {str(e)}'}), 500
-    
-    result = MatchResult(
-        match_id=match_id,
-        score=data.get('score')
-    )
+    game_mode = match.game_schema.game_mode if match.game_schema else None
     
-    # Set winner_ids using the proper method
-    winner_ids = data.get('winner_ids', [])
-    result.set_winner_ids(winner_ids)
+    # Check if result already exists. Read after taking the lock: a result joined
+    # into the locking query would come from before a concurrent submission committed
+    result = MatchResult.query.filter_by(match_id=match_id).populate_existing().first()
+    is_update = result is not None
+    previous_score = result.score if is_update else None
     
     try:
-        db.session.add(result)
-        db.session.commit()
+        if is_update:
+            print(f"Updating existing result for match_id: {match_id}")
+            result.score = data.get('score')
+        else:
+            result = MatchResult(
+                match_id=match_id,
+                score=data.get('score')
+            )
+            match.result = result
+            db.session.add(result)
         
-        # Update player stats after submitting result
-        update_player_stats_for_match(match_id)
+        # Set winner_ids using the proper method
+        result.set_winner_ids(data.get('winner_ids', []))
         
-        # Check if this is King of the Court and generate next match
-        next_match = None
-        if match.game_schema_id:
-            game_schema = GameSchema.query.get(match.game_schema_id)
-            if game_schema and game_schema.game_mode == 'king_of_the_court':
-                next_match = generate_next_king_of_the_court_match(match)
+        # Apply the change in points for this match to the player stats
+        update_player_stats_for_match(match, game_mode, previous_score)
         
-        response_data = {
-            'message': 'Result submitted successfully', 
-            'result': result.to_dict()
-        }
+        # Check if this is King of the Court and generate the next round once all courts are done
+        next_matches = []
+        if not is_update and game_mode == 'king_of_the_court':
+            next_matches = generate_next_king_of_the_court_round(match)
         
-        if next_match:
-            response_data['next_match'] = next_match.to_dict()
+        db.session.flush()
+        response_data = {'result': result.to_dict()}
+        if next_matches:
+            response_data['next_matches'] = serialize_matches(next_matches)
+            response_data['next_match'] = response_data['next_matches'][0]
         
-        return jsonify(response_data), 201
+        db.session.commit()
     except Exception as e:
         db.session.rollback()
-        return jsonify({'error': f'Failed to submit result: {str(e)}'}), 500
+        action = 'update' if is_update else 'submit'
+        return jsonify({'error': f'Failed to {action} result: {str(e)}'}), 500
+    
+    if is_update:
+        response_data['message'] = 'Result updated successfully'
+        return jsonify(response_data), 200
+    
+    response_data['message'] = 'Result submitted successfully'
+    return jsonify(response_data), 201
 
 @matches_bp.route('/<int:match_id>/result', methods=['GET'])
 @login_required
@@ -663,6 +836,7 @@ def init_database():
     try:
         # Create all tables
         db.create_all()
+        schema_capabilities.refresh()
         
         # Check if test users already exist
         existing_user = User.query.filter_by(email='test@example.com').first()
@@ -762,10 +936,12 @@ def add_participant(match_night_id):
     
     try:
         db.session.add(participation)
+        rescheduled = reschedule_active_game(match_night)
         db.session.commit()
         return jsonify({
             'message': f'Successfully added {user.name} to match night',
-            'participation': participation.to_dict()
+            'participation': participation.to_dict(),
+            'rescheduled_matches': rescheduled
         }), 201
     except Exception as e:
         db.session.rollback()
@@ -799,8 +975,12 @@ def remove_participant(match_night_id):
     
     try:
         db.session.delete(participation)
+        rescheduled = reschedule_active_game(match_night)
         db.session.commit()
-        return jsonify({'message': 'Successfully removed participant from match night'}), 200
+        return jsonify({
+            'message': 'Successfully removed participant from match night',
+            'rescheduled_matches': rescheduled
+        }), 200
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': 'Failed to remove participant'}), 500
@@ -894,23 +1074,16 @@ def test_current_user():
         print("User found in database")
         
         # Check if creator_id column exists before querying
-        with db.engine.connect() as connection:
-            columns = connection.execute(db.text("""
-                SELECT column_name 
-                FROM information_schema.columns 
-                WHERE table_name = 'match_nights' AND table_schema = 'public'
-            """)).fetchall()
-            
-            column_names = [col[0] for col in columns]
-            print(f"Match_nights columns: {column_names}")
-            
-            if 'creator_id' not in column_names:
-                print("creator_id column missing, skipping match nights query")
-                created_match_nights = []
-            else:
-                # Get user's match nights
-                created_match_nights = MatchNight.query.filter_by(creator_id=current_user.id).all()
-                print(f"Found {len(created_match_nights)} created match nights")
+        column_names = schema_capabilities.columns('match_nights')
+        print(f"Match_nights columns: {column_names}")
+        
+        if 'creator_id' not in column_names:
+            print("creator_id column missing, skipping match nights query")
+            created_match_nights = []
+        else:
+            # Get user's match nights
+            created_match_nights = MatchNight.query.filter_by(creator_id=current_user.id).all()
+            print(f"Found {len(created_match_nights)} created match nights")
         
         participations = Participation.query.filter_by(user_id=current_user.id).all()
         print(f"Found {len(participations)} participations")
@@ -983,6 +1156,7 @@ def create_tables():
         
         # Create all tables
         db.create_all()
+        schema_capabilities.refresh()
         print("Database tables created successfully!")
         
         # Verify tables were created
@@ -1067,6 +1241,16 @@ def fix_match_nights_table():
             else:
                 print("created_at column already exists")
             
+            for column_name, column_type in (('booking_minutes', 'INTEGER'), ('avg_match_minutes', 'INTEGER'),
+                                             ('schedule_type', 'VARCHAR(20)')):
+                if column_name not in column_names:
+                    print(f"Adding {column_name} column...")
+                    try:
+                        connection.execute(db.text(f"ALTER TABLE match_nights ADD COLUMN {column_name} {column_type}"))
+                        print(f"{column_name} column added successfully")
+                    except Exception as e:
+                        print(f"Failed to add {column_name} column: {str(e)}")
+            
             connection.commit()
             print("Match_nights table fixed successfully!")
             
@@ -1080,6 +1264,8 @@ def fix_match_nights_table():
             column_names_after = [col[0] for col in columns_after]
             print(f"Match_nights columns after fix: {column_names_after}")
         
+        schema_capabilities.refresh()
+        
         return jsonify({
             'message': 'Match_nights table fixed successfully',
             'columns': column_names_after,
@@ -1143,6 +1329,7 @@ def reinitialize_database():
         
         # Create all tables
         db.create_all()
+        schema_capabilities.refresh()
         print("Database tables created successfully!")
         
         # Clear existing data
@@ -1219,7 +1406,7 @@ def debug_database():
     """Debug endpoint to check database state"""
     try:
         users = User.query.all()
-        match_nights = MatchNight.query.all()
+        match_nights = MatchNight.query.options(joinedload(MatchNight.creator)).all()
         participations = Participation.query.all()
         
         # Try to get matches, but handle missing column error
@@ -1235,7 +1422,7 @@ def debug_database():
             'users_count': len(users),
             'users': [user.to_dict() for user in users],
             'match_nights_count': len(match_nights),
-            'match_nights': [mn.to_dict() for mn in match_nights],
+            'match_nights': serialize_match_nights(match_nights),
             'participations_count': len(participations),
             'matches_count': matches_count
         }), 200
@@ -1287,7 +1474,10 @@ def fix_database_schema():
                             num_courts INTEGER DEFAULT 1,
                             creator_id INTEGER NOT NULL REFERENCES users(id),
                             game_status VARCHAR(20) DEFAULT 'not_started',
-                            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                            booking_minutes INTEGER,
+                            avg_match_minutes INTEGER,
+                            schedule_type VARCHAR(20)
                         )
                     """))
                     print("match_nights table created successfully")
@@ -1302,7 +1492,7 @@ def fix_database_schema():
                         CREATE TABLE participations (
                             id SERIAL PRIMARY KEY,
                             user_id INTEGER NOT NULL REFERENCES users(id),
-                            match_night_id INTEGER NOT NULL REFERENCES match_nights(id),
+                            match_night_id INTEGER NOT NULL REFERENCES match_nights(id) ON DELETE CASCADE,
                             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                             CONSTRAINT unique_user_match_night UNIQUE (user_id, match_night_id)
                         )
@@ -1318,15 +1508,16 @@ def fix_database_schema():
                     connection.execute(db.text("""
                         CREATE TABLE matches (
                             id SERIAL PRIMARY KEY,
-                            match_night_id INTEGER NOT NULL REFERENCES match_nights(id),
-                            game_schema_id INTEGER REFERENCES game_schemas(id),
+                            match_night_id INTEGER NOT NULL REFERENCES match_nights(id) ON DELETE CASCADE,
+                            game_schema_id INTEGER REFERENCES game_schemas(id) ON DELETE CASCADE,
                             player1_id INTEGER NOT NULL REFERENCES users(id),
                             player2_id INTEGER NOT NULL REFERENCES users(id),
                             player3_id INTEGER NOT NULL REFERENCES users(id),
                             player4_id INTEGER NOT NULL REFERENCES users(id),
                             round INTEGER NOT NULL,
                             court INTEGER NOT NULL,
-                            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                            CONSTRAINT unique_game_schema_round_court UNIQUE (game_schema_id, round, court)
                         )
                     """))
                     print("matches table created successfully")
@@ -1340,10 +1531,11 @@ def fix_database_schema():
                     connection.execute(db.text("""
                         CREATE TABLE match_results (
                             id SERIAL PRIMARY KEY,
-                            match_id INTEGER NOT NULL REFERENCES matches(id),
+                            match_id INTEGER NOT NULL REFERENCES matches(id) ON DELETE CASCADE,
                             score VARCHAR(50),
                             winner_ids TEXT,
-                            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                            CONSTRAINT unique_match_result_match UNIQUE (match_id)
                         )
                     """))
                     print("match_results table created successfully")
@@ -1357,7 +1549,7 @@ def fix_database_schema():
                     connection.execute(db.text("""
                         CREATE TABLE game_schemas (
                             id SERIAL PRIMARY KEY,
-                            match_night_id INTEGER NOT NULL REFERENCES match_nights(id),
+                            match_night_id INTEGER NOT NULL REFERENCES match_nights(id) ON DELETE CASCADE,
                             game_mode VARCHAR(50) NOT NULL,
                             status VARCHAR(20) DEFAULT 'pending',
                             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
@@ -1374,7 +1566,7 @@ def fix_database_schema():
                     connection.execute(db.text("""
                         CREATE TABLE player_stats (
                             id SERIAL PRIMARY KEY,
-                            match_night_id INTEGER NOT NULL REFERENCES match_nights(id),
+                            match_night_id INTEGER NOT NULL REFERENCES match_nights(id) ON DELETE CASCADE,
                             user_id INTEGER NOT NULL REFERENCES users(id),
                             total_points INTEGER DEFAULT 0,
                             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -1424,9 +1616,103 @@ def fix_database_schema():
                 except Exception as e:
                     print(f"Failed to migrate player_stats: {str(e)}")
             
+            # Create match_point_contributions table if it doesn't exist
+            if 'match_point_contributions' not in table_names:
+                print("Creating match_point_contributions table...")
+                try:
+                    connection.execute(db.text("""
+                        CREATE TABLE match_point_contributions (
+                            id SERIAL PRIMARY KEY,
+                            match_id INTEGER NOT NULL REFERENCES matches(id) ON DELETE CASCADE,
+                            user_id INTEGER NOT NULL REFERENCES users(id),
+                            points INTEGER NOT NULL DEFAULT 0,
+                            CONSTRAINT unique_match_point_contribution UNIQUE (match_id, user_id)
+                        )
+                    """))
+                    print("match_point_contributions table created successfully")
+                except Exception as e:
+                    print(f"Failed to create match_point_contributions table: {str(e)}")
+            
+            # Create king_of_the_court_queues table if it doesn't exist
+            if 'king_of_the_court_queues' not in table_names:
+                print("Creating king_of_the_court_queues table...")
+                try:
+                    connection.execute(db.text("""
+                        CREATE TABLE king_of_the_court_queues (
+                            game_schema_id INTEGER PRIMARY KEY REFERENCES game_schemas(id) ON DELETE CASCADE,
+                            waiting_ids TEXT NOT NULL DEFAULT '[]',
+                            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                        )
+                    """))
+                    print("king_of_the_court_queues table created successfully")
+                except Exception as e:
+                    print(f"Failed to create king_of_the_court_queues table: {str(e)}")
+            
+            # Optional court booking of a match night (booking schedule type) and
+            # the schedule type generate-schedule used (next Swiss rounds)
+            try:
+                with connection.begin_nested():
+                    for column_name, column_type in (('booking_minutes', 'INTEGER'), ('avg_match_minutes', 'INTEGER'),
+                                                     ('schedule_type', 'VARCHAR(20)')):
+                        connection.execute(db.text(
+                            f"ALTER TABLE match_nights ADD COLUMN IF NOT EXISTS {column_name} {column_type}"
+                        ))
+                print("match_nights booking and schedule_type columns ensured")
+            except Exception as e:
+                print(f"Failed to add match_nights booking and schedule_type columns: {str(e)}")
+            
+            # One match per court per round of a game. Duplicates from concurrent
+            # result submissions are removed first, keeping the match with a result
+            # (or the oldest one)
+            try:
+                with connection.begin_nested():
+                    result = connection.execute(db.text("""
+                        DELETE FROM matches m
+                        USING matches keep
+                        WHERE m.game_schema_id = keep.game_schema_id
+                          AND m.round = keep.round
+                          AND m.court = keep.court
+                          AND m.id <> keep.id
+                          AND NOT EXISTS (SELECT 1 FROM match_results r WHERE r.match_id = m.id)
+                          AND (EXISTS (SELECT 1 FROM match_results r WHERE r.match_id = keep.id) OR m.id > keep.id)
+                    """))
+                    print(f"Removed {result.rowcount} duplicate matches")
+                    connection.execute(db.text(
+                        "CREATE UNIQUE INDEX IF NOT EXISTS unique_game_schema_round_court "
+                        "ON matches (game_schema_id, round, court)"
+                    ))
+            except Exception as e:
+                print(f"Failed to create unique_game_schema_round_court index: {str(e)}")
+            
+            # One result per match. Duplicates from concurrent submissions are
+            # removed first, keeping the oldest result
+            try:
+                with connection.begin_nested():
+                    result = connection.execute(db.text("""
+                        DELETE FROM match_results r
+                        USING match_results keep
+                        WHERE r.match_id = keep.match_id
+                          AND r.id > keep.id
+                    """))
+                    print(f"Removed {result.rowcount} duplicate match results")
+                    connection.execute(db.text(
+                        "CREATE UNIQUE INDEX IF NOT EXISTS unique_match_result_match ON match_results (match_id)"
+                    ))
+            except Exception as e:
+                print(f"Failed to create unique_match_result_match index: {str(e)}")
+            
+            # Indexes for the paginated match nights listing
+            try:
+                connection.execute(db.text("CREATE INDEX IF NOT EXISTS idx_match_nights_date_id ON match_nights (date, id)"))
+                connection.execute(db.text("CREATE INDEX IF NOT EXISTS idx_match_nights_creator_id ON match_nights (creator_id)"))
+            except Exception as e:
+                print(f"Failed to create match_nights indexes: {str(e)}")
+            
             connection.commit()
             print("Database schema fixed successfully!")
         
+        schema_capabilities.refresh()
+        
         return jsonify({
             'message': 'Database schema fixed successfully',
             'status': 'success'
@@ -1446,6 +1732,9 @@ def debug_matches(match_night_id):
     try:
         matches = Match.query.filter_by(match_night_id=match_night_id).all()
         
+        # Load all player names in one query
+        user_names = load_user_names(player_id for match in matches for player_id in match.player_ids)
+        
         matches_data = []
         for match in matches:
             match_data = {
@@ -1460,16 +1749,10 @@ def debug_matches(match_night_id):
                 'created_at': match.created_at.isoformat() if match.created_at else None
             }
             
-            # Load player names
-            player1 = User.query.get(match.player1_id)
-            player2 = User.query.get(match.player2_id)
-            player3 = User.query.get(match.player3_id)
-            player4 = User.query.get(match.player4_id)
-            
-            match_data['player1_name'] = player1.name if player1 else 'Unknown'
-            match_data['player2_name'] = player2.name if player2 else 'Unknown'
-            match_data['player3_name'] = player3.name if player3 else 'Unknown'
-            match_data['player4_name'] = player4.name if player4 else 'Unknown'
+            match_data['player1_name'] = user_names.get(match.player1_id) or 'Unknown'
+            match_data['player2_name'] = user_names.get(match.player2_id) or 'Unknown'
+            match_data['player3_name'] = user_names.get(match.player3_id) or 'Unknown'
+            match_data['player4_name'] = user_names.get(match.player4_id) or 'Unknown'
             
             matches_data.append(match_data)
         
@@ -1494,26 +1777,15 @@ def clear_matches(match_night_id):
         return jsonify({'error': 'Only the creator can clear matches'}), 403
     
     try:
-        # First, get all matches for this match night
-        matches = Match.query.filter_by(match_night_id=match_night_id).all()
-        match_ids = [match.id for match in matches]
-        
-        # Delete all match results for these matches first
-        match_results_deleted = 0
-        if match_ids:
-            match_results_deleted = MatchResult.query.filter(MatchResult.match_id.in_(match_ids)).delete()
-        
-        # Now delete all matches for this match night
-        matches_deleted = Match.query.filter_by(match_night_id=match_night_id).delete()
-        
-        # Delete all player stats for this match night
-        player_stats_deleted = PlayerStats.query.filter_by(match_night_id=match_night_id).delete()
-        
-        # Also delete any game schemas
-        game_schemas_deleted = GameSchema.query.filter_by(match_night_id=match_night_id).delete()
-        
+        # Delete matches, match results, player stats and game schemas
+        deleted = clear_game_data(match_night_id)
         db.session.commit()
         
+        matches_deleted = deleted['matches']
+        match_results_deleted = deleted['match_results']
+        player_stats_deleted = deleted['player_stats']
+        game_schemas_deleted = deleted['game_schemas']
+        
         return jsonify({
             'message': f'Cleared {matches_deleted} matches, {match_results_deleted} match results, {player_stats_deleted} player stats, and {game_schemas_deleted} game schemas',
             'matches_deleted': matches_deleted,
@@ -1540,6 +1812,11 @@ def start_game(match_night_id):
     if game_mode not in ['everyone_vs_everyone', 'king_of_the_court']:
         return jsonify({'error': 'Invalid game mode'}), 400
     
+    try:
+        seed = parse_seed(data)
+    except ValueError:
+        return jsonify({'error': 'Seed must be an integer'}), 400
+    
     # Get match night
     match_night = MatchNight.query.get_or_404(match_night_id)
     
@@ -1552,36 +1829,31 @@ def start_game(match_night_id):
     if len(participants) < 4:
         return jsonify({'error': 'Need at least 4 participants to start a game'}), 400
     
-    # Check if a game is already active
-    existing_game = GameSchema.query.filter_by(
-        match_night_id=match_night_id,
-        status='active'
-    ).first()
+    # A retried request (same Idempotency-Key) gets the game the first one started
+    idempotency_key = request.headers.get('Idempotency-Key')
+    if idempotency_key and started_games.get(match_night_id, idempotency_key):
+        return active_game_response(match_night_id, len(participants))
     
-    if existing_game:
-        # Clear existing game data before starting new game
-        try:
-            # Get all matches for this match night
-            matches = Match.query.filter_by(match_night_id=match_night_id).all()
-            match_ids = [match.id for match in matches]
-            
-            # Delete all match results for these matches first
-            if match_ids:
-                MatchResult.query.filter(MatchResult.match_id.in_(match_ids)).delete()
-            
-            # Delete all matches for this match night
-            Match.query.filter_by(match_night_id=match_night_id).delete()
-            
-            # Delete all player stats for this match night
-            PlayerStats.query.filter_by(match_night_id=match_night_id).delete()
-            
-            # Delete the existing game schema
-            db.session.delete(existing_game)
-            
-            db.session.commit()
-        except Exception as e:
-            db.session.rollback()
-            return jsonify({'error': f'Failed to clear existing game data: {str(e)}'}), 500
+    # One start per match night at a time (double clicks, retried requests)
+    with match_night_lock(match_night_id) as acquired:
+        if acquired:
+            return start_game_locked(match_night, game_mode, seed, len(participants), idempotency_key)
+    return game_started_by_other_request(match_night_id, len(participants))
+
+def start_game_locked(match_night, game_mode, seed, participants_count, idempotency_key=None):
+    """Replace the active game of a match night by a new one; the caller holds the match night lock"""
+    match_night_id = match_night.id
+    
+    # Started by a retried request while this one waited for the lock
+    if idempotency_key and started_games.get(match_night_id, idempotency_key):
+        return active_game_response(match_night_id, participants_count)
+    
+    # Clear existing game data before starting new game
+    try:
+        clear_active_game(match_night_id)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Failed to clear existing game data: {str(e)}'}), 500
     
     try:
         # Create new game schema
@@ -1596,23 +1868,213 @@ def start_game(match_night_id):
         match_night.game_status = 'active'
         
         db.session.commit()
+        if idempotency_key:
+            started_games.add(match_night_id, idempotency_key, game_schema.id)
         
         # Generate matches based on game mode
         matches = []
+        print(f"Starting {game_mode} for match night {match_night_id} with seed {seed}")
         try:
             if game_mode == 'everyone_vs_everyone':
-                matches = generate_everyone_vs_everyone_matches(match_night, game_schema)
+                matches = generate_everyone_vs_everyone_matches(match_night, game_schema, seed)
             elif game_mode == 'king_of_the_court':
-                matches = generate_king_of_the_court_matches(match_night, game_schema)
+                matches = generate_king_of_the_court_matches(match_night, game_schema, seed)
         except Exception as e:
             # Don't fail the entire request, just log the error
             pass
         
         return jsonify({
             'message': f'Game started successfully with mode: {game_mode}',
-            'game_schema': game_schema.to_dict(),
+            'game_schema': game_schema.to_dict(matches),
             'matches_created': len(matches),
-            'participants_count': len(participants)
+            'participants_count': participants_count,
+            'seed': seed
+        }), 201
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Failed to start game: {str(e)}'}), 500
+
+def game_started_by_other_request(match_night_id, participants_count):
+    """
+    Response for a request that found another request starting a game for
+    the same match night: the game as far as it is saved, without waiting
+    for the other request (that would block the worker).
+    """
+    return active_game_response(match_night_id, participants_count, in_progress=True)
+
+def active_game_response(match_night_id, participants_count, in_progress=False):
+    """
+    The active game of a match night, for a request that didn't start it
+    itself. Without an active game: 202 if another request is still
+    starting it (in_progress), otherwise 409.
+    """
+    game_schema = GameSchema.query.filter_by(
+        match_night_id=match_night_id,
+        status='active'
+    ).order_by(GameSchema.id.desc()).first()
+    if not game_schema:
+        if in_progress:
+            return jsonify({'message': 'A game is being started for this match night, check its status shortly'}), 202
+        return jsonify({'error': 'Failed to start game, please try again'}), 409
+    
+    return jsonify({
+        'message': f'Game already started with mode: {game_schema.game_mode}',
+        'game_schema': game_schema.to_dict(),
+        'matches_created': 0,
+        'participants_count': participants_count
+    }), 200
+
+@game_schemas_bp.route('/<int:match_night_id>/preview', methods=['POST'])
+@login_required
+def preview_game(match_night_id):
+    """
+    Generate a schedule for a game mode without saving anything. Returns the
+    matches, their quality metrics and a token to confirm this exact schedule.
+    """
+    data = request.get_json()
+    
+    if not data or 'game_mode' not in data:
+        return jsonify({'error': 'Game mode is required'}), 400
+    
+    game_mode = data['game_mode']
+    if game_mode not in ['everyone_vs_everyone', 'king_of_the_court']:
+        return jsonify({'error': 'Invalid game mode'}), 400
+    
+    try:
+        seed = parse_seed(data)
+    except ValueError:
+        return jsonify({'error': 'Seed must be an integer'}), 400
+    
+    match_night = MatchNight.query.get_or_404(match_night_id)
+    
+    # Check if user is the creator
+    if match_night.creator_id != current_user.id:
+        return jsonify({'error': 'Only the creator can preview a game'}), 403
+    
+    participations = Participation.query.options(joinedload(Participation.user)).filter_by(
+        match_night_id=match_night_id
+    ).all()
+    participant_ids = sorted(p.user_id for p in participations)
+    if len(participant_ids) < 4:
+        return jsonify({'error': 'Need at least 4 participants to start a game'}), 400
+    user_names = {p.user_id: p.user.name for p in participations}
+    
+    waiting_ids = []
+    if game_mode == 'everyone_vs_everyone':
+        penalties = load_pair_penalties(match_night, participant_ids)
+        match_rows = everyone_vs_everyone_rows(participant_ids, match_night.num_courts or 1, seed, penalties)
+    else:
+        lineup = king_of_the_court_lineup(participant_ids, seed)
+        match_rows = king_of_the_court_rows(lineup, match_night.num_courts or 1)
+        waiting_ids = lineup[4 * len(match_rows):]
+    
+    token = schedule_previews.add({
+        'match_night_id': match_night_id,
+        'game_mode': game_mode,
+        'seed': seed,
+        'participant_ids': participant_ids,
+        'match_rows': match_rows,
+        'waiting_ids': waiting_ids
+    })
+    
+    # Unsaved matches, serialized like the saved ones (without id)
+    matches = [Match(match_night_id=match_night_id, **row) for row in match_rows]
+    naai_partij_positions = set()
+    if game_mode == 'everyone_vs_everyone':
+        naai_partij_positions = find_naai_partij_ids(
+            [SimpleNamespace(id=position, **row) for position, row in enumerate(match_rows)]
+        )
+    
+    return jsonify({
+        'game_mode': game_mode,
+        'matches': [match.to_dict(user_names, position in naai_partij_positions)
+                    for position, match in enumerate(matches)],
+        'metrics': evaluate_schedule(match_rows, participant_ids,
+                                     require_all_pairs=game_mode == 'everyone_vs_everyone'),
+        'preview_token': token,
+        'expires_in': schedule_previews.ttl,
+        'seed': seed
+    }), 200
+
+@game_schemas_bp.route('/<int:match_night_id>/confirm', methods=['POST'])
+@login_required
+def confirm_game(match_night_id):
+    """Start a game with a previewed schedule, saved in one bulk insert"""
+    data = request.get_json()
+    
+    if not data or 'preview_token' not in data:
+        return jsonify({'error': 'Preview token is required'}), 400
+    
+    match_night = MatchNight.query.get_or_404(match_night_id)
+    
+    # Check if user is the creator
+    if match_night.creator_id != current_user.id:
+        return jsonify({'error': 'Only the creator can start a game'}), 403
+    
+    token = data['preview_token']
+    preview = schedule_previews.get(token)
+    if preview is None or preview['match_night_id'] != match_night_id:
+        return jsonify({'error': 'Preview not found or expired, please preview again'}), 404
+    # Repeated confirm (double click, retried request): return the game it started
+    if preview.get('confirmed'):
+        return active_game_response(match_night_id, len(preview['participant_ids']))
+    
+    # The schedule is only valid for the players it was made for
+    participant_ids = sorted(user_id for (user_id,) in db.session.query(Participation.user_id).filter_by(
+        match_night_id=match_night_id
+    ).all())
+    if participant_ids != preview['participant_ids']:
+        return jsonify({'error': 'Participants changed since the preview, please preview again'}), 409
+    
+    # One start per match night at a time (double clicks, retried requests)
+    with match_night_lock(match_night_id) as acquired:
+        if acquired:
+            return confirm_game_locked(match_night, token, len(participant_ids))
+    return game_started_by_other_request(match_night_id, len(participant_ids))
+
+def confirm_game_locked(match_night, token, participants_count):
+    """Start the game of a preview; the caller holds the match night lock"""
+    match_night_id = match_night.id
+    
+    # Confirmed by an earlier request in the meantime
+    preview = schedule_previews.get(token)
+    if preview is None or preview.get('confirmed'):
+        return active_game_response(match_night_id, participants_count)
+    
+    # Clear existing game data before starting new game
+    try:
+        clear_active_game(match_night_id)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Failed to clear existing game data: {str(e)}'}), 500
+    
+    try:
+        game_schema = GameSchema(
+            match_night_id=match_night_id,
+            game_mode=preview['game_mode'],
+            status='active'
+        )
+        db.session.add(game_schema)
+        db.session.flush()
+        
+        matches = bulk_insert_matches(match_night_id, preview['match_rows'], game_schema_id=game_schema.id)
+        if preview['game_mode'] == 'king_of_the_court':
+            create_queue(game_schema.id, preview['waiting_ids'])
+        
+        # Update match night game status
+        match_night.game_status = 'active'
+        
+        db.session.commit()
+        schedule_previews.mark_confirmed(token)
+        print(f"Confirmed {preview['game_mode']} preview for match night {match_night_id} with seed {preview['seed']}")
+        
+        return jsonify({
+            'message': f"Game started successfully with mode: {preview['game_mode']}",
+            'game_schema': game_schema.to_dict(matches),
+            'matches_created': len(matches),
+            'participants_count': participants_count,
+            'seed': preview['seed']
         }), 201
         
     except Exception as e:
@@ -1707,66 +2169,163 @@ def complete_game(match_night_id):
         db.session.rollback()
         return jsonify({'error': f'Failed to complete game: {str(e)}'}), 500
 
-def generate_everyone_vs_everyone_matches(match_night, game_schema):
+def clear_active_game(match_night_id):
+    """Delete the active game of a match night with its matches, results and player stats. Commits."""
+    existing_game = GameSchema.query.filter_by(
+        match_night_id=match_night_id,
+        status='active'
+    ).first()
+    
+    if existing_game:
+        # Delete all matches, results and player stats plus the existing game schema
+        clear_game_data(match_night_id, game_schema_id=existing_game.id)
+        db.session.expunge(existing_game)
+        db.session.commit()
+
+def reschedule_active_game(match_night):
+    """
+    Fit the active game to the current participants after someone joined or
+    left. Matches with a result are kept. For everyone vs everyone the
+    current (earliest unfinished) round is kept too, except matches of
+    players who left; the rounds after it are replaced by matches for the
+    pairs that haven't played together yet. For king of the court
+    the queue is updated (see update_king_of_the_court_queue). Does not commit.
+    
+    Returns:
+        Number of new (or changed) matches, or None if there is no game to reschedule
+    """
+    game_schema = GameSchema.query.filter_by(
+        match_night_id=match_night.id,
+        status='active'
+    ).first()
+    if not game_schema:
+        return None
+    
+    # Make the added/deleted participation visible to the query below
+    db.session.flush()
+    participant_ids = sorted(user_id for (user_id,) in db.session.query(Participation.user_id).filter_by(
+        match_night_id=match_night.id
+    ).all())
+    
+    matches = db.session.query(Match, MatchResult.id).outerjoin(
+        MatchResult, MatchResult.match_id == Match.id
+    ).filter(Match.game_schema_id == game_schema.id).all()
+    
+    if game_schema.game_mode == 'king_of_the_court':
+        unplayed_matches = [match for match, result_id in matches if result_id is None]
+        return update_king_of_the_court_queue(match_night, game_schema, participant_ids, unplayed_matches)
+    
+    # The current round may be on court right now: keep it, unless a player left
+    present = set(participant_ids)
+    unplayed_matches = [match for match, result_id in matches if result_id is None]
+    current_round = min((match.round for match in unplayed_matches), default=None)
+    played_matches = [match for match, result_id in matches if result_id is not None] + [
+        match for match in unplayed_matches
+        if match.round == current_round and present.issuperset(match.player_ids)
+    ]
+    kept_ids = {match.id for match in played_matches}
+    unplayed_ids = [match.id for match in unplayed_matches if match.id not in kept_ids]
+    
+    if unplayed_ids:
+        Match.query.filter(Match.id.in_(unplayed_ids)).delete(synchronize_session=False)
+    if len(participant_ids) < 4:
+        return 0
+    
+    # Pairs that already played together aren't scheduled again
+    rounds = reschedule_everyone_vs_everyone(
+        participant_ids,
+        [((match.player1_id, match.player2_id), (match.player3_id, match.player4_id)) for match in played_matches],
+        match_night.num_courts or 1
+    )
+    first_round = max((match.round for match in played_matches), default=0) + 1
+    match_rows = []
+    for round_num, round_matches in enumerate(rounds, first_round):
+        for court, (pair1, pair2) in enumerate(round_matches, 1):
+            match_rows.append({
+                'player1_id': pair1[0],
+                'player2_id': pair1[1],
+                'player3_id': pair2[0],
+                'player4_id': pair2[1],
+                'round': round_num,
+                'court': court
+            })
+    
+    bulk_insert_matches(match_night.id, match_rows, game_schema_id=game_schema.id)
+    print(f"Rescheduled match night {match_night.id}: kept {len(played_matches)} played or current matches, "
+          f"replaced {len(unplayed_ids)} unplayed by {len(match_rows)}")
+    return len(match_rows)
+
+def update_king_of_the_court_queue(match_night, game_schema, participant_ids, unplayed_matches):
+    """
+    Players who joined queue at the back, players who left leave the queue.
+    A player who left while on court is replaced by the front of the queue;
+    if nobody is waiting the match is dropped and its other players queue
+    at the front. Does not commit.
+    
+    Returns:
+        Number of changed matches
+    """
+    on_court = [player_id for match in unplayed_matches for player_id in match.player_ids]
+    queue, waiting = load_queue(match_night.id, game_schema.id, on_court)
+    
+    present = set(participant_ids)
+    known = set(waiting) | set(on_court)
+    waiting = deque(user_id for user_id in waiting if user_id in present)
+    waiting.extend(user_id for user_id in participant_ids if user_id not in known)
+    
+    changed = 0
+    for match in unplayed_matches:
+        missing = [slot for slot in ('player1_id', 'player2_id', 'player3_id', 'player4_id')
+                   if getattr(match, slot) not in present]
+        if not missing:
+            continue
+        if len(waiting) < len(missing):
+            # Nobody to replace them: the others of this match go to the front of the queue
+            waiting.extendleft(reversed([player_id for player_id in match.player_ids if player_id in present]))
+            db.session.delete(match)
+        else:
+            for slot in missing:
+                setattr(match, slot, waiting.popleft())
+        changed += 1
+    
+    if queue is not None:
+        queue.set_waiting_ids(waiting)
+    return changed
+
+def everyone_vs_everyone_rows(participant_ids, num_courts=1, seed=None, penalties=None):
+    """Match rows (players, round, court) of an everyone vs everyone game, nothing is saved"""
+    # Every pair plays together exactly once, for any number of players,
+    # with up to num_courts matches in parallel per round. The schedule only
+    # depends on the number of players and courts, so it is built once (from
+    # the precomputed table or the engine) and relabeled with these players.
+    template = everyone_vs_everyone_template(len(participant_ids), num_courts)
+    
+    # Shuffle participant IDs to get random player assignments
+    # The seed decides the assignment, so the same seed gives the same night.
+    # With history of earlier nights (penalties), the assignment with the
+    # fewest familiar opponents of several draws is used.
+    rng = random.Random(seed)
+    candidates = []
+    for _ in range(VARIETY_DRAWS if penalties else 1):
+        shuffled_participant_ids = sorted(participant_ids)
+        rng.shuffle(shuffled_participant_ids)
+        candidates.append(relabel(template, shuffled_participant_ids))
+    return best_assignment(candidates, penalties)
+
+def generate_everyone_vs_everyone_matches(match_night, game_schema, seed=None):
     """Generate matches for everyone vs everyone mode using pair-based scheduling"""
     participants = Participation.query.filter_by(match_night_id=match_night.id).all()
     participant_ids = [p.user_id for p in participants]
     
-    if len(participant_ids) not in [4, 5, 6, 7, 8]:
+    if len(participant_ids) < 4:
         return []
     
-    # Shuffle participant IDs to get random player assignments
-    # This ensures different schedules each time while keeping the same algorithm
-    shuffled_participant_ids = participant_ids.copy()
-    random.shuffle(shuffled_participant_ids)
-    
-    # Generate all possible unique pairs
-    all_pairs = list(combinations(shuffled_participant_ids, 2))
-    
-    # Create schedule based on number of players
-    if len(shuffled_participant_ids) == 4:
-        # For 4 players: 3 matches, all pairs play
-        schedule = create_4_player_schedule(shuffled_participant_ids)
-    elif len(shuffled_participant_ids) == 5:
-        # For 5 players: 5 matches, 10 pairs play (5 pairs don't play)
-        schedule = create_5_player_schedule(shuffled_participant_ids)
-    elif len(shuffled_participant_ids) == 6:
-        # For 6 players: 8 matches, 16 pairs play (1 pair doesn't play)
-        schedule = create_6_player_schedule(shuffled_participant_ids)
-    elif len(shuffled_participant_ids) == 7:
-        # For 7 players: 10 matches, 20 pairs play (1 pair doesn't play)
-        schedule = create_7_player_schedule(shuffled_participant_ids)
-    elif len(shuffled_participant_ids) == 8:
-        # For 8 players: 14 matches, 28 pairs play (all pairs play)
-        schedule = create_8_player_schedule(shuffled_participant_ids)
-    
-    # Create matches from schedule
-    matches = []
-    for round_num, match_pairs in enumerate(schedule, 1):
-        if len(match_pairs) == 2:  # One match per round
-            pair1, pair2 = match_pairs
-            
-            # Check if this is a naai-partij (last match for 6 or 7 players)
-            is_naai_partij = False
-            if len(participant_ids) in [6, 7] and round_num == len(schedule):
-                is_naai_partij = True
-            
-            match = Match(
-                match_night_id=match_night.id,
-                game_schema_id=game_schema.id,
-                player1_id=pair1[0],
-                player2_id=pair1[1],
-                player3_id=pair2[0],
-                player4_id=pair2[1],
-                round=round_num,
-                court=1
-            )
-            matches.append(match)
-            db.session.add(match)
-            
-            match_type = "NAAI-PARTIJ" if is_naai_partij else "Normal"
+    penalties = load_pair_penalties(match_night, participant_ids)
+    match_rows = everyone_vs_everyone_rows(participant_ids, match_night.num_courts or 1, seed, penalties)
     
     try:
+        # Save all matches in one round trip
+        matches = bulk_insert_matches(match_night.id, match_rows, game_schema_id=game_schema.id)
         db.session.commit()
     except Exception as e:
         db.session.rollback()
@@ -1774,402 +2333,135 @@ def generate_everyone_vs_everyone_matches(match_night, game_schema):
     
     return matches
 
-def create_4_player_schedule(players):
-    """Create schedule for 4 players: 3 matches, all pairs play"""
-    # For 4 players, we have exactly 6 pairs and need 3 matches
-    # Each player should play exactly 3 times
-    pairs = list(combinations(players, 2))
-    
-    # Create balanced schedule
-    schedule = [
-        [pairs[0], pairs[1]],  # Match 1: (0,1) vs (2,3)
-        [pairs[2], pairs[3]],  # Match 2: (0,2) vs (1,3)  
-        [pairs[4], pairs[5]]   # Match 3: (0,3) vs (1,2)
-    ]
-    
-    return schedule
-
-def create_5_player_schedule(players):
-    """Create schedule for 5 players: 5 matches, all 10 pairs play exactly once"""
-    # For 5 players, we have exactly 10 pairs and need 5 matches
-    # Each player should play exactly 4 times
-    pairs = list(combinations(players, 2))
-    
-    # Create balanced schedule ensuring no player plays twice in same match
-    schedule = []
-    used_pairs = set()
-    
-    for i in range(5):
-        # Find two pairs that don't share any players
-        pair1 = None
-        pair2 = None
-        
-        for j, pair in enumerate(pairs):
-            if pair not in used_pairs:
-                if pair1 is None:
-                    pair1 = pair
-                    used_pairs.add(pair)
-                elif pair2 is None:
-                    # Check if pair2 shares any players with pair1
-                    if not (pair[0] in pair1 or pair[1] in pair1):
-                        pair2 = pair
-                        used_pairs.add(pair)
-                        break
-        
-        if pair1 and pair2:
-            schedule.append([pair1, pair2])
-    
-    return schedule
-
-def create_6_player_schedule(players):
-    """Create schedule for 6 players: 8 matches, all 15 pairs play exactly once + naai-partij"""
-    # For 6 players, we have exactly 15 pairs and need 8 matches
-    # Each player should play exactly 5 times
-    pairs = list(combinations(players, 2))
-    
-    # Create balanced schedule for first 7 matches
-    schedule = []
-    used_pairs = set()
-    
-    for i in range(7):
-        # Find two pairs that don't share any players
-        pair1 = None
-        pair2 = None
-        
-        for j, pair in enumerate(pairs):
-            if pair not in used_pairs:
-                if pair1 is None:
-                    pair1 = pair
-                    used_pairs.add(pair)
-                elif pair2 is None:
-                    # Check if pair2 shares any players with pair1
-                    if not (pair[0] in pair1 or pair[1] in pair1):
-                        pair2 = pair
-                        used_pairs.add(pair)
-                        break
-        
-        if pair1 and pair2:
-            schedule.append([pair1, pair2])
-    
-    # Add naai-partij with remaining pair vs first pair
-    remaining_pairs = [p for p in pairs if p not in used_pairs]
-    if remaining_pairs:
-        schedule.append([remaining_pairs[0], pairs[0]])
-    
-    return schedule
-
-def create_7_player_schedule(players):
-    """Create schedule for 7 players: 11 matches, all 21 pairs play exactly once + naai-partij"""
-    # For 7 players, we have exactly 21 pairs and need 11 matches
-    # Each player should play exactly 6 times
-    pairs = list(combinations(players, 2))
-    
-    # Create balanced schedule for first 10 matches
-    schedule = []
-    used_pairs = set()
-    
-    for i in range(10):
-        # Find two pairs that don't share any players
-        pair1 = None
-        pair2 = None
-        
-        for j, pair in enumerate(pairs):
-            if pair not in used_pairs:
-                if pair1 is None:
-                    pair1 = pair
-                    used_pairs.add(pair)
-                elif pair2 is None:
-                    # Check if pair2 shares any players with pair1
-                    if not (pair[0] in pair1 or pair[1] in pair1):
-                        pair2 = pair
-                        used_pairs.add(pair)
-                        break
-        
-        if pair1 and pair2:
-            schedule.append([pair1, pair2])
-    
-    # Add naai-partij with remaining pair vs first pair
-    remaining_pairs = [p for p in pairs if p not in used_pairs]
-    if remaining_pairs:
-        schedule.append([remaining_pairs[0], pairs[0]])
-    
-    return schedule
-
-def create_8_player_schedule(players):
-    """Create schedule for 8 players: 14 matches, all 28 pairs play"""
-    # For 8 players, we have exactly 28 pairs and need 14 matches
-    # Each player should play exactly 7 times
-    pairs = list(combinations(players, 2))
-    
-    # Create balanced schedule ensuring no player plays twice in same match
-    schedule = []
-    used_pairs = set()
-    
-    for i in range(14):
-        # Find two pairs that don't share any players
-        pair1 = None
-        pair2 = None
-        
-        for j, pair in enumerate(pairs):
-            if pair not in used_pairs:
-                if pair1 is None:
-                    pair1 = pair
-                    used_pairs.add(pair)
-                elif pair2 is None:
-                    # Check if pair2 shares any players with pair1
-                    if not (pair[0] in pair1 or pair[1] in pair1):
-                        pair2 = pair
-                        used_pairs.add(pair)
-                        break
-        
-        if pair1 and pair2:
-            schedule.append([pair1, pair2])
-    
-    return schedule
-
-def update_player_stats_for_match(match_id):
-    """Update player stats for a specific match"""
-    match = Match.query.get(match_id)
-    if not match or not match.result:
-        return
-    
-    match_night_id = match.match_night_id
-    result = match.result
-    
-    # Parse the score to get games won by each team
-    try:
-        score_parts = result.score.split('-')
-        team1_games = int(score_parts[0])
-        team2_games = int(score_parts[1])
-    except (ValueError, IndexError):
-        return
-    
-    # Get match night to determine game mode
-    match_night = MatchNight.query.get(match_night_id)
-    if not match_night:
-        return
-    
-    # Determine game mode and scoring logic
-    is_king_of_the_court = False
-    if match.game_schema_id:
-        game_schema = GameSchema.query.get(match.game_schema_id)
-        if game_schema and game_schema.game_mode == 'king_of_the_court':
-            is_king_of_the_court = True
-    
-    # Calculate point difference (saldo) for each team
-    team1_point_difference = team1_games - team2_games
-    team2_point_difference = team2_games - team1_games
-    
-    # Check if this is a naai-partij (last match for 6 or 7 players)
-    is_naai_partij = False
-    if match.round >= 8:  # Naai-partijen zijn altijd de laatste wedstrijden
-        is_naai_partij = True
-    
-    # For naai-partijen, determine which pair hasn't played together before
-    naai_partij_players = []
-    if is_naai_partij:
-        # Get all previous matches for this match night
-        previous_matches = Match.query.filter_by(match_night_id=match_night_id).filter(Match.round < match.round).all()
-        
-        # Check which pairs have played together before
-        team1_pair = (match.player1_id, match.player2_id)
-        team2_pair = (match.player3_id, match.player4_id)
-        
-        team1_has_played_together = False
-        team2_has_played_together = False
-        
-        for prev_match in previous_matches:
-            prev_team1 = (prev_match.player1_id, prev_match.player2_id)
-            prev_team2 = (prev_match.player3_id, prev_match.player4_id)
-            
-            # Check if team1 has played together before
-            if (team1_pair == prev_team1 or 
-                (team1_pair[0] in prev_team1 and team1_pair[1] in prev_team1)):
-                team1_has_played_together = True
-            
-            # Check if team2 has played together before
-            if (team2_pair == prev_team2 or 
-                (team2_pair[0] in prev_team2 and team2_pair[1] in prev_team2)):
-                team2_has_played_together = True
-        
-        # Only count points for the pair that hasn't played together before
-        if not team1_has_played_together:
-            naai_partij_players = [match.player1_id, match.player2_id]
-        elif not team2_has_played_together:
-            naai_partij_players = [match.player3_id, match.player4_id]
-    
-    # OPTIMIZED: Get all player stats in one query
-    player_ids = [match.player1_id, match.player2_id, match.player3_id, match.player4_id]
-    existing_stats = PlayerStats.query.filter_by(match_night_id=match_night_id).filter(PlayerStats.user_id.in_(player_ids)).all()
-    existing_stats_dict = {stat.user_id: stat for stat in existing_stats}
-    
-    # Update stats for all players
-    for player_id in player_ids:
-        # Get or create player stats
-        player_stat = existing_stats_dict.get(player_id)
-        
-        if not player_stat:
-            player_stat = PlayerStats(
-                match_night_id=match_night_id,
-                user_id=player_id,
-                total_points=0
-            )
-            db.session.add(player_stat)
-        
-        # Determine points based on game mode
-        if is_king_of_the_court:
-            # King of the Court: 1 point for winning, 0 for losing
-            if team1_games > team2_games:
-                # Team 1 wins
-                if player_id in [match.player1_id, match.player2_id]:
-                    player_stat.total_points += 1
-            elif team2_games > team1_games:
-                # Team 2 wins
-                if player_id in [match.player3_id, match.player4_id]:
-                    player_stat.total_points += 1
-            # No points for losing team
-        else:
-            # Iedereen vs Iedereen: Use point difference (saldo)
-            # For naai-partijen, only add points if the player is in the pair that hasn't played together
-            if is_naai_partij:
-                if player_id in naai_partij_players:
-                    # Add point difference based on which team the player was on
-                    if player_id in [match.player1_id, match.player2_id]:
-                        player_stat.total_points += team1_point_difference
-                    else:
-                        player_stat.total_points += team2_point_difference
-            else:
-                # Normal match - add point difference for all players
-                if player_id in [match.player1_id, match.player2_id]:
-                    # Player was on team 1
-                    player_stat.total_points += team1_point_difference
-                else:
-                    # Player was on team 2
-                    player_stat.total_points += team2_point_difference
-    
-    db.session.commit()
+def king_of_the_court_lineup(participant_ids, seed=None):
+    """Participants in random order: the first 4 play the first match, the others queue in this order"""
+    # Shuffle participant IDs to get random player assignments
+    # This ensures different first matches each time while keeping the same algorithm
+    shuffled_participant_ids = sorted(participant_ids)
+    random.Random(seed).shuffle(shuffled_participant_ids)
+    return shuffled_participant_ids
 
-def generate_king_of_the_court_matches(match_night, game_schema):
+def king_of_the_court_rows(lineup, num_courts=1):
+    """
+    Match rows of the first king of the court round, one match per court
+    (court 1 is the top court of the ladder), nothing is saved. The players
+    after the first 4 per court queue in lineup order.
+    """
+    return [{
+        'player1_id': lineup[4 * court],
+        'player2_id': lineup[4 * court + 1],
+        'player3_id': lineup[4 * court + 2],
+        'player4_id': lineup[4 * court + 3],
+        'round': 1,  # Start with round 1
+        'court': court + 1
+    } for court in range(king_of_the_court_courts(len(lineup), num_courts))]
+
+def generate_king_of_the_court_matches(match_night, game_schema, seed=None):
     """Generate initial matches for king of the court mode"""
     participants = Participation.query.filter_by(match_night_id=match_night.id).all()
     participant_ids = [p.user_id for p in participants]
     
     matches = []
     
-    # For king of the court, we start with one match
-    # Winners stay, losers go to queue
+    # For king of the court, we start with one match per court
+    # Winners move up, losers move down; losers of the bottom court go to the queue
     if len(participant_ids) >= 4:
-        # Shuffle participant IDs to get random player assignments
-        # This ensures different first matches each time while keeping the same algorithm
-        shuffled_participant_ids = participant_ids.copy()
-        random.shuffle(shuffled_participant_ids)
-        
-        match = Match(
-            match_night_id=match_night.id,
-            game_schema_id=game_schema.id,
-            player1_id=shuffled_participant_ids[0],
-            player2_id=shuffled_participant_ids[1],
-            player3_id=shuffled_participant_ids[2],
-            player4_id=shuffled_participant_ids[3],
-            round=1,  # Start with round 1
-            court=1
-        )
-        matches.append(match)
-        db.session.add(match)
+        lineup = king_of_the_court_lineup(participant_ids, seed)
+        for row in king_of_the_court_rows(lineup, match_night.num_courts or 1):
+            match = Match(match_night_id=match_night.id, game_schema_id=game_schema.id, **row)
+            matches.append(match)
+            db.session.add(match)
+        create_queue(game_schema.id, lineup[4 * len(matches):])
     
     db.session.commit()
     return matches
 
-def generate_next_king_of_the_court_match(completed_match):
-    """Generate the next match for King of the Court after a match is completed"""
-    try:
-        # Get the match result to determine winners
-        result = completed_match.result
-        if not result or not result.score:
-            return None
-        
-        # Parse the score to determine winners
-        score_parts = result.score.split('-')
-        team1_games = int(score_parts[0])
-        team2_games = int(score_parts[1])
-        
-        # Determine winners and losers
-        if team1_games > team2_games:
-            # Team 1 wins (player1 and player2)
-            winners = [completed_match.player1_id, completed_match.player2_id]
-            losers = [completed_match.player3_id, completed_match.player4_id]
-        elif team2_games > team1_games:
-            # Team 2 wins (player3 and player4)
-            winners = [completed_match.player3_id, completed_match.player4_id]
-            losers = [completed_match.player1_id, completed_match.player2_id]
-        else:
-            # Tie - no next match
-            return None
-        
-        # Get all participants for this match night
-        participants = Participation.query.filter_by(match_night_id=completed_match.match_night_id).all()
-        all_participant_ids = [p.user_id for p in participants]
-        
-        # Determine maximum rounds based on number of players
-        max_rounds = 0
-        if len(all_participant_ids) == 4:
-            max_rounds = 3
-        elif len(all_participant_ids) == 5:
-            max_rounds = 5
-        elif len(all_participant_ids) == 6:
-            max_rounds = 8  # Including naai-partij
-        elif len(all_participant_ids) == 7:
-            max_rounds = 11  # Including naai-partij
-        elif len(all_participant_ids) == 8:
-            max_rounds = 14
-        
-        # Check if we've reached the maximum rounds
-        if completed_match.round >= max_rounds:
-            return None
-        
-        # Create queue: winners stay, losers go to end of queue
-        queue = winners + [p for p in all_participant_ids if p not in winners and p not in losers] + losers
-        
-        # Get the next 4 players from the queue
-        if len(queue) >= 4:
-            # Split winners (they stay but play against each other)
-            next_match = Match(
-                match_night_id=completed_match.match_night_id,
-                game_schema_id=completed_match.game_schema_id,
-                player1_id=queue[0],  # First winner
-                player2_id=queue[2],  # First player from queue
-                player3_id=queue[1],  # Second winner
-                player4_id=queue[3],  # Second player from queue
-                round=completed_match.round + 1,  # Increment round number
-                court=completed_match.court
-            )
-            
-            db.session.add(next_match)
-            db.session.commit()
-            
-            return next_match
-        
+def get_winners_and_losers(match):
+    """(winners, losers) of a match with a result, None for a tie or an invalid score"""
+    games = parse_score(match.result.score if match.result else None)
+    if games is None:
         return None
-        
-    except Exception as e:
-        print(f"Error generating next King of the Court match: {str(e)}")
-        db.session.rollback()
-        return None 
+    team1_games, team2_games = games
+    
+    team1_players = [match.player1_id, match.player2_id]
+    team2_players = [match.player3_id, match.player4_id]
+    if team1_games > team2_games:
+        return team1_players, team2_players
+    if team2_games > team1_games:
+        return team2_players, team1_players
+    # Tie - no winners
+    return None
+
+def generate_next_king_of_the_court_round(completed_match):
+    """
+    Generate the next King of the Court round once every court of the
+    completed match's round has a result: winners move up a court, losers
+    move down (see king_of_the_court.ladder_round). Does not commit; the
+    caller commits it together with the result.
+    
+    Returns:
+        The new matches, top court first (empty while the round isn't finished)
+    """
+    # Check one submission of this game at a time: otherwise the last two courts,
+    # submitted together, each miss the other's uncommitted result and no next
+    # round is created. Held until the caller commits.
+    db.session.query(GameSchema.id).filter_by(id=completed_match.game_schema_id).with_for_update().one()
+    
+    # Read after taking the lock, so results committed in the meantime are seen
+    round_matches = Match.query.options(joinedload(Match.result)).filter_by(
+        game_schema_id=completed_match.game_schema_id,
+        round=completed_match.round
+    ).order_by(Match.court).populate_existing().all()
+    
+    # Determine winners and losers on every court; a tie stops the game
+    outcomes = []
+    for match in round_matches:
+        if not match.result or not match.result.score:
+            return []
+        outcome = get_winners_and_losers(match)
+        if outcome is None:
+            return []
+        outcomes.append(outcome)
+    
+    # Waiting players in order, advanced like a deque and saved with the result
+    on_court = [player_id for winners, losers in outcomes for player_id in winners + losers]
+    queue, waiting = load_queue(completed_match.match_night_id, completed_match.game_schema_id, on_court)
+    
+    # The game ends after as many matches as everyone vs everyone would take
+    num_players = len(waiting) + len(on_court)
+    if completed_match.round >= king_of_the_court_rounds(num_players, len(outcomes)):
+        return []
+    
+    # Another court can only be added when at least 4 players are waiting
+    num_courts = len(outcomes)
+    if len(waiting) >= 4:
+        num_courts = db.session.query(MatchNight.num_courts).filter_by(id=completed_match.match_night_id).scalar()
+    next_round = ladder_round(outcomes, waiting, king_of_the_court_courts(num_players, num_courts))
+    
+    # Split the pairs: one player of each pair per team
+    match_rows = [{
+        'player1_id': upper[0],
+        'player2_id': lower[0],
+        'player3_id': upper[1],
+        'player4_id': lower[1],
+        'round': completed_match.round + 1,  # Increment round number
+        'court': court
+    } for court, (upper, lower) in enumerate(next_round, 1)]
+    
+    # If a concurrent submission already created this round, use its matches
+    # and leave the queue as that submission advanced it
+    next_matches, inserted = insert_matches_or_get_existing(
+        completed_match.match_night_id, completed_match.game_schema_id, match_rows
+    )
+    if inserted and queue is not None:
+        queue.set_waiting_ids(waiting)
+    
+    return next_matches
 
 def recalculate_all_player_stats(match_night_id):
     """Recalculate all player stats for a match night from existing match results"""
     try:
-        # Get all matches with results for this match night
-        matches = Match.query.filter_by(match_night_id=match_night_id).all()
-        
-        # Clear existing player stats for this match night
-        PlayerStats.query.filter_by(match_night_id=match_night_id).delete()
-        
-        # Recalculate stats for each match with a result
-        for match in matches:
-            if match.result:
-                update_player_stats_for_match(match.id)
-        
+        recalculate_player_stats(match_night_id)
         db.session.commit()
         print(f"Recalculated player stats for match night {match_night_id}")
         return True
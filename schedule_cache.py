@@ -0,0 +1,162 @@
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Sequence, Tuple
+
+# A schedule without player ids: (round, court, player1..player4) with
+# indices into the list of players it is relabeled with
+Template = Tuple[Tuple[int, int, int, int, int, int], ...]
+
+def template_from_rows(rows: List[Dict], player_ids: Sequence[int]) -> Template:
+    """Make a template of match rows (player1_id..player4_id, round, court)"""
+    index = {player_id: position for position, player_id in enumerate(player_ids)}
+    return tuple(
+        (row['round'], row['court'], index[row['player1_id']], index[row['player2_id']],
+         index[row['player3_id']], index[row['player4_id']])
+        for row in rows
+    )
+
+def template_from_rounds(rounds) -> Template:
+    """Make a template of schedule_engine rounds (already in player indices)"""
+    return tuple(
+        (round_num, court, pair1[0], pair1[1], pair2[0], pair2[1])
+        for round_num, round_matches in enumerate(rounds, 1)
+        for court, (pair1, pair2) in enumerate(round_matches, 1)
+    )
+
+def relabel(template: Template, player_ids: Sequence[int]) -> List[Dict]:
+    """Match rows of a template for the given players (index i -> player_ids[i])"""
+    return [
+        {
+            'player1_id': player_ids[a],
+            'player2_id': player_ids[b],
+            'player3_id': player_ids[c],
+            'player4_id': player_ids[d],
+            'round': round_num,
+            'court': court
+        }
+        for round_num, court, a, b, c, d in template
+    ]
+
+class ScheduleTemplateCache:
+    """
+    Bounded LRU cache with a time to live. Used for schedule templates,
+    keyed on (player count, courts, mode, seed): templates don't contain
+    player ids, so every match night with the same key reuses the same
+    template. pair_penalties uses a second instance for the partner and
+    opponent history of a roster, keyed on (player ids, match night, nights).
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_build(self, key: Hashable, build: Callable[[], Any]) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        # Build outside the lock; two concurrent misses just build twice
+        value = build()
+        with self._lock:
+            self._entries[key] = (now + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+# Global instance
+schedule_templates = ScheduleTemplateCache()
+
+class SchedulePreviewStore:
+    """
+    Generated schedules that were previewed, by a random token. Kept in
+    memory for a short time only; an expired or unknown token means the
+    schedule has to be previewed again. A confirmed preview keeps only its
+    match night and players until it expires, so a repeated confirm can be
+    recognized.
+    """
+
+    def __init__(self, maxsize: int = 128, ttl: float = 900):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, preview: Dict) -> str:
+        token = secrets.token_urlsafe(16)
+        with self._lock:
+            self._entries[token] = (time.monotonic() + self.ttl, preview)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return token
+
+    def get(self, token: str):
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[token]
+                return None
+            return entry[1]
+
+    def mark_confirmed(self, token: str):
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None:
+                expires, preview = entry
+                self._entries[token] = (expires, {
+                    'match_night_id': preview['match_night_id'],
+                    'participant_ids': preview['participant_ids'],
+                    'confirmed': True
+                })
+
+# Global instance
+schedule_previews = SchedulePreviewStore()
+
+class StartedGameStore:
+    """
+    The game started per (match night, Idempotency-Key header), so a retried
+    start returns that game instead of replacing it. Kept in memory for a
+    short time only, like the previews.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 900):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, match_night_id: int, key: str, game_schema_id: int):
+        with self._lock:
+            self._entries[(match_night_id, key)] = (time.monotonic() + self.ttl, game_schema_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get(self, match_night_id: int, key: str):
+        with self._lock:
+            entry = self._entries.get((match_night_id, key))
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[(match_night_id, key)]
+                return None
+            return entry[1]
+
+# Global instance
+started_games = StartedGameStore()
@@ -0,0 +1,304 @@
+import os
+from typing import List, Sequence, Tuple
+
+Pair = Tuple[int, int]
+ScheduledMatch = Tuple[Pair, Pair]
+
+# Precomputed schedules written by schedule_solver.py
+SCHEDULE_TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'schedule_tables.json')
+SCHEDULE_TABLE_VERSION = 1
+
+def _popcount(bits: int) -> int:
+    return bin(bits).count('1')
+
+class PartnerScheduler:
+    """
+    Builds an everyone vs everyone schedule for any number of players (4 or
+    more) in which every pair of players partners exactly once.
+
+    The pairs come from a round-robin 1-factorization (circle method, with a
+    bye for an odd number of players); the pairs of each factor are disjoint,
+    so any two of them form a valid match. Players are bits in a bitset and
+    partner/opponent coverage is tracked per player as a bitset, which keeps
+    choosing opponents cheap. If the number of pairs is odd, the last pair
+    plays a naai-partij against a pair that already partnered.
+    """
+
+    def __init__(self, player_ids: Sequence[int]):
+        if len(player_ids) < 4:
+            raise ValueError("Need at least 4 players for padel matches")
+
+        self.player_ids = list(player_ids)
+        self.num_players = len(self.player_ids)
+        self.index = {player_id: position for position, player_id in enumerate(self.player_ids)}
+        self.partners = [0] * self.num_players
+        self.opponents = [0] * self.num_players
+        self.games = [0] * self.num_players
+        self.matches: List[ScheduledMatch] = []
+        # Matches of build_remaining with a pair that partnered before (player ids)
+        self.naai_partijen: List[ScheduledMatch] = []
+
+    def _one_factorization(self) -> List[List[Pair]]:
+        """Circle method: rounds of disjoint pairs covering every pair exactly once"""
+        size = self.num_players + self.num_players % 2  # add a bye for odd numbers
+        others = list(range(1, size))
+        rounds = []
+        for _ in range(size - 1):
+            circle = [0] + others
+            pairs = [(circle[i], circle[size - 1 - i]) for i in range(size // 2)]
+            # Pairs with the bye (index num_players) don't play
+            rounds.append([pair for pair in pairs if max(pair) < self.num_players])
+            others = others[-1:] + others[:-1]
+        return rounds
+
+    def _opponent_repeats(self, pair1: Pair, pair2: Pair) -> int:
+        """How many of the four opponent meetings in pair1 vs pair2 happened before"""
+        mask2 = (1 << pair2[0]) | (1 << pair2[1])
+        return _popcount(self.opponents[pair1[0]] & mask2) + _popcount(self.opponents[pair1[1]] & mask2)
+
+    def _add_match(self, pair1: Pair, pair2: Pair):
+        mask1 = (1 << pair1[0]) | (1 << pair1[1])
+        mask2 = (1 << pair2[0]) | (1 << pair2[1])
+        for player, partner in (pair1, pair1[::-1], pair2, pair2[::-1]):
+            self.partners[player] |= 1 << partner
+            self.games[player] += 1
+        for player in pair1:
+            self.opponents[player] |= mask2
+        for player in pair2:
+            self.opponents[player] |= mask1
+        self.matches.append((pair1, pair2))
+
+    def _pair_up(self, pairs: List[Pair]):
+        """Match disjoint pairs against each other, preferring new opponents"""
+        pairs = list(pairs)
+        while len(pairs) >= 2:
+            pair1 = pairs.pop(0)
+            pair2 = min(pairs, key=lambda pair: self._opponent_repeats(pair1, pair))
+            pairs.remove(pair2)
+            self._add_match(pair1, pair2)
+
+    def _naai_partij_opponents(self, pair: Pair) -> Pair:
+        """Pick the (already partnered) pair with the fewest games to play the naai-partij"""
+        candidates = [player for player in range(self.num_players) if player not in pair]
+        best = None
+        for i, first in enumerate(candidates):
+            for second in candidates[i + 1:]:
+                key = (self.games[first] + self.games[second],
+                       self._opponent_repeats(pair, (first, second)))
+                if best is None or key < best[0]:
+                    best = (key, (first, second))
+        return best[1]
+
+    def add_played(self, pair1: Pair, pair2: Pair):
+        """
+        Record a match that was already played (with player ids), so build_remaining
+        doesn't schedule its pairs again. Players that aren't in the schedule are ignored.
+        """
+        pair1 = [self.index[player] for player in pair1 if player in self.index]
+        pair2 = [self.index[player] for player in pair2 if player in self.index]
+        for pair in (pair1, pair2):
+            if len(pair) == 2:
+                self.partners[pair[0]] |= 1 << pair[1]
+                self.partners[pair[1]] |= 1 << pair[0]
+        for player in pair1 + pair2:
+            self.games[player] += 1
+        for player in pair1:
+            for opponent in pair2:
+                self.opponents[player] |= 1 << opponent
+                self.opponents[opponent] |= 1 << player
+
+    def _disjoint(self, pair1: Pair, pair2: Pair) -> bool:
+        return not set(pair1) & set(pair2)
+
+    def _find_split(self, pending: List[Pair], start: int):
+        """A match of this build (from start) that two left over pairs can split, or None"""
+        for position in range(start, len(self.matches)):
+            pair1, pair2 = self.matches[position]
+            for pair_a, pair_b in ((pair1, pair2), (pair2, pair1)):
+                for first in pending:
+                    if not self._disjoint(first, pair_a):
+                        continue
+                    for second in pending:
+                        if second is not first and self._disjoint(second, pair_b):
+                            return position, first, pair_a, second, pair_b
+        return None
+
+    def _rematch_leftovers(self, pending: List[Pair], start: int) -> List[Pair]:
+        """
+        Match left over pairs that overlap each other (e.g. the pairs of a
+        player who joined) by splitting a match of this build: leftovers u
+        and x and the match v vs w become u vs v and x vs w.
+
+        Returns:
+            The pairs that are still left over
+        """
+        pending = list(pending)
+        while len(pending) >= 2:
+            split = self._find_split(pending, start)
+            if split is None:
+                break
+            position, first, pair_a, second, pair_b = split
+            del self.matches[position]
+            for player in pair_a + pair_b:
+                self.games[player] -= 1
+            self._add_match(first, pair_a)
+            self._add_match(second, pair_b)
+            pending.remove(first)
+            pending.remove(second)
+        return pending
+
+    def build_remaining(self) -> List[ScheduledMatch]:
+        """
+        Like build, but only for the pairs that haven't partnered yet (see
+        add_played), e.g. after players joined or left during a night. Pairs
+        of a factor that can't be matched within it wait for a disjoint pair
+        of a later factor; the ones left at the end play each other, or are
+        matched by splitting a scheduled match. Only pairs that can't be
+        matched at all play a naai-partij; those matches come last (see
+        self.naai_partijen and pack_rounds(last=...)).
+
+        Returns:
+            List of ((player, player), (player, player)) with player ids
+        """
+        start = len(self.matches)
+        pending = []
+        for factor in self._one_factorization():
+            pairs = [pair for pair in factor if not self.partners[pair[0]] >> pair[1] & 1]
+            still_pending = []
+            for old_pair in pending:
+                disjoint = [pair for pair in pairs if self._disjoint(old_pair, pair)]
+                if disjoint:
+                    opponents = min(disjoint, key=lambda pair: self._opponent_repeats(old_pair, pair))
+                    pairs.remove(opponents)
+                    self._add_match(old_pair, opponents)
+                else:
+                    still_pending.append(old_pair)
+            pending = still_pending
+            if len(pairs) % 2:
+                pending.append(pairs.pop())
+            self._pair_up(pairs)
+
+        leftovers = []
+        while pending:
+            pair = pending.pop(0)
+            disjoint = [other for other in pending if self._disjoint(pair, other)]
+            if disjoint:
+                opponents = min(disjoint, key=lambda other: self._opponent_repeats(pair, other))
+                pending.remove(opponents)
+                self._add_match(pair, opponents)
+            else:
+                leftovers.append(pair)
+
+        leftovers = self._rematch_leftovers(leftovers, start)
+        naai_start = len(self.matches)
+        for pair in leftovers:
+            self._add_match(pair, self._naai_partij_opponents(pair))
+
+        matches = [
+            ((self.player_ids[a], self.player_ids[b]), (self.player_ids[c], self.player_ids[d]))
+            for (a, b), (c, d) in self.matches[start:]
+        ]
+        self.naai_partijen = matches[naai_start - start:]
+        return matches
+
+    def build(self) -> List[ScheduledMatch]:
+        """
+        Generate the matches (in generation order, not yet ordered for play).
+
+        Returns:
+            List of ((player, player), (player, player)) with player ids
+        """
+        pending = None  # pair of an earlier round that still needs opponents
+        for pairs in self._one_factorization():
+            if len(pairs) % 2:
+                if pending is None:
+                    pending = pairs.pop()
+                else:
+                    # A round has at least 3 pairs here, so one of them is disjoint from pending
+                    pending_mask = (1 << pending[0]) | (1 << pending[1])
+                    disjoint = [pair for pair in pairs
+                                if not ((1 << pair[0]) | (1 << pair[1])) & pending_mask]
+                    opponents = min(disjoint, key=lambda pair: self._opponent_repeats(pending, pair))
+                    pairs.remove(opponents)
+                    self._add_match(pending, opponents)
+                    pending = None
+            self._pair_up(pairs)
+
+        if pending is not None:
+            self._add_match(pending, self._naai_partij_opponents(pending))
+
+        return [
+            ((self.player_ids[a], self.player_ids[b]), (self.player_ids[c], self.player_ids[d]))
+            for (a, b), (c, d) in self.matches
+        ]
+
+def pack_rounds(matches: List[ScheduledMatch], num_courts: int = 1,
+                last: Sequence[ScheduledMatch] = ()) -> List[List[ScheduledMatch]]:
+    """
+    Pack matches into rounds of at most num_courts matches, without a player
+    twice in the same round. Each round first takes the matches whose
+    players have rested longest, then the ones whose players have played
+    least, so sitting out rotates fairly. Matches in last (naai-partijen)
+    only fill courts once all other matches are placed.
+    """
+    num_courts = max(1, num_courts or 1)
+    last_played = {}
+    games = {}
+    final = [match for match in matches if match in last]
+    pool = [match for match in matches if match not in last]
+    rounds = []
+    while pool or final:
+        def priority(match):
+            players = match[0] + match[1]
+            return (max(last_played.get(player, -1) for player in players),
+                    sum(games.get(player, 0) for player in players))
+
+        round_matches = []
+        busy = set()
+        for match in sorted(pool, key=priority):
+            players = match[0] + match[1]
+            if busy.isdisjoint(players) and len(round_matches) < num_courts:
+                round_matches.append(match)
+                busy.update(players)
+        if len(round_matches) == len(pool):
+            # All other matches are placed: naai-partijen may use the free courts
+            for match in sorted(final, key=priority):
+                players = match[0] + match[1]
+                if busy.isdisjoint(players) and len(round_matches) < num_courts:
+                    round_matches.append(match)
+                    busy.update(players)
+
+        for match in round_matches:
+            (pool if match in pool else final).remove(match)
+            for player in match[0] + match[1]:
+                last_played[player] = len(rounds)
+                games[player] = games.get(player, 0) + 1
+        rounds.append(round_matches)
+    return rounds
+
+def generate_everyone_vs_everyone_schedule(player_ids: Sequence[int],
+                                           num_courts: int = 1) -> List[List[ScheduledMatch]]:
+    """
+    Generate an everyone vs everyone schedule for any number of players.
+
+    Returns:
+        Rounds in playing order, each a list of (pair1, pair2) matches, one per court
+    """
+    matches = PartnerScheduler(player_ids).build()
+    return pack_rounds(matches, num_courts)
+
+def reschedule_everyone_vs_everyone(player_ids: Sequence[int], played_matches: Sequence[ScheduledMatch],
+                                    num_courts: int = 1) -> List[List[ScheduledMatch]]:
+    """
+    Schedule the rest of an everyone vs everyone game for a changed roster:
+    every pair of player_ids that didn't partner in played_matches plays
+    together once. Players who left are simply not scheduled any more.
+
+    Returns:
+        Rounds to play after the played ones, each a list of (pair1, pair2) matches
+    """
+    scheduler = PartnerScheduler(player_ids)
+    for pair1, pair2 in played_matches:
+        scheduler.add_played(pair1, pair2)
+    matches = scheduler.build_remaining()
+    return pack_rounds(matches, num_courts, last=scheduler.naai_partijen)
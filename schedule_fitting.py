@@ -0,0 +1,236 @@
+import math
+import random
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+Pair = Tuple[int, int]
+ScheduledMatch = Tuple[Pair, Pair]
+
+# CPU seconds the booking scheduler may spend improving its schedule
+BOOKING_TIME_BUDGET = 0.3
+
+# Weights of the schedule cost, lower is better
+PARTNER_REPEAT_WEIGHT = 100  # per repeated partnership
+OPPONENT_WEIGHT = 1  # per opponent meeting squared, spreads the opponents
+REST_WEIGHT = 5  # per player sitting out two rounds in a row
+
+def booking_rounds(booking_minutes: int, avg_match_minutes: int) -> int:
+    """Rounds that fit into a court booking (all courts play a round at the same time)"""
+    if not booking_minutes or not avg_match_minutes or avg_match_minutes <= 0:
+        return 0
+    return booking_minutes // avg_match_minutes
+
+class BookingScheduler:
+    """
+    Anytime scheduler for a fixed court booking: fills num_rounds rounds on
+    all courts with the most balanced matches it finds before a CPU
+    deadline.
+
+    Starts from a greedy schedule in which the players with the fewest
+    games play (so games never differ by more than one) and improves it
+    with simulated annealing. Moves swap two players within a round, or a
+    player on court with one sitting out who has one game less, so the
+    number of games per player never changes. Partner, opponent and rest
+    counts are kept up to date per move instead of rescoring the schedule.
+    Optional history matrices (see pair_penalties) add a penalty per
+    partnership / opponent meeting, to vary the pairs across nights.
+    """
+
+    def __init__(self, player_ids: Sequence[int], num_courts: int, num_rounds: int,
+                 rng: Optional[random.Random] = None,
+                 partner_history: Optional[List[List[int]]] = None,
+                 opponent_history: Optional[List[List[int]]] = None):
+        if len(player_ids) < 4:
+            raise ValueError("Need at least 4 players for padel matches")
+        if num_rounds < 1:
+            raise ValueError("The booking is too short for a single round")
+
+        self.player_ids = list(player_ids)
+        self.num_players = len(self.player_ids)
+        self.courts = max(1, min(num_courts or 1, self.num_players // 4))
+        self.num_rounds = num_rounds
+        self.rng = rng or random.Random()
+
+        n = self.num_players
+        self.partners = [[0] * n for _ in range(n)]
+        self.opponents = [[0] * n for _ in range(n)]
+        self.games = [0] * n
+        self.partner_history = partner_history or [[0] * n for _ in range(n)]
+        self.opponent_history = opponent_history or [[0] * n for _ in range(n)]
+        # Per round: 4 players per court (pairs are slots 0+1 and 2+3), and who sits out
+        self.playing: List[List[int]] = []
+        self.sitting: List[List[int]] = []
+        self.cost = 0
+
+    # Cost bookkeeping
+
+    def _match_cost(self, slots: List[int], court: int, sign: int) -> int:
+        """Add (sign=1) or remove (sign=-1) a match from the counts; returns the change in cost"""
+        a, b, c, d = slots[4 * court:4 * court + 4]
+        delta = 0
+        for x, y in ((a, b), (c, d)):
+            before = self.partners[x][y]
+            after = before + sign
+            delta += PARTNER_REPEAT_WEIGHT * (max(after - 1, 0) - max(before - 1, 0))
+            delta += sign * self.partner_history[x][y]
+            self.partners[x][y] = self.partners[y][x] = after
+        for x, y in ((a, c), (a, d), (b, c), (b, d)):
+            before = self.opponents[x][y]
+            after = before + sign
+            delta += OPPONENT_WEIGHT * (after * after - before * before)
+            delta += sign * self.opponent_history[x][y]
+            self.opponents[x][y] = self.opponents[y][x] = after
+        return delta
+
+    def _sits(self, round_index: int, player: int) -> bool:
+        return 0 <= round_index < self.num_rounds and player in self.sitting[round_index]
+
+    def _rest_cost(self, round_index: int, player: int) -> int:
+        """Rest penalty of a player for sitting out this round next to the rounds around it"""
+        if not self._sits(round_index, player):
+            return 0
+        return REST_WEIGHT * (self._sits(round_index - 1, player) + self._sits(round_index + 1, player))
+
+    # Construction
+
+    def _greedy_round(self):
+        """Fewest games first; among those, players who sat out last round"""
+        order = list(range(self.num_players))
+        self.rng.shuffle(order)
+        last_sitting = set(self.sitting[-1]) if self.sitting else set()
+        order.sort(key=lambda player: (self.games[player], player not in last_sitting))
+        playing = order[:4 * self.courts]
+        for player in playing:
+            self.games[player] += 1
+        self.playing.append(playing)
+        self.sitting.append(order[4 * self.courts:])
+
+    def _initial_cost(self) -> int:
+        cost = 0
+        for slots in self.playing:
+            for court in range(self.courts):
+                cost += self._match_cost(slots, court, 1)
+        for round_index in range(self.num_rounds):
+            for player in self.sitting[round_index]:
+                # Count every pair of consecutive rests once
+                if self._sits(round_index + 1, player):
+                    cost += REST_WEIGHT
+        return cost
+
+    # Moves
+
+    def _swap_on_court(self, round_index: int) -> Optional[int]:
+        """Swap two players on different pairs of the same round; returns the change in cost"""
+        slots = self.playing[round_index]
+        i, j = self.rng.sample(range(len(slots)), 2)
+        if i // 2 == j // 2:
+            return None
+        courts = {i // 4, j // 4}
+        delta = sum(self._match_cost(slots, court, -1) for court in courts)
+        slots[i], slots[j] = slots[j], slots[i]
+        delta += sum(self._match_cost(slots, court, 1) for court in courts)
+        self._undo = lambda: self._swap_back_on_court(round_index, i, j, courts)
+        return delta
+
+    def _swap_back_on_court(self, round_index, i, j, courts):
+        slots = self.playing[round_index]
+        for court in courts:
+            self._match_cost(slots, court, -1)
+        slots[i], slots[j] = slots[j], slots[i]
+        for court in courts:
+            self._match_cost(slots, court, 1)
+
+    def _swap_with_bench(self, round_index: int) -> Optional[int]:
+        """Swap a player on court with one sitting out who has one game less"""
+        sitting = self.sitting[round_index]
+        if not sitting:
+            return None
+        slots = self.playing[round_index]
+        i = self.rng.randrange(len(slots))
+        k = self.rng.randrange(len(sitting))
+        on_court, benched = slots[i], sitting[k]
+        if self.games[on_court] != self.games[benched] + 1:
+            return None
+
+        court = i // 4
+        delta = self._match_cost(slots, court, -1)
+        delta -= (self._rest_cost(round_index, on_court) + self._rest_cost(round_index, benched))
+        slots[i], sitting[k] = benched, on_court
+        self.games[on_court] -= 1
+        self.games[benched] += 1
+        delta += self._match_cost(slots, court, 1)
+        delta += (self._rest_cost(round_index, on_court) + self._rest_cost(round_index, benched))
+        self._undo = lambda: self._swap_back_with_bench(round_index, i, k, court)
+        return delta
+
+    def _swap_back_with_bench(self, round_index, i, k, court):
+        slots = self.playing[round_index]
+        sitting = self.sitting[round_index]
+        self._match_cost(slots, court, -1)
+        slots[i], sitting[k] = sitting[k], slots[i]
+        self.games[slots[i]] += 1
+        self.games[sitting[k]] -= 1
+        self._match_cost(slots, court, 1)
+
+    # Search
+
+    def build(self, time_budget: Optional[float] = BOOKING_TIME_BUDGET,
+              max_iterations: int = 200000) -> List[List[ScheduledMatch]]:
+        """
+        Build the schedule, improving it until time_budget CPU seconds have
+        passed (or max_iterations moves were tried). Always returns the best
+        schedule found so far; with time_budget=None the result only depends
+        on the random generator.
+
+        Returns:
+            Rounds, each a list of (pair1, pair2) matches with player ids, one per court
+        """
+        for _ in range(self.num_rounds):
+            self._greedy_round()
+        self.cost = self._initial_cost()
+        best_cost = self.cost
+        best = [list(slots) for slots in self.playing]
+
+        deadline = time.process_time() + time_budget if time_budget is not None else None
+        temperature = 2.0 * PARTNER_REPEAT_WEIGHT
+        cooling = 0.9995
+        for iteration in range(max_iterations):
+            if deadline is not None and iteration % 256 == 0 and time.process_time() >= deadline:
+                break
+            if best_cost == 0:
+                break
+
+            round_index = self.rng.randrange(self.num_rounds)
+            if self.rng.random() < 0.7:
+                delta = self._swap_on_court(round_index)
+            else:
+                delta = self._swap_with_bench(round_index)
+            if delta is None:
+                continue
+
+            if delta <= 0 or self.rng.random() < math.exp(-delta / temperature):
+                self.cost += delta
+                if self.cost < best_cost:
+                    best_cost = self.cost
+                    best = [list(slots) for slots in self.playing]
+            else:
+                self._undo()
+            temperature = max(temperature * cooling, 0.5)
+
+        self.cost = best_cost
+        return [
+            [((self.player_ids[slots[4 * court]], self.player_ids[slots[4 * court + 1]]),
+              (self.player_ids[slots[4 * court + 2]], self.player_ids[slots[4 * court + 3]]))
+             for court in range(self.courts)]
+            for slots in best
+        ]
+
+def idle_minutes(rounds: List[List[ScheduledMatch]], player_ids: Sequence[int],
+                 booking_minutes: int, avg_match_minutes: int) -> Dict[int, int]:
+    """Expected minutes each player is not playing during the booking"""
+    games = {player_id: 0 for player_id in player_ids}
+    for round_matches in rounds:
+        for pair1, pair2 in round_matches:
+            for player_id in pair1 + pair2:
+                games[player_id] += 1
+    return {player_id: booking_minutes - count * avg_match_minutes for player_id, count in games.items()}
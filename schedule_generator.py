@@ -1,6 +1,53 @@
+import json
+import os
 import random
-from typing import List, Dict, Tuple
-from models import Match, User
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait
+from types import SimpleNamespace
+from typing import List, Dict, Optional, Sequence, Tuple
+import numpy as np
+from models import User
+from schedule_cache import Template, schedule_templates, template_from_rounds, template_from_rows, relabel
+from schedule_engine import SCHEDULE_TABLE_PATH, SCHEDULE_TABLE_VERSION, generate_everyone_vs_everyone_schedule
+from schedule_fitting import BOOKING_TIME_BUDGET, BookingScheduler, booking_rounds, idle_minutes
+from pair_penalties import VARIETY_DRAWS, PairPenalties, best_assignment
+from schedule_quality import evaluate_schedules, validate_schedule
+from swiss import PairHistory, pair_swiss_round
+
+# Best-of-K selection for the randomized formats
+RANDOMIZED_SCHEDULE_TYPES = ('simple',)
+BEST_OF_CANDIDATES = 64
+BEST_OF_TIME_BUDGET = 0.2  # seconds to wait for the process pool
+BEST_OF_WORKERS = min(4, os.cpu_count() or 1)
+
+_candidate_pool = None
+_candidate_pool_lock = threading.Lock()
+
+def _get_candidate_pool() -> ProcessPoolExecutor:
+    """Process pool shared by all requests of this (gunicorn) worker, created on first use"""
+    global _candidate_pool
+    with _candidate_pool_lock:
+        if _candidate_pool is None:
+            _candidate_pool = ProcessPoolExecutor(max_workers=BEST_OF_WORKERS)
+        return _candidate_pool
+
+def _best_candidate(player_ids: List[int], num_courts: int, schedule_type: str,
+                    seeds: List[int], penalties: Optional[PairPenalties] = None) -> Tuple[float, int, List[Dict]]:
+    """
+    Generate one candidate schedule per seed, score them in one batch (plus
+    the history penalty of earlier nights) and return (cost, seed, schedule)
+    of the best. Runs in the process pool.
+    """
+    players = [SimpleNamespace(id=player_id) for player_id in player_ids]
+    candidates = [
+        ScheduleGenerator(players, num_courts).generate_randomized(schedule_type, random.Random(seed))
+        for seed in seeds
+    ]
+    costs = evaluate_schedules(candidates, player_ids)['cost']
+    if penalties:
+        costs = costs + np.array([penalties.penalty(candidate) for candidate in candidates])
+    best = int(np.argmin(costs))  # first minimum, so ties go to the lowest seed
+    return float(costs[best]), seeds[best], candidates[best]
 
 class ScheduleGenerator:
     """
@@ -8,10 +55,106 @@ class ScheduleGenerator:
     Supports different tournament formats and ensures fair play distribution.
     """
     
-    def __init__(self, players: List[User], num_courts: int = 1):
+    # Precomputed everyone vs everyone schedules (see schedule_solver.py), loaded on first use
+    _schedule_table = None
+    
+    def __init__(self, players: List[User], num_courts: int = 1, seed: Optional[int] = None,
+                 booking_minutes: Optional[int] = None, avg_match_minutes: Optional[int] = None,
+                 penalties: Optional[PairPenalties] = None):
         self.players = players
-        self.num_courts = num_courts
+        self.num_courts = num_courts or 1
         self.num_players = len(players)
+        # All randomness comes from this generator, so a schedule can be reproduced from its seed
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.last_seed = seed
+        self.last_schedule_type = None
+        # Number of rounds each player sat out, used to rotate the sitters fairly
+        self.sit_outs = {player.id: 0 for player in players}
+        # Court booking for the 'booking' schedule type
+        self.booking_minutes = booking_minutes
+        self.avg_match_minutes = avg_match_minutes
+        # Expected idle minutes per player of the last booking schedule
+        self.idle_minutes = None
+        # Partner/opponent history of earlier nights (see pair_penalties)
+        self.penalties = penalties
+    
+    @property
+    def courts_per_round(self) -> int:
+        """Courts that can be used in parallel: limited by the courts and the players"""
+        return max(1, min(self.num_courts, self.num_players // 4))
+    
+    def _build_round(self, round_num: int, players: List[User]) -> List[Dict]:
+        """
+        Fill the courts of one round from players (in the order the format
+        wants them paired). If not everyone fits on the courts, the players
+        that sat out most often play first; the others sit out this round.
+        """
+        num_playing = 4 * self.courts_per_round
+        # Stable sort: players with equal sit-outs keep the format's order
+        ranked = sorted(players, key=lambda player: -self.sit_outs[player.id])
+        playing_ids = {player.id for player in ranked[:num_playing]}
+        
+        active = []
+        for player in players:
+            if player.id in playing_ids:
+                active.append(player)
+            else:
+                self.sit_outs[player.id] += 1
+        
+        round_matches = []
+        for court in range(self.courts_per_round):
+            start_idx = court * 4
+            round_matches.append({
+                'player1_id': active[start_idx].id,
+                'player2_id': active[start_idx + 1].id,
+                'player3_id': active[start_idx + 2].id,
+                'player4_id': active[start_idx + 3].id,
+                'round': round_num + 1,
+                'court': court + 1
+            })
+        return round_matches
+    
+    @classmethod
+    def _load_schedule_table(cls) -> Dict:
+        if cls._schedule_table is None:
+            table = {}
+            try:
+                with open(SCHEDULE_TABLE_PATH) as f:
+                    data = json.load(f)
+                if data.get('version') == SCHEDULE_TABLE_VERSION:
+                    table = data['schedules']
+                else:
+                    print(f"Ignoring schedule table version {data.get('version')}, expected {SCHEDULE_TABLE_VERSION}")
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Could not load schedule table: {e}")
+            cls._schedule_table = table
+        return cls._schedule_table
+    
+    @classmethod
+    def lookup_everyone_vs_everyone(cls, player_ids: Sequence[int],
+                                    num_courts: int = 1) -> Optional[List[List[Tuple]]]:
+        """
+        Look up a precomputed everyone vs everyone schedule and relabel it
+        with player_ids (table player i becomes player_ids[i]).
+        
+        Returns:
+            Rounds in playing order, each a list of (pair1, pair2) matches,
+            or None if the table has no schedule for this size
+        """
+        courts = max(1, min(num_courts or 1, len(player_ids) // 4))
+        entry = cls._load_schedule_table().get(f"{len(player_ids)}x{courts}")
+        if entry is None:
+            return None
+        
+        rounds = []
+        for round_text in entry['rounds'].split('|'):
+            round_matches = []
+            for match_text in round_text.split(','):
+                a, b, c, d = (player_ids[int(index, 16)] for index in match_text)
+                round_matches.append(((a, b), (c, d)))
+            rounds.append(round_matches)
+        return rounds
     
     def generate_round_robin(self) -> List[Dict]:
         """
@@ -24,32 +167,25 @@ class ScheduleGenerator:
         if self.num_players < 4:
             raise ValueError("Need at least 4 players for padel matches")
         
-        if self.num_players % 4 != 0:
-            raise ValueError("Number of players must be divisible by 4")
-        
+        # With history of earlier nights, the player order with the fewest familiar pairs
+        orders = [self.players.copy()]
+        if self.penalties:
+            for _ in range(VARIETY_DRAWS - 1):
+                order = self.players.copy()
+                self.rng.shuffle(order)
+                orders.append(order)
+        return best_assignment([self._round_robin(order) for order in orders], self.penalties)
+    
+    def _round_robin(self, players_copy: List[User]) -> List[Dict]:
         matches = []
-        players_copy = self.players.copy()
+        self.sit_outs = {player.id: 0 for player in self.players}
         
         # For round-robin, we need (n-1) rounds where n is number of players
         num_rounds = self.num_players - 1
         
         for round_num in range(num_rounds):
-            round_matches = []
-            
-            # Create matches for this round
-            for court in range(self.num_players // 4):
-                start_idx = court * 4
-                match = {
-                    'player1_id': players_copy[start_idx].id,
-                    'player2_id': players_copy[start_idx + 1].id,
-                    'player3_id': players_copy[start_idx + 2].id,
-                    'player4_id': players_copy[start_idx + 3].id,
-                    'round': round_num + 1,
-                    'court': court + 1
-                }
-                round_matches.append(match)
-            
-            matches.extend(round_matches)
+            # Create matches for this round, on as many courts as possible
+            matches.extend(self._build_round(round_num, players_copy))
             
             # Rotate players for next round (keep first player fixed)
             if round_num < num_rounds - 1:
@@ -57,13 +193,15 @@ class ScheduleGenerator:
         
         return matches
     
-    def generate_swiss_system(self, num_rounds: int = 3) -> List[Dict]:
+    def generate_swiss_system(self, num_rounds: int = 1, rng: random.Random = None) -> List[Dict]:
         """
-        Generate a Swiss system tournament where players are paired based on
-        similar performance levels.
+        Generate the opening round(s) of a Swiss system tournament. Without
+        results the standings are a random draw; the next rounds are paired
+        from the live standings with swiss.next_swiss_round.
         
         Args:
-            num_rounds: Number of rounds to play
+            num_rounds: Number of rounds to pair up front
+            rng: Random generator for the draw (for reproducible schedules)
             
         Returns:
             List of matches organized by rounds
@@ -71,42 +209,39 @@ class ScheduleGenerator:
         if self.num_players < 4:
             raise ValueError("Need at least 4 players for padel matches")
         
-        if self.num_players % 4 != 0:
-            raise ValueError("Number of players must be divisible by 4")
-        
+        # With history of earlier nights, the draw with the fewest familiar pairs
+        draws = []
+        for _ in range(VARIETY_DRAWS if self.penalties else 1):
+            ranking = [player.id for player in self.players]
+            (rng or self.rng).shuffle(ranking)
+            draws.append(self._pair_swiss_rounds(ranking, num_rounds))
+        return best_assignment(draws, self.penalties)
+    
+    def _pair_swiss_rounds(self, ranking: List[int], num_rounds: int) -> List[Dict]:
+        history = PairHistory()
         matches = []
-        players_copy = self.players.copy()
-        
         for round_num in range(num_rounds):
-            round_matches = []
-            
-            # Shuffle players for fair distribution
-            random.shuffle(players_copy)
-            
-            # Create matches for this round
-            for court in range(self.num_players // 4):
-                start_idx = court * 4
-                match = {
-                    'player1_id': players_copy[start_idx].id,
-                    'player2_id': players_copy[start_idx + 1].id,
-                    'player3_id': players_copy[start_idx + 2].id,
-                    'player4_id': players_copy[start_idx + 3].id,
+            for court, (pair1, pair2) in enumerate(pair_swiss_round(ranking, history, self.num_courts), 1):
+                matches.append({
+                    'player1_id': pair1[0],
+                    'player2_id': pair1[1],
+                    'player3_id': pair2[0],
+                    'player4_id': pair2[1],
                     'round': round_num + 1,
-                    'court': court + 1
-                }
-                round_matches.append(match)
-            
-            matches.extend(round_matches)
+                    'court': court
+                })
+                history.add_match(*pair1, *pair2)
         
         return matches
     
-    def generate_simple_schedule(self, num_rounds: int = 3) -> List[Dict]:
+    def generate_simple_schedule(self, num_rounds: int = 3, rng: random.Random = None) -> List[Dict]:
         """
         Generate a simple schedule with random pairings.
         Good for casual play where exact fairness is less important.
         
         Args:
             num_rounds: Number of rounds to play
+            rng: Random generator to shuffle with (for reproducible schedules)
             
         Returns:
             List of matches organized by rounds
@@ -114,35 +249,60 @@ class ScheduleGenerator:
         if self.num_players < 4:
             raise ValueError("Need at least 4 players for padel matches")
         
-        if self.num_players % 4 != 0:
-            raise ValueError("Number of players must be divisible by 4")
-        
         matches = []
         players_copy = self.players.copy()
+        self.sit_outs = {player.id: 0 for player in self.players}
         
         for round_num in range(num_rounds):
-            round_matches = []
-            
             # Shuffle players for each round
-            random.shuffle(players_copy)
+            (rng or self.rng).shuffle(players_copy)
             
-            # Create matches for this round
-            for court in range(self.num_players // 4):
-                start_idx = court * 4
-                match = {
-                    'player1_id': players_copy[start_idx].id,
-                    'player2_id': players_copy[start_idx + 1].id,
-                    'player3_id': players_copy[start_idx + 2].id,
-                    'player4_id': players_copy[start_idx + 3].id,
-                    'round': round_num + 1,
-                    'court': court + 1
-                }
-                round_matches.append(match)
-            
-            matches.extend(round_matches)
+            # Create matches for this round, on as many courts as possible
+            matches.extend(self._build_round(round_num, players_copy))
         
         return matches
     
+    def generate_booking_schedule(self, time_budget: Optional[float] = BOOKING_TIME_BUDGET,
+                                  rng: random.Random = None) -> List[Dict]:
+        """
+        Fill the court booking with as many rounds as fit (booking minutes /
+        average match minutes) on all courts, with the most balanced matches
+        found within time_budget CPU seconds (see schedule_fitting). The
+        expected idle minutes per player are stored in self.idle_minutes.
+        
+        Args:
+            time_budget: CPU seconds to improve the schedule, None for a
+                fixed number of attempts (reproducible from the seed)
+            rng: Random generator (for reproducible schedules)
+            
+        Returns:
+            List of matches organized by rounds
+        """
+        num_rounds = booking_rounds(self.booking_minutes, self.avg_match_minutes)
+        if num_rounds < 1:
+            raise ValueError("Booking duration must fit at least one match")
+        
+        player_ids = [player.id for player in self.players]
+        partner_history = opponent_history = None
+        if self.penalties:
+            partner_history, opponent_history = self.penalties.weighted_matrices(player_ids)
+        rounds = BookingScheduler(player_ids, self.num_courts, num_rounds, rng or self.rng,
+                                  partner_history, opponent_history).build(time_budget)
+        self.idle_minutes = idle_minutes(rounds, player_ids, self.booking_minutes, self.avg_match_minutes)
+        
+        return [
+            {
+                'player1_id': pair1[0],
+                'player2_id': pair1[1],
+                'player3_id': pair2[0],
+                'player4_id': pair2[1],
+                'round': round_num + 1,
+                'court': court + 1
+            }
+            for round_num, round_matches in enumerate(rounds)
+            for court, (pair1, pair2) in enumerate(round_matches)
+        ]
+    
     def _rotate_players(self, players: List[User]) -> List[User]:
         """
         Rotate players for round-robin tournament.
@@ -160,7 +320,10 @@ class ScheduleGenerator:
     def get_optimal_schedule_type(self) -> str:
         """
         Determine the best schedule type based on number of players and courts.
+        With a court booking the schedule is fitted into the booking.
         """
+        if booking_rounds(self.booking_minutes, self.avg_match_minutes) >= 1:
+            return "booking"
         if self.num_players < 8:
             return "simple"
         elif self.num_players <= 16:
@@ -173,7 +336,7 @@ class ScheduleGenerator:
         Generate schedule based on specified type or auto-detect optimal type.
         
         Args:
-            schedule_type: 'simple', 'swiss', 'round_robin', or None for auto-detect
+            schedule_type: 'simple', 'swiss', 'round_robin', 'booking', or None for auto-detect
             
         Returns:
             List of matches
@@ -187,37 +350,102 @@ class ScheduleGenerator:
             return self.generate_swiss_system()
         elif schedule_type == "simple":
             return self.generate_simple_schedule()
+        elif schedule_type == "booking":
+            return self.generate_booking_schedule()
         else:
             raise ValueError(f"Unknown schedule type: {schedule_type}")
-
-def create_matches_for_night(match_night_id: int, players: List[User], 
-                           num_courts: int = 1, schedule_type: str = None) -> List[Match]:
-    """
-    Create Match objects for a match night based on players and schedule type.
     
-    Args:
-        match_night_id: ID of the match night
-        players: List of User objects participating
-        num_courts: Number of courts available
-        schedule_type: Type of schedule to generate
+    def generate_randomized(self, schedule_type: str, rng: random.Random) -> List[Dict]:
+        """Generate one candidate of a randomized format with the given random generator"""
+        if schedule_type == "simple":
+            return self.generate_simple_schedule(rng=rng)
+        raise ValueError(f"Schedule type {schedule_type} is not randomized")
+    
+    def generate_best_schedule(self, schedule_type: str = None, candidates: int = BEST_OF_CANDIDATES,
+                               time_budget: Optional[float] = BEST_OF_TIME_BUDGET,
+                               seed: Optional[int] = None) -> List[Dict]:
+        """
+        Generate a schedule; for the randomized formats generate candidates
+        with seeds seed..seed+candidates-1 on the process pool and keep the
+        one with the best partner/opponent spread (see schedule_quality).
         
-    Returns:
-        List of Match objects ready to be saved to database
-    """
-    generator = ScheduleGenerator(players, num_courts)
-    schedule = generator.generate_schedule(schedule_type)
-    
-    matches = []
-    for match_data in schedule:
-        match = Match(
-            match_night_id=match_night_id,
-            player1_id=match_data['player1_id'],
-            player2_id=match_data['player2_id'],
-            player3_id=match_data['player3_id'],
-            player4_id=match_data['player4_id'],
-            round=match_data['round'],
-            court=match_data['court']
+        All candidates are always compared, so the same seed gives the same
+        schedule on every worker: candidates the pool hasn't scored within
+        time_budget seconds are scored in this process instead. The result
+        is cached as a template per (players, courts, type, seed). The seed
+        used is stored in self.last_seed and the schedule type in
+        self.last_schedule_type.
+        With history of earlier nights (self.penalties)
+        the template is specific to these players.
+        """
+        if schedule_type is None:
+            schedule_type = self.get_optimal_schedule_type()
+        self.last_schedule_type = schedule_type
+        if seed is None:
+            seed = self.seed if self.seed is not None else random.randrange(2 ** 31)
+        self.last_seed = seed
+        
+        if schedule_type not in RANDOMIZED_SCHEDULE_TYPES or candidates <= 1:
+            self.rng = random.Random(seed)
+            return self.generate_schedule(schedule_type)
+        
+        player_ids = [player.id for player in self.players]
+        history_key = self.penalties.fingerprint if self.penalties else None
+        template = schedule_templates.get_or_build(
+            (self.num_players, self.courts_per_round, schedule_type, seed, history_key),
+            lambda: template_from_rows(
+                self._best_of_candidates(schedule_type, candidates, time_budget, seed, player_ids), player_ids
+            )
         )
-        matches.append(match)
+        return relabel(template, player_ids)
+    
+    def _best_of_candidates(self, schedule_type: str, candidates: int, time_budget: Optional[float],
+                            seed: int, player_ids: List[int]) -> List[Dict]:
+        seeds = list(range(seed, seed + candidates))
+        chunk_size = -(-candidates // (2 * BEST_OF_WORKERS))
+        chunks = [seeds[i:i + chunk_size] for i in range(0, candidates, chunk_size)]
+        
+        results = {}
+        try:
+            pool = _get_candidate_pool()
+            futures = {pool.submit(_best_candidate, player_ids, self.num_courts, schedule_type, chunk,
+                                   self.penalties): index
+                       for index, chunk in enumerate(chunks)}
+            done, not_done = wait(futures, timeout=time_budget)
+            for future in not_done:
+                future.cancel()
+            results = {futures[future]: future.result() for future in done if future.exception() is None}
+        except (OSError, RuntimeError) as e:
+            # No process pool available (e.g. restricted environment)
+            print(f"Candidate pool unavailable, generating in process: {e}")
+        
+        # Chunks the pool didn't score in time (e.g. a cold pool) are scored here,
+        # so the candidates compared only depend on the seed
+        for index, chunk in enumerate(chunks):
+            if index not in results:
+                results[index] = _best_candidate(player_ids, self.num_courts, schedule_type, chunk, self.penalties)
+        
+        _, _, schedule = min(results.values(), key=lambda result: (result[0], result[1]))
+        return schedule
+
+def everyone_vs_everyone_template(num_players: int, num_courts: int = 1) -> Template:
+    """
+    Everyone vs everyone schedule for player indices 0..num_players-1 (see
+    schedule_cache.relabel): from the precomputed table when it has a valid
+    schedule for this size, otherwise from schedule_engine. Cached.
+    """
+    courts = max(1, min(num_courts or 1, num_players // 4))
+    
+    def build():
+        player_indices = list(range(num_players))
+        rounds = ScheduleGenerator.lookup_everyone_vs_everyone(player_indices, courts)
+        if rounds is not None:
+            problems = validate_schedule(rounds, player_indices, require_all_pairs=True)
+            if problems:
+                print(f"Rejected precomputed schedule for {num_players} players: {problems}")
+                rounds = None
+        if rounds is None:
+            rounds = generate_everyone_vs_everyone_schedule(player_indices, courts)
+        return template_from_rounds(rounds)
     
-    return matches 
\ No newline at end of file
+    return schedule_templates.get_or_build((num_players, courts, 'everyone_vs_everyone', None), build)
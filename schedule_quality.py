@@ -0,0 +1,187 @@
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+
+# Slots within a match row (player1..player4) that are partners / opponents,
+# in both directions so the count matrices come out symmetric
+PARTNER_SLOTS = ((0, 1), (1, 0), (2, 3), (3, 2))
+OPPONENT_SLOTS = ((0, 2), (2, 0), (0, 3), (3, 0), (1, 2), (2, 1), (1, 3), (3, 1))
+
+def schedule_to_rows(schedule) -> List[tuple]:
+    """
+    Flatten a schedule into (round, player1, player2, player3, player4) rows,
+    with zero-based rounds. Accepts the formats used in this codebase:
+    - ScheduleGenerator.generate_schedule: dicts with player1_id..player4_id and round
+    - Match objects
+    - schedule_engine rounds: a list of (pair1, pair2) matches per round
+    """
+    rows = []
+    for round_index, entry in enumerate(schedule):
+        if isinstance(entry, dict):
+            rows.append((entry['round'] - 1, entry['player1_id'], entry['player2_id'],
+                         entry['player3_id'], entry['player4_id']))
+        elif hasattr(entry, 'player1_id'):
+            rows.append((entry.round - 1, entry.player1_id, entry.player2_id,
+                         entry.player3_id, entry.player4_id))
+        else:
+            for pair1, pair2 in entry:
+                rows.append((round_index, *pair1, *pair2))
+    return rows
+
+def schedule_arrays(schedule, player_ids: Optional[Sequence[int]] = None):
+    """
+    Turn a schedule into index arrays.
+
+    Returns:
+        (player_ids, players, rounds): players is an int array of shape
+        (matches, 4) with indices into player_ids, rounds has shape (matches,)
+    """
+    rows = np.array(schedule_to_rows(schedule), dtype=np.int64).reshape(-1, 5)
+    if player_ids is None:
+        player_ids = np.unique(rows[:, 1:])
+    ids = np.asarray(player_ids, dtype=np.int64)
+    order = np.argsort(ids)
+    players = order[np.searchsorted(ids, rows[:, 1:], sorter=order)]
+    return list(player_ids), players, rows[:, 0]
+
+def _counts(index_groups, size):
+    return np.bincount(np.concatenate([index.ravel() for index in index_groups]), minlength=size)
+
+def evaluate_batch(players: np.ndarray, rounds: np.ndarray, num_players: int,
+                   require_all_pairs: bool = False) -> Dict[str, np.ndarray]:
+    """
+    Fairness metrics and invariant violations for a batch of K schedules
+    of the same shape, fully vectorized.
+
+    Args:
+        players: int array (K, matches, 4) of player indices
+        rounds: int array (K, matches) of zero-based round numbers
+        num_players: Number of players
+        require_all_pairs: Count pairs that never partner as violations
+            (everyone vs everyone)
+
+    Returns:
+        Dict of metric name -> array of shape (K,)
+    """
+    players = np.asarray(players, dtype=np.int64)
+    rounds = np.asarray(rounds, dtype=np.int64)
+    num_schedules, num_matches = players.shape[:2]
+    n = num_players
+    num_rounds = int(rounds.max()) + 1 if rounds.size else 0
+
+    # Partner and opponent count matrices, (K, n, n)
+    offset = (np.arange(num_schedules) * n * n)[:, None]
+    partner_index = [offset + players[:, :, a] * n + players[:, :, b] for a, b in PARTNER_SLOTS]
+    opponent_index = [offset + players[:, :, a] * n + players[:, :, b] for a, b in OPPONENT_SLOTS]
+    partners = _counts(partner_index, num_schedules * n * n).reshape(num_schedules, n, n)
+    opponents = _counts(opponent_index, num_schedules * n * n).reshape(num_schedules, n, n)
+
+    # Times each player plays per round, (K, rounds, n)
+    round_offset = (np.arange(num_schedules) * num_rounds * n)[:, None, None]
+    played = _counts([round_offset + rounds[:, :, None] * n + players],
+                     num_schedules * num_rounds * n).reshape(num_schedules, num_rounds, n)
+    games = played.sum(axis=1)
+
+    upper = np.triu_indices(n, 1)
+    partner_pairs = partners[:, upper[0], upper[1]]
+    opponent_pairs = opponents[:, upper[0], upper[1]]
+
+    # Longest run of rounds in a row a player sits out / plays
+    round_numbers = np.arange(num_rounds)[None, :, None]
+    def longest_run(mask):
+        last_break = np.maximum.accumulate(np.where(mask, -1, round_numbers), axis=1)
+        return (round_numbers - last_break).max(axis=(1, 2)) if num_rounds else np.zeros(num_schedules)
+
+    sorted_players = np.sort(players, axis=2)
+    players_twice_in_match = (np.diff(sorted_players, axis=2) == 0).any(axis=2).sum(axis=1)
+
+    metrics = {
+        'matches': np.full(num_schedules, num_matches),
+        'rounds': np.full(num_schedules, num_rounds),
+        'max_partner_repeats': np.maximum(partner_pairs.max(axis=1) - 1, 0),
+        'partner_coverage': (partner_pairs > 0).mean(axis=1),
+        'max_opponent_meetings': opponent_pairs.max(axis=1),
+        'opponent_variance': opponent_pairs.var(axis=1),
+        'min_games': games.min(axis=1),
+        'max_games': games.max(axis=1),
+        'max_consecutive_rests': longest_run(played == 0),
+        'max_consecutive_games': longest_run(played > 0),
+        'players_twice_in_round': (played > 1).sum(axis=(1, 2)),
+        'players_twice_in_match': players_twice_in_match,
+        'unpaired_pairs': (partner_pairs == 0).sum(axis=1) if require_all_pairs else np.zeros(num_schedules, dtype=np.int64),
+    }
+    # Games may differ by one (e.g. the players of a naai-partij), not more
+    metrics['violations'] = (metrics['players_twice_in_round'] + metrics['players_twice_in_match']
+                             + (metrics['max_games'] - metrics['min_games'] > 1)
+                             + metrics['unpaired_pairs'])
+    return metrics
+
+def schedule_cost(metrics: Dict[str, np.ndarray]) -> np.ndarray:
+    """
+    Single number to rank schedules by, lower is better: violations first,
+    then repeated partners, uneven opponents and long runs of play or rest.
+    """
+    return (1000 * metrics['violations']
+            + 100 * metrics['max_partner_repeats']
+            + 10 * metrics['opponent_variance']
+            + metrics['max_opponent_meetings']
+            + metrics['max_consecutive_games']
+            + metrics['max_consecutive_rests'])
+
+def evaluate_schedules(schedules: Sequence, player_ids: Optional[Sequence[int]] = None,
+                       require_all_pairs: bool = False) -> Dict[str, np.ndarray]:
+    """
+    Evaluate many candidate schedules for the same players at once.
+    Candidates with the same number of matches are scored in one batch.
+
+    Returns:
+        Dict of metric name -> array with one value per schedule, plus 'cost'
+    """
+    if player_ids is None:
+        player_ids = sorted({player_id for schedule in schedules
+                             for row in schedule_to_rows(schedule) for player_id in row[1:]})
+    arrays = [schedule_arrays(schedule, player_ids)[1:] for schedule in schedules]
+
+    # Group candidates by shape so each group is one vectorized batch
+    groups = {}
+    for index, (players, rounds) in enumerate(arrays):
+        groups.setdefault(players.shape[0], []).append(index)
+
+    results = {}
+    for indices in groups.values():
+        batch = evaluate_batch(np.stack([arrays[i][0] for i in indices]),
+                               np.stack([arrays[i][1] for i in indices]),
+                               len(player_ids), require_all_pairs)
+        for name, values in batch.items():
+            column = results.setdefault(name, np.zeros(len(schedules), dtype=values.dtype))
+            column[indices] = values
+    results['cost'] = schedule_cost(results)
+    return results
+
+def evaluate_schedule(schedule, player_ids: Optional[Sequence[int]] = None,
+                      require_all_pairs: bool = False) -> Dict:
+    """
+    Metrics of one schedule as plain Python values (JSON serializable),
+    with the invariant violations spelled out.
+    """
+    metrics = evaluate_schedules([schedule], player_ids, require_all_pairs)
+    result = {name: values[0].item() for name, values in metrics.items()}
+    result['opponent_variance'] = round(result['opponent_variance'], 3)
+    result['partner_coverage'] = round(result['partner_coverage'], 3)
+    result['cost'] = round(result['cost'], 3)
+
+    problems = []
+    if result['players_twice_in_round']:
+        problems.append(f"{result['players_twice_in_round']} player(s) scheduled twice in one round")
+    if result['players_twice_in_match']:
+        problems.append(f"{result['players_twice_in_match']} match(es) with the same player twice")
+    if result['max_games'] - result['min_games'] > 1:
+        problems.append(f"unequal number of games ({result['min_games']}-{result['max_games']})")
+    if result['unpaired_pairs']:
+        problems.append(f"{result['unpaired_pairs']} pair(s) never play together")
+    result['problems'] = problems
+    return result
+
+def validate_schedule(schedule, player_ids: Optional[Sequence[int]] = None,
+                      require_all_pairs: bool = False) -> List[str]:
+    """Invariant violations of a schedule, empty if it is valid"""
+    return evaluate_schedule(schedule, player_ids, require_all_pairs)['problems']
@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+"""
+Offline solver for the everyone vs everyone schedule table.
+
+For every number of players and courts it searches a schedule in which
+every pair partners exactly once and every two players face each other as
+opponents as evenly as possible (ideally exactly twice), and packs it into
+as few rounds as the courts allow. A schedule may use at most
+MAX_EXTRA_ROUNDS rounds more than the courts require; within that limit
+the lowest opponent excess wins, then the fewest rounds. Entries marked
+optimal have both the fewest possible rounds and a proven minimal
+opponent excess; the others are the best found within the search limits.
+The result is written to schedule_tables.json, which ScheduleGenerator
+loads at runtime, so starting a game is a table lookup instead of a
+search.
+
+Usage:
+    python schedule_solver.py [--players 4-16] [--courts 1-4] [--seed 0]
+"""
+
+import argparse
+import json
+import math
+import random
+from datetime import datetime
+from itertools import combinations
+from math import comb
+from schedule_engine import PartnerScheduler, pack_rounds, SCHEDULE_TABLE_PATH, SCHEDULE_TABLE_VERSION
+
+# Ideal number of times two players face each other as opponents
+OPPONENT_TARGET = 2
+# Rounds a schedule may add to the fewest the courts allow, to be more balanced
+MAX_EXTRA_ROUNDS = 1
+
+class SearchLimitReached(Exception):
+    pass
+
+class MatchSetSolver:
+    """
+    Finds the matches: every pair of players is matched against a disjoint
+    pair, minimizing the opponent excess (the number of times two players
+    meet as opponents beyond OPPONENT_TARGET). If the number of pairs is
+    odd, one pair is left over and plays a naai-partij.
+
+    A seeded local search (re-pairing two matches at a time) gives the
+    first upper bound; if that doesn't reach the lower bound, a branch and
+    bound search tries to improve it or prove it optimal. Symmetry
+    breaking: all pairs are equivalent up to relabeling, so the first pair
+    is fixed to play (2, 3), or to be the left over pair.
+    """
+
+    def __init__(self, num_players, node_limit=200000, iterations=1000000, seed=0):
+        self.num_players = num_players
+        self.node_limit = node_limit
+        self.iterations = iterations
+        self.seed = seed
+        self.pairs = list(combinations(range(num_players), 2))
+        self.pair_masks = [(1 << a) | (1 << b) for a, b in self.pairs]
+        self.opponents = [[0] * num_players for _ in range(num_players)]
+        self.nodes = 0
+        self.best_excess = None
+        self.best_matches = None
+        self.exhausted = False
+
+    @property
+    def num_matches(self):
+        return (len(self.pairs) + 1) // 2
+
+    @property
+    def lower_bound(self):
+        """4 opponent meetings per match, spread over all pairs of players"""
+        return max(0, 4 * self.num_matches - OPPONENT_TARGET * comb(self.num_players, 2))
+
+    def _meet(self, pair1, pair2, step):
+        """Add (step=1) or remove (step=-1) the opponent meetings, returns the excess change"""
+        delta = 0
+        for a in pair1:
+            for b in pair2:
+                if step > 0:
+                    delta += self.opponents[a][b] >= OPPONENT_TARGET
+                self.opponents[a][b] += step
+                self.opponents[b][a] += step
+                if step < 0:
+                    delta -= self.opponents[a][b] >= OPPONENT_TARGET
+        return delta
+
+    def _naai_partij(self, leftover, matches):
+        """Opponents for the left over pair: the disjoint pair with the fewest games, then least excess"""
+        games = [0] * self.num_players
+        for pair1, pair2 in matches:
+            for player in pair1 + pair2:
+                games[player] += 1
+        best = None
+        for pair in self.pairs:
+            if set(pair) & set(leftover):
+                continue
+            excess = sum(self.opponents[a][b] >= OPPONENT_TARGET for a in leftover for b in pair)
+            key = (games[pair[0]] + games[pair[1]], excess)
+            if best is None or key < best[0]:
+                best = (key, pair, excess)
+        return best[1], best[2]
+
+    def _search(self, used, leftover, matches, excess):
+        self.nodes += 1
+        if self.nodes > self.node_limit:
+            raise SearchLimitReached()
+        if self.best_excess is not None and excess >= self.best_excess:
+            return
+
+        free = ~used & ((1 << len(self.pairs)) - 1)
+        if not free:
+            final_matches = list(matches)
+            final_excess = excess
+            if leftover is not None:
+                opponents, naai_excess = self._naai_partij(leftover, matches)
+                final_matches.append((leftover, opponents))
+                final_excess += naai_excess
+            if self.best_excess is None or final_excess < self.best_excess:
+                self.best_excess = final_excess
+                self.best_matches = final_matches
+            return
+
+        first = (free & -free).bit_length() - 1
+        pair1 = self.pairs[first]
+        options = []
+        if not matches and leftover is None:
+            # Symmetry breaking at the root
+            if len(self.pairs) % 2:
+                options = [None]
+            else:
+                options = [self.pairs.index((2, 3))]
+        else:
+            for second in range(first + 1, len(self.pairs)):
+                if free >> second & 1 and not self.pair_masks[first] & self.pair_masks[second]:
+                    pair2 = self.pairs[second]
+                    cost = sum(self.opponents[a][b] >= OPPONENT_TARGET for a in pair1 for b in pair2)
+                    options.append((cost, second))
+            options = [second for _, second in sorted(options)]
+            if len(self.pairs) % 2 and leftover is None:
+                options.append(None)
+
+        for second in options:
+            if second is None:
+                self._search(used | 1 << first, pair1, matches, excess)
+            else:
+                pair2 = self.pairs[second]
+                delta = self._meet(pair1, pair2, 1)
+                matches.append((pair1, pair2))
+                self._search(used | 1 << first | 1 << second, leftover, matches, excess + delta)
+                matches.pop()
+                self._meet(pair1, pair2, -1)
+            if self.best_excess == self.lower_bound:
+                return
+
+    def _excess(self):
+        return sum(max(0, self.opponents[a][b] - OPPONENT_TARGET)
+                   for a, b in combinations(range(self.num_players), 2))
+
+    def _local_search(self):
+        """Simulated annealing on the squared deviation from OPPONENT_TARGET"""
+        rng = random.Random(self.seed)
+        matches = PartnerScheduler(list(range(self.num_players))).build()
+        for pair1, pair2 in matches:
+            self._meet(pair1, pair2, 1)
+
+        def deviation(touched):
+            return sum((self.opponents[a][b] - OPPONENT_TARGET) ** 2 for a, b in touched)
+
+        best_excess, best_matches = self._excess(), list(matches)
+        temperature = 0.4
+        for _ in range(self.iterations):
+            if best_excess == self.lower_bound:
+                break
+            i, j = rng.sample(range(len(matches)), 2)
+            (a, b), (c, d) = matches[i], matches[j]
+            new1, new2 = ((a, c), (b, d)) if rng.random() < 0.5 else ((a, d), (b, c))
+            if set(new1[0]) & set(new1[1]) or set(new2[0]) & set(new2[1]):
+                continue
+
+            touched = {(min(x, y), max(x, y)) for p, q in (matches[i], matches[j], new1, new2)
+                       for x in p for y in q}
+            before = deviation(touched)
+            self._meet(*matches[i], -1)
+            self._meet(*matches[j], -1)
+            self._meet(*new1, 1)
+            self._meet(*new2, 1)
+            change = deviation(touched) - before
+            if change <= 0 or rng.random() < math.exp(-change / temperature):
+                matches[i], matches[j] = new1, new2
+                if change < 0:
+                    excess = self._excess()
+                    if excess < best_excess:
+                        best_excess, best_matches = excess, list(matches)
+            else:
+                self._meet(*new1, -1)
+                self._meet(*new2, -1)
+                self._meet(*matches[i], 1)
+                self._meet(*matches[j], 1)
+
+        # Reset the counts for the branch and bound
+        self.opponents = [[0] * self.num_players for _ in range(self.num_players)]
+        return best_matches, best_excess
+
+    def solve(self):
+        """Returns (matches, excess, proven_optimal)"""
+        self.best_matches, self.best_excess = self._local_search()
+        if self.best_excess == self.lower_bound:
+            return self.best_matches, self.best_excess, True
+
+        try:
+            self._search(0, None, [], 0)
+            self.exhausted = True
+        except SearchLimitReached:
+            pass
+        optimal = self.exhausted or self.best_excess == self.lower_bound
+        return self.best_matches, self.best_excess, optimal
+
+def opponent_excess(matches, num_players):
+    """Number of opponent meetings beyond OPPONENT_TARGET over all pairs of players"""
+    opponents = {}
+    for pair1, pair2 in matches:
+        for a in pair1:
+            for b in pair2:
+                key = (min(a, b), max(a, b))
+                opponents[key] = opponents.get(key, 0) + 1
+    return sum(max(0, count - OPPONENT_TARGET) for count in opponents.values())
+
+def rounds_lower_bound(matches, num_players, num_courts):
+    """A round has at most one match per court and a player plays at most once per round"""
+    courts = min(num_courts, num_players // 4)
+    games = [0] * num_players
+    for pair1, pair2 in matches:
+        for player in pair1 + pair2:
+            games[player] += 1
+    return max(-(-len(matches) // courts), max(games))
+
+def _order_rounds(rounds):
+    """Play the rounds in an order that spreads rest: players that rested longest first"""
+    last_played = {}
+    pool = list(rounds)
+    ordered = []
+    while pool:
+        def priority(round_matches):
+            players = [player for pair1, pair2 in round_matches for player in pair1 + pair2]
+            return (sum(last_played.get(player, -1) for player in players), -len(players))
+        round_matches = min(pool, key=priority)
+        pool.remove(round_matches)
+        for pair1, pair2 in round_matches:
+            for player in pair1 + pair2:
+                last_played[player] = len(ordered)
+        ordered.append(round_matches)
+    return ordered
+
+def solve_rounds(matches, num_players, num_courts, node_limit=200000, max_rounds=None):
+    """
+    Pack the matches into the fewest rounds. Exact search (each round holds
+    the first unplaced match, which breaks the symmetry between rounds) for
+    a packing into the lower bound of rounds, then one more up to max_rounds
+    (default: the lower bound), each with node_limit nodes. The greedy
+    pack_rounds is the fallback when no search succeeds.
+
+    Returns:
+        (rounds, proven_optimal)
+    """
+    courts = min(num_courts, num_players // 4)
+    lower_bound = rounds_lower_bound(matches, num_players, num_courts)
+    max_rounds = max(max_rounds or lower_bound, lower_bound)
+    masks = [sum(1 << player for player in pair1 + pair2) for pair1, pair2 in matches]
+    nodes = [0]
+    rounds = []
+
+    def fill(remaining, slack):
+        """remaining: bitset of unplaced matches; slack: empty court slots still allowed"""
+        if not remaining:
+            return True
+        first = (remaining & -remaining).bit_length() - 1
+        return extend([first], masks[first], remaining & ~(1 << first), first, slack)
+
+    def extend(round_matches, busy, remaining, last, slack):
+        nodes[0] += 1
+        if nodes[0] > node_limit:
+            raise SearchLimitReached()
+        if len(round_matches) == courts or not remaining:
+            rounds.append(round_matches)
+            if fill(remaining, slack - (courts - len(round_matches))):
+                return True
+            rounds.pop()
+            return False
+
+        candidates = remaining >> (last + 1) << (last + 1)
+        while candidates:
+            index = (candidates & -candidates).bit_length() - 1
+            candidates &= candidates - 1
+            if not masks[index] & busy:
+                if extend(round_matches + [index], busy | masks[index],
+                          remaining & ~(1 << index), index, slack):
+                    return True
+        # Close the round with empty courts if the slack allows it
+        if slack >= courts - len(round_matches):
+            rounds.append(round_matches)
+            if fill(remaining, slack - (courts - len(round_matches))):
+                return True
+            rounds.pop()
+        return False
+
+    for num_rounds in range(lower_bound, max_rounds + 1):
+        nodes[0] = 0
+        rounds.clear()
+        try:
+            if fill((1 << len(matches)) - 1, num_rounds * courts - len(matches)):
+                packed = [[matches[index] for index in round_matches] for round_matches in rounds]
+                return _order_rounds(packed), len(packed) == lower_bound
+        except SearchLimitReached:
+            pass
+
+    packed = pack_rounds(matches, courts)
+    return packed, len(packed) == lower_bound
+
+def balance_rounds(rounds, num_players, iterations=200000, seed=0):
+    """
+    Lower the opponent excess of packed rounds without changing the
+    packing: re-pairing two matches of the same round keeps its players
+    and every partner pair. Simulated annealing like MatchSetSolver.
+    """
+    rng = random.Random(seed)
+    rounds = [list(round_matches) for round_matches in rounds]
+    slots = [(r, i) for r, round_matches in enumerate(rounds) if len(round_matches) > 1
+             for i in range(len(round_matches))]
+    if not slots:
+        return rounds
+
+    opponents = [[0] * num_players for _ in range(num_players)]
+
+    def meet(pair1, pair2, step):
+        for a in pair1:
+            for b in pair2:
+                opponents[a][b] += step
+                opponents[b][a] += step
+
+    def excess():
+        return sum(max(0, opponents[a][b] - OPPONENT_TARGET)
+                   for a, b in combinations(range(num_players), 2))
+
+    for round_matches in rounds:
+        for pair1, pair2 in round_matches:
+            meet(pair1, pair2, 1)
+
+    best_excess, best_rounds = excess(), [list(round_matches) for round_matches in rounds]
+    temperature = 0.4
+    for _ in range(iterations):
+        if best_excess == 0:
+            break
+        r, i = rng.choice(slots)
+        j = rng.randrange(len(rounds[r]) - 1)
+        j += j >= i
+        (a, b), (c, d) = rounds[r][i], rounds[r][j]
+        new1, new2 = ((a, c), (b, d)) if rng.random() < 0.5 else ((a, d), (b, c))
+
+        touched = {(min(x, y), max(x, y)) for p, q in (rounds[r][i], rounds[r][j], new1, new2)
+                   for x in p for y in q}
+        before = sum((opponents[x][y] - OPPONENT_TARGET) ** 2 for x, y in touched)
+        meet(*rounds[r][i], -1)
+        meet(*rounds[r][j], -1)
+        meet(*new1, 1)
+        meet(*new2, 1)
+        change = sum((opponents[x][y] - OPPONENT_TARGET) ** 2 for x, y in touched) - before
+        if change <= 0 or rng.random() < math.exp(-change / temperature):
+            rounds[r][i], rounds[r][j] = new1, new2
+            if change < 0:
+                current = excess()
+                if current < best_excess:
+                    best_excess, best_rounds = current, [list(round_matches) for round_matches in rounds]
+        else:
+            meet(*new1, -1)
+            meet(*new2, -1)
+            meet(*rounds[r][i], 1)
+            meet(*rounds[r][j], 1)
+    return best_rounds
+
+def encode_rounds(rounds):
+    """Compact text form: one hex digit per player, ',' between matches, '|' between rounds"""
+    return '|'.join(
+        ','.join('%x%x%x%x' % (pair1 + pair2) for pair1, pair2 in round_matches)
+        for round_matches in rounds
+    )
+
+def parse_range(value):
+    low, _, high = value.partition('-')
+    return range(int(low), int(high or low) + 1)
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the everyone vs everyone schedule table')
+    parser.add_argument('--players', default='4-16', help='player counts, e.g. 4-16')
+    parser.add_argument('--courts', default='1-4', help='court counts, e.g. 1-4')
+    parser.add_argument('--node-limit', type=int, default=200000, help='search nodes per player count')
+    parser.add_argument('--iterations', type=int, default=1000000, help='local search steps per player count')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=SCHEDULE_TABLE_PATH)
+    args = parser.parse_args()
+
+    schedules = {}
+    for num_players in parse_range(args.players):
+        if not 4 <= num_players <= 16:
+            # Players are stored as single hex digits
+            print(f"Skipping {num_players} players (supported: 4-16)")
+            continue
+
+        solver = MatchSetSolver(num_players, args.node_limit, args.iterations, args.seed)
+        matches, excess, matches_optimal = solver.solve()
+        print(f"{num_players} players: {len(matches)} matches, opponent excess {excess} "
+              f"(lower bound {solver.lower_bound}, {solver.nodes} nodes)"
+              f"{' ✅ optimal' if matches_optimal else ''}")
+
+        # The balanced match set doesn't always split into full rounds; the
+        # engine's matches come from a 1-factorization and usually do
+        engine_matches = PartnerScheduler(list(range(num_players))).build()
+        candidates = [(matches, excess, matches_optimal),
+                      (engine_matches, opponent_excess(engine_matches, num_players), False)]
+
+        for num_courts in parse_range(args.courts):
+            fewest_rounds = min(rounds_lower_bound(candidate_matches, num_players, num_courts)
+                                for candidate_matches, _, _ in candidates)
+            max_rounds = fewest_rounds + MAX_EXTRA_ROUNDS
+            best = None
+            for candidate_matches, candidate_excess, candidate_optimal in candidates:
+                rounds, _ = solve_rounds(candidate_matches, num_players, num_courts, args.node_limit, max_rounds)
+                if candidate_excess > solver.lower_bound:
+                    rounds = balance_rounds(rounds, num_players, args.iterations // 5, args.seed)
+                    candidate_excess = opponent_excess(
+                        [match for round_matches in rounds for match in round_matches], num_players
+                    )
+                # Within the round limit the most balanced, then the fewest rounds;
+                # a candidate over the limit only wins if none fits
+                key = (len(rounds) > max_rounds, candidate_excess, len(rounds))
+                optimal = (candidate_optimal and candidate_excess == excess and len(rounds) == fewest_rounds)
+                if best is None or key < best[0]:
+                    best = (key, rounds, candidate_excess, optimal)
+            _, rounds, rounds_excess, optimal = best
+            schedules[f"{num_players}x{num_courts}"] = {
+                'rounds': encode_rounds(rounds),
+                'opponent_excess': rounds_excess,
+                'optimal': optimal
+            }
+            print(f"   {num_courts} court(s): {len(rounds)} rounds, opponent excess {rounds_excess}"
+                  f"{' ✅ optimal' if optimal else ''}")
+
+    with open(args.output, 'w') as f:
+        json.dump({
+            'version': SCHEDULE_TABLE_VERSION,
+            'generated_at': datetime.utcnow().isoformat(),
+            'schedules': schedules
+        }, f, indent=1, sort_keys=True)
+    print(f"Wrote {len(schedules)} schedules to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import threading
+from typing import Dict, List, Set, Tuple
+from sqlalchemy import inspect
+from extensions import db
+
+class SchemaCapabilities:
+    """
+    In-memory registry of the tables, columns and unique constraints that
+    exist in the database.
+    The schema is probed once per process (on first use) and can be refreshed
+    after a migration, so request handlers don't have to query
+    information_schema on every call.
+    """
+
+    def __init__(self):
+        self._columns: Dict[str, Set[str]] = None
+        self._cascading_foreign_keys: Set[Tuple[str, str]] = set()
+        self._unique_columns: Set[Tuple[str, frozenset]] = set()
+        self._lock = threading.Lock()
+
+    def _probe(self):
+        """Read all tables, their columns, ON DELETE CASCADE foreign keys and unique constraints"""
+        inspector = inspect(db.engine)
+        columns = {}
+        cascading_foreign_keys = set()
+        unique_columns = set()
+        for table_name in inspector.get_table_names():
+            columns[table_name] = {column['name'] for column in inspector.get_columns(table_name)}
+            for foreign_key in inspector.get_foreign_keys(table_name):
+                if (foreign_key.get('options') or {}).get('ondelete', '').upper() == 'CASCADE':
+                    for column_name in foreign_key['constrained_columns']:
+                        cascading_foreign_keys.add((table_name, column_name))
+            # Unique constraints and unique indexes both work for ON CONFLICT
+            for constraint in inspector.get_unique_constraints(table_name):
+                unique_columns.add((table_name, frozenset(constraint['column_names'])))
+            for index in inspector.get_indexes(table_name):
+                if index.get('unique'):
+                    unique_columns.add((table_name, frozenset(index['column_names'])))
+        return columns, cascading_foreign_keys, unique_columns
+
+    def _get_columns(self) -> Dict[str, Set[str]]:
+        if self._columns is None:
+            with self._lock:
+                if self._columns is None:
+                    self._columns, self._cascading_foreign_keys, self._unique_columns = self._probe()
+        return self._columns
+
+    def refresh(self):
+        """Probe the schema again, e.g. after a migration or table (re)creation"""
+        with self._lock:
+            self._columns, self._cascading_foreign_keys, self._unique_columns = self._probe()
+
+    def has_table(self, table_name: str) -> bool:
+        return table_name in self._get_columns()
+
+    def has_column(self, table_name: str, column_name: str) -> bool:
+        return column_name in self._get_columns().get(table_name, set())
+
+    def columns(self, table_name: str) -> List[str]:
+        """Get the column names of a table (empty if the table doesn't exist)"""
+        return sorted(self._get_columns().get(table_name, set()))
+
+    def has_cascading_delete(self, table_name: str, column_name: str) -> bool:
+        """Check if the foreign key on table_name.column_name is ON DELETE CASCADE"""
+        self._get_columns()
+        return (table_name, column_name) in self._cascading_foreign_keys
+
+    def has_unique_constraint(self, table_name: str, column_names) -> bool:
+        """Check if there is a unique constraint (or unique index) on exactly these columns"""
+        self._get_columns()
+        return (table_name, frozenset(column_names)) in self._unique_columns
+
+schema_capabilities = SchemaCapabilities()
@@ -0,0 +1,261 @@
+from datetime import datetime
+from itertools import groupby
+from typing import Dict, List, Optional, Tuple
+from extensions import db, dialect_insert
+from models import Match, MatchResult, MatchPointContribution, GameSchema, PlayerStats
+from schema_capabilities import schema_capabilities
+from swiss import record_points_delta
+
+def parse_score(score: Optional[str]) -> Optional[Tuple[int, int]]:
+    """Parse a score like '6-3' into (team1_games, team2_games), None if invalid"""
+    try:
+        score_parts = score.split('-')
+        return int(score_parts[0]), int(score_parts[1])
+    except (AttributeError, ValueError, IndexError):
+        return None
+
+def team_pairs(match) -> Tuple[frozenset, frozenset]:
+    """The two pairs (partners) of a match"""
+    return (frozenset((match.player1_id, match.player2_id)),
+            frozenset((match.player3_id, match.player4_id)))
+
+def get_naai_partij_players(match, previous_pairs) -> Optional[List[int]]:
+    """
+    Determine whether a match is a naai-partij: a match in which a pair plays
+    together again because the number of pairs doesn't divide into matches.
+    Only the pair that hasn't played together before gets points.
+
+    Args:
+        match: The Match
+        previous_pairs: Set of frozenset pairs that partnered in earlier rounds
+
+    Returns:
+        None if the match is not a naai-partij, otherwise the players that score
+    """
+    team1_pair, team2_pair = team_pairs(match)
+    team1_has_played_together = team1_pair in previous_pairs
+    team2_has_played_together = team2_pair in previous_pairs
+
+    if not team1_has_played_together and not team2_has_played_together:
+        return None
+
+    # Only count points for the pair that hasn't played together before
+    if not team1_has_played_together:
+        return [match.player1_id, match.player2_id]
+    elif not team2_has_played_together:
+        return [match.player3_id, match.player4_id]
+    return []
+
+def calculate_match_points(match, score: Optional[str], game_mode: Optional[str],
+                           naai_partij_players=None) -> Optional[Dict[int, int]]:
+    """
+    Calculate the points a match result contributes to each of its players.
+
+    Args:
+        match: The Match
+        score: Score of the match, e.g. '6-3'
+        game_mode: Game mode of the match's game schema, if any
+        naai_partij_players: Players that score in a naai-partij (see
+            get_naai_partij_players), None for a normal match
+
+    Returns:
+        Dict of user_id -> points for all four players, None if the score is invalid
+    """
+    games = parse_score(score)
+    if games is None:
+        return None
+    team1_games, team2_games = games
+
+    team1_players = [match.player1_id, match.player2_id]
+    team2_players = [match.player3_id, match.player4_id]
+    points = {player_id: 0 for player_id in team1_players + team2_players}
+
+    if game_mode == 'king_of_the_court':
+        # King of the Court: 1 point for winning, 0 for losing
+        if team1_games > team2_games:
+            winners = team1_players
+        elif team2_games > team1_games:
+            winners = team2_players
+        else:
+            winners = []
+        for player_id in winners:
+            points[player_id] = 1
+        return points
+
+    # Iedereen vs Iedereen: use point difference (saldo)
+    # For naai-partijen, only the pair that hasn't played together gets points
+    scoring_players = team1_players + team2_players
+    if naai_partij_players is not None:
+        scoring_players = naai_partij_players
+
+    for player_id in scoring_players:
+        if player_id in team1_players:
+            points[player_id] = team1_games - team2_games
+        else:
+            points[player_id] = team2_games - team1_games
+    return points
+
+def apply_points_delta(match_night_id: int, deltas: Dict[int, int]):
+    """
+    Add points to the PlayerStats of a match night with one atomic upsert
+    (total_points = total_points + delta), creating missing rows.
+    Concurrent submissions for other matches can't overwrite each other.
+    """
+    if not deltas:
+        return
+
+    now = datetime.utcnow()
+    insert = dialect_insert(PlayerStats).values([
+        {'match_night_id': match_night_id, 'user_id': user_id, 'total_points': delta,
+         'created_at': now, 'updated_at': now}
+        for user_id, delta in deltas.items()
+    ])
+    db.session.execute(insert.on_conflict_do_update(
+        index_elements=['match_night_id', 'user_id'],
+        set_={
+            'total_points': PlayerStats.total_points + insert.excluded.total_points,
+            'updated_at': now
+        }
+    ))
+    record_points_delta(match_night_id, deltas, now)
+
+def update_player_stats_for_match(match, game_mode=None, previous_score=None):
+    """
+    Update player stats for a specific match. Applies only the difference
+    between the points this result gives and the points the match already
+    contributed, so editing a result costs O(1) instead of a recompute.
+    Does not commit, so it can be part of the result submission transaction.
+
+    Args:
+        match: The Match (with its result)
+        game_mode: Game mode of the match's game schema, if any
+        previous_score: Score before an edit; only used when the contribution
+            ledger table doesn't exist yet
+    """
+    if not match or not match.result:
+        return
+
+    naai_partij_players = None
+    if game_mode == 'everyone_vs_everyone':
+        previous_matches = db.session.query(
+            Match.player1_id, Match.player2_id, Match.player3_id, Match.player4_id
+        ).filter(
+            Match.game_schema_id == match.game_schema_id,
+            Match.round < match.round
+        ).all()
+        previous_pairs = set()
+        for previous_match in previous_matches:
+            previous_pairs.update(team_pairs(previous_match))
+        naai_partij_players = get_naai_partij_players(match, previous_pairs)
+
+    # An invalid score contributes nothing (and takes back earlier contributions)
+    new_points = calculate_match_points(match, match.result.score, game_mode, naai_partij_players) or {}
+
+    has_ledger = schema_capabilities.has_table(MatchPointContribution.__tablename__)
+    if has_ledger:
+        old_points = dict(
+            db.session.query(MatchPointContribution.user_id, MatchPointContribution.points)
+            .filter_by(match_id=match.id)
+            .all()
+        )
+    else:
+        old_points = calculate_match_points(match, previous_score, game_mode, naai_partij_players) or {}
+
+    deltas = {user_id: new_points.get(user_id, 0) - old_points.get(user_id, 0)
+              for user_id in set(new_points) | set(old_points)}
+    apply_points_delta(match.match_night_id, deltas)
+
+    if has_ledger:
+        _save_contributions(match.id, new_points)
+
+def _save_contributions(match_id: int, points: Dict[int, int]):
+    """Store the points a match contributed, replacing earlier contributions"""
+    if not points:
+        MatchPointContribution.query.filter_by(match_id=match_id).delete(synchronize_session=False)
+        return
+
+    insert = dialect_insert(MatchPointContribution).values([
+        {'match_id': match_id, 'user_id': user_id, 'points': player_points}
+        for user_id, player_points in points.items()
+    ])
+    db.session.execute(insert.on_conflict_do_update(
+        index_elements=['match_id', 'user_id'],
+        set_={'points': insert.excluded.points}
+    ))
+
+def recalculate_player_stats(match_night_id: int) -> Dict[int, int]:
+    """
+    Recompute all player stats of a match night in one pass.
+    Reads every match with its result and game mode in one joined query,
+    computes all totals in memory and writes them back with one upsert.
+    Does not commit.
+
+    Returns:
+        Dict of user_id -> total_points
+    """
+    rows = (
+        db.session.query(Match, MatchResult.score, GameSchema.game_mode)
+        .outerjoin(MatchResult, MatchResult.match_id == Match.id)
+        .outerjoin(GameSchema, GameSchema.id == Match.game_schema_id)
+        .filter(Match.match_night_id == match_night_id)
+        .order_by(Match.round, Match.id)
+        .all()
+    )
+
+    totals = {}
+    contributions = []
+    # Pairs that played together in earlier rounds, per game schema
+    previous_pairs = {}
+
+    for _, round_rows in groupby(rows, key=lambda row: row[0].round):
+        round_rows = list(round_rows)
+
+        for match, score, game_mode in round_rows:
+            naai_partij_players = None
+            if game_mode == 'everyone_vs_everyone':
+                naai_partij_players = get_naai_partij_players(
+                    match, previous_pairs.get(match.game_schema_id, set())
+                )
+
+            points = calculate_match_points(match, score, game_mode, naai_partij_players)
+            if points is None:
+                continue
+            for user_id, player_points in points.items():
+                totals[user_id] = totals.get(user_id, 0) + player_points
+                contributions.append({'match_id': match.id, 'user_id': user_id, 'points': player_points})
+
+        # Matches in the same round don't count as played before each other
+        for match, _, _ in round_rows:
+            previous_pairs.setdefault(match.game_schema_id, set()).update(team_pairs(match))
+
+    _write_player_stats(match_night_id, totals)
+
+    if schema_capabilities.has_table(MatchPointContribution.__tablename__):
+        MatchPointContribution.query.filter(MatchPointContribution.match_id.in_(
+            db.session.query(Match.id).filter_by(match_night_id=match_night_id).scalar_subquery()
+        )).delete(synchronize_session=False)
+        if contributions:
+            db.session.execute(db.insert(MatchPointContribution), contributions)
+
+    return totals
+
+def _write_player_stats(match_night_id: int, totals: Dict[int, int]):
+    """Replace the player stats of a match night with the given totals"""
+    stale_stats = PlayerStats.query.filter_by(match_night_id=match_night_id)
+    if totals:
+        stale_stats = stale_stats.filter(PlayerStats.user_id.notin_(list(totals)))
+    stale_stats.delete(synchronize_session=False)
+
+    if not totals:
+        return
+
+    now = datetime.utcnow()
+    insert = dialect_insert(PlayerStats).values([
+        {'match_night_id': match_night_id, 'user_id': user_id, 'total_points': total_points,
+         'created_at': now, 'updated_at': now}
+        for user_id, total_points in totals.items()
+    ])
+    db.session.execute(insert.on_conflict_do_update(
+        index_elements=['match_night_id', 'user_id'],
+        set_={'total_points': insert.excluded.total_points, 'updated_at': now}
+    ))
@@ -0,0 +1,224 @@
+import bisect
+import heapq
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Sequence
+from sqlalchemy import event, func
+from extensions import db
+from models import Match, PlayerStats
+
+# Swiss state of the most recently used match nights
+SWISS_STATE_CACHE_SIZE = 64
+
+class SwissStandings:
+    """
+    Players sorted by total points (best first), kept sorted on every
+    update: a bisect finds the player's old position, then one delete and
+    one insort. Both shift the list, so an update is O(n), which is cheap
+    for the size of a match night.
+    """
+
+    def __init__(self, points: Dict[int, int]):
+        self.points = dict(points)
+        self._order = sorted((-total, user_id) for user_id, total in self.points.items())
+
+    def update(self, user_id: int, delta: int):
+        old_total = self.points.get(user_id)
+        if old_total is not None:
+            del self._order[bisect.bisect_left(self._order, (-old_total, user_id))]
+        new_total = (old_total or 0) + delta
+        self.points[user_id] = new_total
+        bisect.insort(self._order, (-new_total, user_id))
+
+    def ranking(self, player_ids: Iterable[int]) -> List[int]:
+        """player_ids ordered by standing; players without points yet rank as 0"""
+        player_ids = set(player_ids)
+        without_points = sorted((0, user_id) for user_id in player_ids - set(self.points))
+        return [user_id for _, user_id in heapq.merge(self._order, without_points)
+                if user_id in player_ids]
+
+class PairHistory:
+    """Who partnered whom, as one bitset of partners per player"""
+
+    def __init__(self):
+        self.bits = {}
+        self.partners = {}
+        self.games = {}
+
+    def _bit(self, user_id: int) -> int:
+        if user_id not in self.bits:
+            self.bits[user_id] = 1 << len(self.bits)
+        return self.bits[user_id]
+
+    def add_match(self, player1_id, player2_id, player3_id, player4_id):
+        for player, partner in ((player1_id, player2_id), (player2_id, player1_id),
+                                (player3_id, player4_id), (player4_id, player3_id)):
+            self.partners[player] = self.partners.get(player, 0) | self._bit(partner)
+            self.games[player] = self.games.get(player, 0) + 1
+
+    def have_partnered(self, player_id: int, partner_id: int) -> bool:
+        return bool(self.partners.get(player_id, 0) & self.bits.get(partner_id, 0))
+
+    def repeats(self, pair1, pair2) -> int:
+        return self.have_partnered(*pair1) + self.have_partnered(*pair2)
+
+def _best_block_pairing(block: Sequence[int], history: PairHistory):
+    """
+    Pair a block of 4 players (by rank): 1+4 vs 2+3 when possible, otherwise
+    the first pairing without repeated partners (or with the fewest).
+    """
+    a, b, c, d = block
+    options = [((a, d), (b, c)), ((a, c), (b, d)), ((a, b), (c, d))]
+    return min(options, key=lambda option: history.repeats(*option))
+
+def pair_swiss_round(ranking: Sequence[int], history: PairHistory, num_courts: int) -> List[tuple]:
+    """
+    Pair one Swiss round: players play in blocks of 4 by standing. If not
+    everyone fits on the courts, the players with the fewest games play.
+    If a block can't avoid a repeated partner, its last player is swapped
+    with the nearest player of the next block that resolves it.
+
+    Returns:
+        List of ((player, player), (player, player)), one per court
+    """
+    courts = max(1, min(num_courts or 1, len(ranking) // 4))
+    rank = {user_id: position for position, user_id in enumerate(ranking)}
+    # Stable: equal games keep the standings order
+    playing = sorted(ranking, key=lambda user_id: history.games.get(user_id, 0))[:4 * courts]
+    playing.sort(key=rank.get)
+
+    matches = []
+    for start in range(0, len(playing), 4):
+        pairing = _best_block_pairing(playing[start:start + 4], history)
+        if history.repeats(*pairing):
+            for swap in range(start + 4, len(playing)):
+                block = playing[start:start + 3] + [playing[swap]]
+                candidate = _best_block_pairing(block, history)
+                if not history.repeats(*candidate):
+                    playing[start + 3], playing[swap] = playing[swap], playing[start + 3]
+                    pairing = candidate
+                    break
+        matches.append(pairing)
+    return matches
+
+class SwissState:
+    """Standings and pair history of one match night, with what they were built from"""
+
+    def __init__(self):
+        self.standings = None
+        self.standings_version = None
+        self.history = PairHistory()
+        self.match_count = 0
+        self.last_match_id = 0
+        self.last_round = 0
+
+_states = OrderedDict()
+_states_lock = threading.Lock()
+
+def _get_state(match_night_id: int) -> SwissState:
+    with _states_lock:
+        state = _states.pop(match_night_id, None) or SwissState()
+        _states[match_night_id] = state
+        while len(_states) > SWISS_STATE_CACHE_SIZE:
+            _states.popitem(last=False)
+        return state
+
+def _swiss_matches(match_night_id: int):
+    # Swiss rounds are the matches created by generate-schedule (no game schema)
+    return db.session.query(Match).filter(
+        Match.match_night_id == match_night_id,
+        Match.game_schema_id.is_(None)
+    )
+
+def load_swiss_state(match_night_id: int) -> SwissState:
+    """
+    The Swiss state of a match night, brought up to date with two small
+    aggregate queries. Standings are only reloaded from PlayerStats when
+    they changed outside this process; of the matches only the new ones
+    are read.
+    """
+    state = _get_state(match_night_id)
+
+    version = db.session.query(func.count(PlayerStats.id), func.max(PlayerStats.updated_at)).filter(
+        PlayerStats.match_night_id == match_night_id
+    ).one()
+    if state.standings is None or tuple(version) != state.standings_version:
+        points = dict(db.session.query(PlayerStats.user_id, PlayerStats.total_points).filter(
+            PlayerStats.match_night_id == match_night_id
+        ).all())
+        state.standings = SwissStandings({user_id: total or 0 for user_id, total in points.items()})
+        state.standings_version = tuple(version)
+
+    match_count, last_match_id = _swiss_matches(match_night_id).with_entities(
+        func.count(Match.id), func.max(Match.id)
+    ).one()
+    last_match_id = last_match_id or 0
+    if last_match_id < state.last_match_id or match_count < state.match_count:
+        # Matches were deleted: rebuild the pair history
+        state.history = PairHistory()
+        state.match_count = state.last_match_id = state.last_round = 0
+    if match_count != state.match_count:
+        new_matches = _swiss_matches(match_night_id).filter(Match.id > state.last_match_id).with_entities(
+            Match.id, Match.round, Match.player1_id, Match.player2_id, Match.player3_id, Match.player4_id
+        ).order_by(Match.id).all()
+        for match_id, round_num, *player_ids in new_matches:
+            state.history.add_match(*player_ids)
+            state.last_round = max(state.last_round, round_num)
+        state.match_count = match_count
+        state.last_match_id = last_match_id
+    return state
+
+def next_swiss_round(match_night_id: int, participant_ids: Sequence[int], num_courts: int) -> List[Dict]:
+    """
+    Pair the next Swiss round of a match night from the live standings.
+
+    Returns:
+        Match rows (player1_id..player4_id, round, court) for bulk_insert_matches
+    """
+    state = load_swiss_state(match_night_id)
+    ranking = state.standings.ranking(participant_ids)
+    round_num = state.last_round + 1
+    return [
+        {
+            'player1_id': pair1[0],
+            'player2_id': pair1[1],
+            'player3_id': pair2[0],
+            'player4_id': pair2[1],
+            'round': round_num,
+            'court': court
+        }
+        for court, (pair1, pair2) in enumerate(pair_swiss_round(ranking, state.history, num_courts), 1)
+    ]
+
+def record_points_delta(match_night_id: int, deltas: Dict[int, int], updated_at):
+    """
+    Remember a points change of the current transaction; it is applied to
+    the cached standings when the transaction commits, together with the
+    version the cached standings had before the change.
+    """
+    with _states_lock:
+        state = _states.get(match_night_id)
+        version_before = state.standings_version if state is not None and state.standings is not None else None
+    db.session.info.setdefault('swiss_deltas', []).append((match_night_id, deltas, updated_at, version_before))
+
+@event.listens_for(db.session, 'after_commit')
+def _apply_committed_deltas(session):
+    pending = session.info.pop('swiss_deltas', [])
+    with _states_lock:
+        for match_night_id, deltas, updated_at, version_before in pending:
+            state = _states.get(match_night_id)
+            if state is None or state.standings is None:
+                continue
+            if version_before is None or state.standings_version != version_before:
+                # The standings were (re)loaded after the change was made and may
+                # already include it: reload them instead of counting it twice
+                state.standings = None
+                continue
+            for user_id, delta in deltas.items():
+                state.standings.update(user_id, delta)
+            # Same version the database now reports, so the next round doesn't reload
+            state.standings_version = (len(state.standings.points), updated_at)
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_deltas(session):
+    session.info.pop('swiss_deltas', None)
@@ -0,0 +1,116 @@
+from typing import Dict, Optional
+from extensions import db
+from models import MatchNight, Participation, Match, MatchResult, MatchPointContribution, GameSchema, PlayerStats, KingOfTheCourtQueue
+from schema_capabilities import schema_capabilities
+
+# Foreign keys that must be ON DELETE CASCADE for the single statement teardown
+# (see migrate_cascade_deletes.py)
+CASCADING_FOREIGN_KEYS = [
+    ('participations', 'match_night_id'),
+    ('matches', 'match_night_id'),
+    ('matches', 'game_schema_id'),
+    ('match_results', 'match_id'),
+    ('game_schemas', 'match_night_id'),
+    ('player_stats', 'match_night_id'),
+]
+
+def _can_cascade() -> bool:
+    """Single statement teardown needs PostgreSQL and the cascading foreign keys"""
+    if db.engine.dialect.name != 'postgresql':
+        return False
+    return all(schema_capabilities.has_cascading_delete(table_name, column_name)
+               for table_name, column_name in CASCADING_FOREIGN_KEYS)
+
+def delete_match_night(match_night_id: int) -> Dict[str, int]:
+    """
+    Delete a match night with all its participations, game schemas, matches,
+    match results and player stats. Does not commit.
+
+    Returns:
+        Number of deleted rows per table
+    """
+    if _can_cascade():
+        # The counts are read from the snapshot taken before the delete, the
+        # foreign keys cascade the delete to all related rows
+        row = db.session.execute(db.text("""
+            WITH counts AS (
+                SELECT
+                    (SELECT count(*) FROM participations WHERE match_night_id = :match_night_id) AS participations,
+                    (SELECT count(*) FROM game_schemas WHERE match_night_id = :match_night_id) AS game_schemas,
+                    (SELECT count(*) FROM matches WHERE match_night_id = :match_night_id) AS matches,
+                    (SELECT count(*) FROM match_results r JOIN matches m ON m.id = r.match_id
+                     WHERE m.match_night_id = :match_night_id) AS match_results,
+                    (SELECT count(*) FROM player_stats WHERE match_night_id = :match_night_id) AS player_stats
+            ), deleted AS (
+                DELETE FROM match_nights WHERE id = :match_night_id RETURNING id
+            )
+            SELECT counts.*, (SELECT count(*) FROM deleted) AS match_nights FROM counts
+        """), {'match_night_id': match_night_id}).mappings().one()
+        return dict(row)
+
+    counts = _delete_game_data(match_night_id)
+    counts['participations'] = Participation.query.filter_by(
+        match_night_id=match_night_id
+    ).delete(synchronize_session=False)
+    counts['match_nights'] = MatchNight.query.filter_by(id=match_night_id).delete(synchronize_session=False)
+    return counts
+
+def clear_game_data(match_night_id: int, game_schema_id: Optional[int] = None) -> Dict[str, int]:
+    """
+    Delete all matches, match results and player stats of a match night plus
+    its game schemas (or only game_schema_id if given). The match night and
+    its participations are kept. Does not commit.
+
+    Returns:
+        Number of deleted rows per table
+    """
+    if _can_cascade():
+        game_schema_filter = 'AND id = :game_schema_id' if game_schema_id is not None else ''
+        row = db.session.execute(db.text(f"""
+            WITH counts AS (
+                SELECT (SELECT count(*) FROM match_results r JOIN matches m ON m.id = r.match_id
+                        WHERE m.match_night_id = :match_night_id) AS match_results
+            ), deleted_matches AS (
+                DELETE FROM matches WHERE match_night_id = :match_night_id RETURNING id
+            ), deleted_player_stats AS (
+                DELETE FROM player_stats WHERE match_night_id = :match_night_id RETURNING id
+            ), deleted_game_schemas AS (
+                DELETE FROM game_schemas WHERE match_night_id = :match_night_id {game_schema_filter} RETURNING id
+            )
+            SELECT
+                counts.match_results,
+                (SELECT count(*) FROM deleted_matches) AS matches,
+                (SELECT count(*) FROM deleted_player_stats) AS player_stats,
+                (SELECT count(*) FROM deleted_game_schemas) AS game_schemas
+            FROM counts
+        """), {'match_night_id': match_night_id, 'game_schema_id': game_schema_id}).mappings().one()
+        return dict(row)
+
+    return _delete_game_data(match_night_id, game_schema_id)
+
+def _delete_game_data(match_night_id: int, game_schema_id: Optional[int] = None) -> Dict[str, int]:
+    """Portable fallback: one bulk delete per table, without loading any rows"""
+    match_ids = db.session.query(Match.id).filter(Match.match_night_id == match_night_id)
+
+    counts = {}
+    if schema_capabilities.has_table(MatchPointContribution.__tablename__):
+        MatchPointContribution.query.filter(
+            MatchPointContribution.match_id.in_(match_ids.scalar_subquery())
+        ).delete(synchronize_session=False)
+    counts['match_results'] = MatchResult.query.filter(
+        MatchResult.match_id.in_(match_ids.scalar_subquery())
+    ).delete(synchronize_session=False)
+    counts['matches'] = Match.query.filter_by(match_night_id=match_night_id).delete(synchronize_session=False)
+    counts['player_stats'] = PlayerStats.query.filter_by(
+        match_night_id=match_night_id
+    ).delete(synchronize_session=False)
+
+    game_schemas = GameSchema.query.filter_by(match_night_id=match_night_id)
+    if game_schema_id is not None:
+        game_schemas = game_schemas.filter_by(id=game_schema_id)
+    if schema_capabilities.has_table(KingOfTheCourtQueue.__tablename__):
+        KingOfTheCourtQueue.query.filter(
+            KingOfTheCourtQueue.game_schema_id.in_(game_schemas.with_entities(GameSchema.id).scalar_subquery())
+        ).delete(synchronize_session=False)
+    counts['game_schemas'] = game_schemas.delete(synchronize_session=False)
+    return counts
@@ -0,0 +1,72 @@
+import os
+import sys
+
+# app.py requires a database URL; the tests run on in-memory SQLite
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import datetime
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+from app import app as flask_app
+from extensions import db
+from models import MatchNight, Participation, User
+from schema_capabilities import schema_capabilities
+
+@pytest.fixture
+def app():
+    flask_app.config['TESTING'] = True
+    # The test client talks plain http
+    flask_app.config['SESSION_COOKIE_SECURE'] = False
+    with flask_app.app_context():
+        db.create_all()
+        schema_capabilities.refresh()
+    yield flask_app
+    with flask_app.app_context():
+        db.session.remove()
+        db.drop_all()
+        schema_capabilities.refresh()
+
+@pytest.fixture
+def make_users(app):
+    """Create users u0..u{n-1} (password 'pw') and return their IDs"""
+    def make(count, prefix='u'):
+        with app.app_context():
+            users = []
+            for i in range(count):
+                # A single hash iteration keeps the tests fast
+                user = User(name=f'{prefix}{i}', password_hash=generate_password_hash('pw', method='pbkdf2:sha256:1'))
+                db.session.add(user)
+                users.append(user)
+            db.session.commit()
+            return [user.id for user in users]
+    return make
+
+@pytest.fixture
+def make_match_night(app):
+    """Create a match night of the first user with all given users as participants"""
+    def make(user_ids, num_courts=1, date=None):
+        with app.app_context():
+            match_night = MatchNight(date=date or datetime(2026, 1, 1, 19), location='Padelhal',
+                                     num_courts=num_courts, creator_id=user_ids[0])
+            db.session.add(match_night)
+            db.session.flush()
+            for user_id in user_ids:
+                db.session.add(Participation(user_id=user_id, match_night_id=match_night.id))
+            db.session.commit()
+            return match_night.id
+    return make
+
+@pytest.fixture
+def login(app):
+    """Test client logged in as the user with this ID"""
+    def make(user_id):
+        with app.app_context():
+            name = db.session.get(User, user_id).name
+        client = app.test_client()
+        response = client.post('/api/auth/login', json={'username': name, 'password': 'pw'})
+        assert response.status_code == 200, response.get_json()
+        return client
+    return make
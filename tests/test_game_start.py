@@ -0,0 +1,78 @@
+import threading
+import time
+
+from advisory_locks import match_night_lock
+
+def preview(client, match_night_id):
+    response = client.post(f'/api/game-schemas/{match_night_id}/preview',
+                           json={'game_mode': 'everyone_vs_everyone', 'seed': 1})
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()['preview_token']
+
+def test_repeated_confirm_returns_the_active_game(make_users, make_match_night, login):
+    user_ids = make_users(4)
+    match_night_id = make_match_night(user_ids)
+    client = login(user_ids[0])
+    token = preview(client, match_night_id)
+
+    first = client.post(f'/api/game-schemas/{match_night_id}/confirm', json={'preview_token': token})
+    second = client.post(f'/api/game-schemas/{match_night_id}/confirm', json={'preview_token': token})
+    assert first.status_code == 201, first.get_json()
+    assert second.status_code == 200, second.get_json()
+    assert second.get_json()['game_schema']['id'] == first.get_json()['game_schema']['id']
+
+def test_retried_start_with_the_same_key_returns_the_game(make_users, make_match_night, login):
+    user_ids = make_users(4)
+    match_night_id = make_match_night(user_ids)
+    client = login(user_ids[0])
+
+    def start(key):
+        return client.post(f'/api/game-schemas/{match_night_id}/start',
+                           json={'game_mode': 'everyone_vs_everyone'}, headers={'Idempotency-Key': key})
+
+    first, retry, new = start('a'), start('a'), start('b')
+    assert (first.status_code, retry.status_code, new.status_code) == (201, 200, 201)
+    assert retry.get_json()['game_schema']['id'] == first.get_json()['game_schema']['id']
+    assert retry.get_json()['game_schema']['matches'] == first.get_json()['game_schema']['matches']
+
+def test_repeated_generate_schedule_returns_the_schedule(make_users, make_match_night, login):
+    user_ids = make_users(8)
+    match_night_id = make_match_night(user_ids, num_courts=2)
+    client = login(user_ids[0])
+
+    first = client.post(f'/api/match-nights/{match_night_id}/generate-schedule', json={'seed': 1})
+    second = client.post(f'/api/match-nights/{match_night_id}/generate-schedule', json={'seed': 2})
+    assert (first.status_code, second.status_code) == (201, 200)
+    assert second.get_json()['matches'] == first.get_json()['matches']
+
+def test_lock_contention_returns_without_waiting(app, make_users, make_match_night, login):
+    user_ids = make_users(4)
+    match_night_id = make_match_night(user_ids)
+    client = login(user_ids[0])
+    token = preview(client, match_night_id)
+
+    holding, release = threading.Event(), threading.Event()
+
+    def hold_lock():
+        with app.app_context(), match_night_lock(match_night_id) as acquired:
+            assert acquired
+            holding.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=hold_lock)
+    thread.start()
+    try:
+        holding.wait(5)
+        started = time.monotonic()
+        responses = [
+            client.post(f'/api/match-nights/{match_night_id}/generate-schedule', json={'seed': 1}),
+            client.post(f'/api/game-schemas/{match_night_id}/start', json={'game_mode': 'everyone_vs_everyone'}),
+            client.post(f'/api/game-schemas/{match_night_id}/confirm', json={'preview_token': token}),
+        ]
+        elapsed = time.monotonic() - started
+    finally:
+        release.set()
+        thread.join()
+    # Nothing is saved yet by the request holding the lock: try again shortly
+    assert [response.status_code for response in responses] == [202, 202, 202]
+    assert elapsed < 1
@@ -0,0 +1,22 @@
+from models import Match
+
+def test_last_court_result_creates_the_next_round(app, make_users, make_match_night, login):
+    user_ids = make_users(8)
+    match_night_id = make_match_night(user_ids, num_courts=2)
+    client = login(user_ids[0])
+    response = client.post(f'/api/game-schemas/{match_night_id}/start',
+                           json={'game_mode': 'king_of_the_court', 'seed': 1})
+    assert response.status_code == 201, response.get_json()
+    with app.app_context():
+        match_ids = [match.id for match in Match.query.filter_by(
+            match_night_id=match_night_id, round=1
+        ).order_by(Match.court)]
+    assert len(match_ids) == 2
+
+    first = client.post(f'/api/matches/{match_ids[0]}/result', json={'score': '6-3'})
+    assert first.status_code == 201, first.get_json()
+    assert 'next_matches' not in first.get_json()
+
+    last = client.post(f'/api/matches/{match_ids[1]}/result', json={'score': '6-4'})
+    assert last.status_code == 201, last.get_json()
+    assert [match['round'] for match in last.get_json()['next_matches']] == [2, 2]
@@ -0,0 +1,43 @@
+import pytest
+from sqlalchemy import event
+
+from extensions import db
+
+@pytest.fixture
+def count_queries(app):
+    """The SQL statements executed while running a function"""
+    def count(function):
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            result = function()
+        finally:
+            event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+        return result, statements
+    return count
+
+def detail_query_count(make_users, make_match_night, login, count_queries, num_players):
+    user_ids = make_users(num_players, prefix=f'p{num_players}_')
+    match_night_id = make_match_night(user_ids)
+    client = login(user_ids[0])
+    response = client.post(f'/api/game-schemas/{match_night_id}/start',
+                           json={'game_mode': 'everyone_vs_everyone', 'seed': 1})
+    assert response.status_code == 201, response.get_json()
+
+    response, statements = count_queries(lambda: client.get(f'/api/match-nights/{match_night_id}'))
+    assert response.status_code == 200
+    assert len(response.get_json()['participants']) == num_players
+    # The deferred booking and schedule columns come with the night, not in extra queries
+    assert len([statement for statement in statements if 'FROM match_nights' in statement]) == 1, statements
+    return len(statements)
+
+def test_detail_runs_a_fixed_number_of_queries(make_users, make_match_night, login, count_queries):
+    counts = [detail_query_count(make_users, make_match_night, login, count_queries, num_players)
+              for num_players in (4, 8, 12)]
+    assert counts[0] == counts[1] == counts[2], counts
@@ -0,0 +1,26 @@
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import Match, MatchResult
+
+def test_a_match_has_at_most_one_result(app, make_users, make_match_night, login):
+    user_ids = make_users(4)
+    match_night_id = make_match_night(user_ids)
+    client = login(user_ids[0])
+    response = client.post(f'/api/game-schemas/{match_night_id}/start',
+                           json={'game_mode': 'everyone_vs_everyone', 'seed': 1})
+    assert response.status_code == 201, response.get_json()
+    with app.app_context():
+        match_id = Match.query.filter_by(match_night_id=match_night_id).order_by(Match.id).first().id
+
+    first = client.post(f'/api/matches/{match_id}/result', json={'score': '6-3'})
+    second = client.post(f'/api/matches/{match_id}/result', json={'score': '6-4'})
+    assert (first.status_code, second.status_code) == (201, 200)
+
+    with app.app_context():
+        assert [result.score for result in MatchResult.query.filter_by(match_id=match_id)] == ['6-4']
+        db.session.add(MatchResult(match_id=match_id, score='6-0'))
+        with pytest.raises(IntegrityError):
+            db.session.commit()
+        db.session.rollback()
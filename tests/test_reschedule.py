@@ -0,0 +1,51 @@
+from extensions import db
+from models import GameSchema, Match
+
+def game_matches(app, match_night_id):
+    with app.app_context():
+        game_schema = GameSchema.query.filter_by(match_night_id=match_night_id, status='active').one()
+        return [(match.id, match.round, match.player_ids) for match in Match.query.filter_by(
+            game_schema_id=game_schema.id
+        ).order_by(Match.round, Match.court)]
+
+def test_join_keeps_the_round_being_played(app, make_users, make_match_night, login):
+    user_ids = make_users(6)
+    match_night_id = make_match_night(user_ids[:5])
+    client = login(user_ids[0])
+    response = client.post(f'/api/game-schemas/{match_night_id}/start',
+                           json={'game_mode': 'everyone_vs_everyone', 'seed': 1})
+    assert response.status_code == 201, response.get_json()
+
+    matches = game_matches(app, match_night_id)
+    response = client.post(f'/api/matches/{matches[0][0]}/result', json={'score': '6-3'})
+    assert response.status_code in (200, 201), response.get_json()
+    current_id, current_round, _ = matches[1]
+
+    response = login(user_ids[5]).post(f'/api/match-nights/{match_night_id}/join')
+    assert response.status_code == 200, response.get_json()
+
+    # Round 2 is still on court; the new schedule starts after it
+    matches = game_matches(app, match_night_id)
+    assert [match_id for match_id, round_num, _ in matches if round_num == current_round] == [current_id]
+    assert all(round_num > current_round for match_id, round_num, _ in matches[2:])
+    assert any(user_ids[5] in player_ids for _, _, player_ids in matches)
+    response = client.post(f'/api/matches/{current_id}/result', json={'score': '6-4'})
+    assert response.status_code in (200, 201), response.get_json()
+
+def test_leave_drops_the_current_match_of_the_player_who_left(app, make_users, make_match_night, login):
+    user_ids = make_users(5)
+    match_night_id = make_match_night(user_ids)
+    client = login(user_ids[0])
+    response = client.post(f'/api/game-schemas/{match_night_id}/start',
+                           json={'game_mode': 'everyone_vs_everyone', 'seed': 1})
+    assert response.status_code == 201, response.get_json()
+
+    _, _, player_ids = game_matches(app, match_night_id)[0]
+    leaving = next(user_id for user_id in player_ids if user_id != user_ids[0])
+    response = login(leaving).post(f'/api/match-nights/{match_night_id}/leave', json={})
+    assert response.status_code == 200, response.get_json()
+
+    # The 4 players left play everyone vs everyone: 3 matches, none with the player who left
+    matches = game_matches(app, match_night_id)
+    assert len(matches) == 3
+    assert all(leaving not in player_ids for _, _, player_ids in matches)
@@ -0,0 +1,41 @@
+from collections import Counter
+from itertools import combinations
+
+from schedule_engine import generate_everyone_vs_everyone_schedule, reschedule_everyone_vs_everyone
+
+def partnerships(matches):
+    return [frozenset(pair) for match in matches for pair in match]
+
+def test_reschedule_after_join_and_leave_puts_repeats_last():
+    # 9 players start; after two rounds player 10 joins, after two more player 3 leaves
+    player_ids = list(range(1, 10))
+    rounds = generate_everyone_vs_everyone_schedule(player_ids, num_courts=2)
+    played = [match for round_matches in rounds[:2] for match in round_matches]
+
+    player_ids.append(10)
+    rounds = reschedule_everyone_vs_everyone(player_ids, played, num_courts=2)
+    played += [match for round_matches in rounds[:2] for match in round_matches]
+
+    player_ids.remove(3)
+    rounds = reschedule_everyone_vs_everyone(player_ids, played, num_courts=2)
+
+    already = set(partnerships(played))
+    remaining = {frozenset(pair) for pair in combinations(player_ids, 2)} - already
+    scheduled = Counter(partnerships(match for round_matches in rounds for match in round_matches))
+    assert set(scheduled) >= remaining
+    assert all(scheduled[pair] == 1 for pair in remaining)
+
+    # Fewest possible naai-partijen: the parity of the remaining pairs, or more if
+    # one player is in over half of them (their pairs can't play each other)
+    per_player = Counter(player for pair in remaining for player in pair)
+    needed = max([len(remaining) % 2] + [2 * count - len(remaining) for count in per_player.values()])
+    seen = set(already)
+    repeat_rounds, new_rounds = [], []
+    for round_index, round_matches in enumerate(rounds):
+        for match in round_matches:
+            pairs = partnerships([match])
+            (repeat_rounds if any(pair in seen for pair in pairs) else new_rounds).append(round_index)
+            seen.update(pairs)
+    assert len(repeat_rounds) == needed
+    # Matches with a repeated partner only come after all the new ones
+    assert not repeat_rounds or min(repeat_rounds) >= max(new_rounds)
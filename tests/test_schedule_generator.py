@@ -0,0 +1,20 @@
+from types import SimpleNamespace
+
+import schedule_generator
+from schedule_generator import ScheduleGenerator, _best_candidate
+
+def test_best_of_candidates_only_depends_on_the_seed(monkeypatch):
+    players = [SimpleNamespace(id=player_id) for player_id in range(1, 11)]
+    player_ids = [player.id for player in players]
+    _, best_seed, best = _best_candidate(player_ids, 2, 'simple', list(range(1, 65)))
+    # Chunks of 8 seeds; the best candidate isn't in the first one
+    monkeypatch.setattr(schedule_generator, 'BEST_OF_WORKERS', 4)
+    assert best_seed >= 9
+
+    def no_pool():
+        raise OSError('no process pool')
+
+    # Without a pool (or before it scored anything) all candidates are still compared
+    monkeypatch.setattr(schedule_generator, '_get_candidate_pool', no_pool)
+    generator = ScheduleGenerator(players, num_courts=2)
+    assert generator._best_of_candidates('simple', 64, 0, 1, player_ids) == best
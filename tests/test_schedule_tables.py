@@ -0,0 +1,17 @@
+import json
+
+from schedule_engine import SCHEDULE_TABLE_PATH
+from schedule_solver import MAX_EXTRA_ROUNDS
+
+def test_table_schedules_stay_within_the_round_bound():
+    with open(SCHEDULE_TABLE_PATH) as f:
+        schedules = json.load(f)['schedules']
+    assert schedules
+    for key, entry in schedules.items():
+        num_players, num_courts = map(int, key.split('x'))
+        courts = min(num_courts, num_players // 4)
+        # Every pair partners once: half the pairs (rounded up) are matches
+        num_matches = -(-num_players * (num_players - 1) // 4)
+        fewest_rounds = -(-num_matches // courts)
+        rounds = entry['rounds'].split('|')
+        assert len(rounds) <= fewest_rounds + MAX_EXTRA_ROUNDS, (key, len(rounds), fewest_rounds)
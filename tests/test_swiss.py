@@ -0,0 +1,88 @@
+import threading
+
+from advisory_locks import match_night_lock
+from extensions import db
+from models import Match, PlayerStats
+from swiss import _states, load_swiss_state, record_points_delta
+
+def generate(client, match_night_id, schedule_type):
+    response = client.post(f'/api/match-nights/{match_night_id}/generate-schedule',
+                           json={'schedule_type': schedule_type, 'seed': 1})
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()['matches']
+
+def finish(client, matches):
+    for i, match in enumerate(matches):
+        response = client.post(f"/api/matches/{match['id']}/result", json={'score': f'6-{i % 5}'})
+        assert response.status_code in (200, 201), response.get_json()
+
+def test_next_round_only_for_swiss_schedules(make_users, make_match_night, login):
+    user_ids = make_users(8)
+    match_night_id = make_match_night(user_ids, num_courts=2)
+    client = login(user_ids[0])
+    finish(client, generate(client, match_night_id, 'simple'))
+
+    response = client.post(f'/api/match-nights/{match_night_id}/next-round')
+    assert response.status_code == 400
+
+def test_next_round_is_not_created_twice(app, make_users, make_match_night, login):
+    user_ids = make_users(8)
+    match_night_id = make_match_night(user_ids, num_courts=2)
+    client = login(user_ids[0])
+    finish(client, generate(client, match_night_id, 'swiss'))
+
+    first = client.post(f'/api/match-nights/{match_night_id}/next-round')
+    second = client.post(f'/api/match-nights/{match_night_id}/next-round')
+    assert first.status_code == 201, first.get_json()
+    assert second.status_code == 400
+    with app.app_context():
+        rounds = [round_num for (round_num,) in db.session.query(Match.round).filter_by(
+            match_night_id=match_night_id
+        )]
+    assert sorted(rounds) == [1, 1, 2, 2]
+
+def test_next_round_while_another_request_pairs_it(app, make_users, make_match_night, login):
+    user_ids = make_users(8)
+    match_night_id = make_match_night(user_ids, num_courts=2)
+    client = login(user_ids[0])
+    finish(client, generate(client, match_night_id, 'swiss'))
+
+    holding, release = threading.Event(), threading.Event()
+
+    def hold_lock():
+        with app.app_context(), match_night_lock(match_night_id) as acquired:
+            assert acquired
+            holding.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=hold_lock)
+    thread.start()
+    try:
+        holding.wait(5)
+        response = client.post(f'/api/match-nights/{match_night_id}/next-round')
+    finally:
+        release.set()
+        thread.join()
+    assert response.status_code == 409
+
+def test_committed_delta_is_not_counted_twice(app, make_users, make_match_night):
+    user_ids = make_users(4)
+    match_night_id = make_match_night(user_ids)
+    with app.app_context():
+        _states.pop(match_night_id, None)
+        for user_id in user_ids:
+            db.session.add(PlayerStats(match_night_id=match_night_id, user_id=user_id, total_points=0))
+        db.session.commit()
+        load_swiss_state(match_night_id)
+
+        # The points change is written, and the standings are reloaded (seeing
+        # the change) before the transaction commits
+        stats = PlayerStats.query.filter_by(match_night_id=match_night_id, user_id=user_ids[0]).one()
+        stats.total_points += 5
+        db.session.flush()
+        record_points_delta(match_night_id, {user_ids[0]: 5}, stats.updated_at)
+        _states[match_night_id].standings = None
+        load_swiss_state(match_night_id)
+        db.session.commit()
+
+        assert load_swiss_state(match_night_id).standings.points[user_ids[0]] == 5